@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from ..core.config import settings
+from ..core.profiling import get_capture, get_captures, is_valid_token, render_profile
+
+router = APIRouter()
+
+
+def _check_access(token: str) -> None:
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not is_valid_token(token):
+        raise HTTPException(status_code=403, detail="Missing or invalid X-Profile-Token")
+
+
+@router.get("/admin/profiles", include_in_schema=False)
+async def list_profiles(limit: int = 20, x_profile_token: str = Header(None)):
+    """
+    Captured requests (profiled or slower than PROFILING_SLOW_REQUEST_MS), slowest
+    first, with the time spent in each stage.
+    """
+    _check_access(x_profile_token)
+    if limit < 1 or limit > 1000:
+        raise HTTPException(status_code=400, detail="Invalid limit. Must be between 1 and 1000")
+    return {"captures": get_captures(limit)}
+
+
+@router.get("/admin/profiles/{capture_id}", include_in_schema=False)
+async def download_profile(capture_id: str, fmt: str = Query(None, alias="format"), x_profile_token: str = Header(None)):
+    """
+    Download the profile of a captured request: 'text' or 'pstats' (for pstats or
+    snakeviz) for cProfile, 'html' or 'text' for pyinstrument.
+    """
+    _check_access(x_profile_token)
+    capture = get_capture(capture_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Capture not found")
+    if capture.profiler is None:
+        raise HTTPException(status_code=404, detail="The request was captured for being slow but wasn't profiled")
+    try:
+        content, media_type, filename = render_profile(capture, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=content, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
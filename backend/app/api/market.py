@@ -0,0 +1,151 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from datetime import datetime
+import logging
+from ..db.database import get_db
+from ..db.models import Stock
+from ..services.market_data_service import get_market_data
+from ..services.stock_service import refresh_stock_data
+from ..services.stock_values_db import get_market_snapshot
+from ..services.screener_service import ScreenerQueryError, ensure_screener_table, run_screen
+from ..services.correlation_service import BENCHMARK_SYMBOL, compute_market_statistics, get_returns_matrix
+from ..core.refresh import refresh_in_background
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Above this many symbols the pairwise correlation matrix and the rolling correlation
+# series are left out of the response
+MAX_MATRIX_SYMBOLS = 500
+
+def _age_seconds(timestamp: str) -> float:
+    return (datetime.utcnow() - datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")).total_seconds()
+
+@router.get("/market/snapshot")
+async def get_market_snapshot_endpoint(symbols: str = None, db: Session = Depends(get_db)):
+    """
+    Latest close, previous close, change, 52-week range and volume for every stock
+    (or a comma-separated list of symbols) in a single response.
+    
+    Symbols without a snapshot yet are listed in 'pending' and warmed up in the
+    background, as are symbols whose snapshot is older than PRICE_FRESH_TTL.
+    """
+    query = db.query(Stock)
+    if symbols:
+        query = query.filter(Stock.symbol.in_([symbol.strip() for symbol in symbols.split(",")]))
+    stocks = query.all()
+    
+    snapshot = get_market_snapshot()
+    rows = []
+    pending = []
+    for stock in stocks:
+        entry = snapshot.get(stock.symbol)
+        if entry is None:
+            # Load a year of history so the 52-week range is complete
+            pending.append(stock.symbol)
+            refresh_in_background(("prices", stock.symbol), "prices", lambda symbol=stock.symbol: refresh_stock_data(symbol, "1y"))
+        elif entry["checked_at"] is None or _age_seconds(entry["checked_at"]) > settings.PRICE_FRESH_TTL:
+            refresh_in_background(("prices", stock.symbol), "prices", lambda symbol=stock.symbol: refresh_stock_data(symbol, "7d"))
+        
+        rows.append({
+            "symbol": stock.symbol,
+            "name": stock.name,
+            "category": stock.category,
+            "region": stock.region,
+            "last_date": entry["last_date"] if entry else None,
+            "last_close": entry["last_close"] if entry else None,
+            "previous_close": entry["previous_close"] if entry else None,
+            "change": entry["change"] if entry else None,
+            "change_percent": entry["change_percent"] if entry else None,
+            "high_52w": entry["high_52w"] if entry else None,
+            "low_52w": entry["low_52w"] if entry else None,
+            "volume": entry["volume"] if entry else None,
+            "updated_at": entry["updated_at"] if entry else None
+        })
+    
+    if pending:
+        logger.info(f"Market snapshot pending for {len(pending)} symbols, warming up in the background")
+    
+    return {"data": rows, "pending": pending}
+
+@router.get("/market/correlation")
+async def get_market_correlation(
+    symbols: str = None,
+    period: str = "1y",
+    window: int = 60,
+    benchmark: str = BENCHMARK_SYMBOL,
+    db: Session = Depends(get_db)
+):
+    """
+    Volatility, beta and correlation against the benchmark, rolling correlation
+    against the benchmark and the pairwise correlation matrix of daily returns
+    for every stock (or a comma-separated list of symbols), from cached prices.
+    
+    Symbols with no cached prices are listed in 'missing' and warmed up in the background.
+    The rolling correlation and the matrix are left out above MAX_MATRIX_SYMBOLS symbols.
+    """
+    valid_periods = ["1mo", "1y", "3y", "5y", "max"]
+    if period not in valid_periods:
+        raise HTTPException(status_code=400, detail=f"Invalid period. Must be one of: {', '.join(valid_periods)}")
+    if window < 5 or window > 250:
+        raise HTTPException(status_code=400, detail="Invalid window. Must be between 5 and 250 trading days")
+    
+    if symbols:
+        requested = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    else:
+        requested = [stock.symbol for stock in db.query(Stock).all()]
+    if benchmark not in requested:
+        requested.append(benchmark)
+    
+    matrix = get_returns_matrix(requested, period)
+    small = len(matrix.symbols) <= MAX_MATRIX_SYMBOLS
+    result = compute_market_statistics(matrix, benchmark, window, include_matrix=small, include_rolling=small)
+    
+    return {
+        "symbols": matrix.symbols,
+        "benchmark": benchmark,
+        "period": period,
+        "missing": [symbol for symbol in requested if symbol not in matrix.index],
+        **result
+    }
+
+@router.get("/market/screener")
+async def get_market_screener(
+    q: str = None,
+    sort: str = None,
+    order: str = "desc",
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """
+    Stocks matching a screener query such as
+    "pct_change_1m > 5 AND region = 'US' AND rsi14 < 30", with their metrics.
+    Queries run against an in-memory table of per-symbol metrics that is updated
+    whenever new prices are stored, so they never read the price tables.
+    """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Invalid order. Must be 'asc' or 'desc'")
+    if limit < 1 or limit > 1000:
+        raise HTTPException(status_code=400, detail="Invalid limit. Must be between 1 and 1000")
+    
+    stocks = db.query(Stock.symbol, Stock.name, Stock.category, Stock.region).all()
+    ensure_screener_table([dict(stock._mapping) for stock in stocks])
+    
+    try:
+        result = run_screen(q, sort, order == "desc", limit)
+    except ScreenerQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid screener query: {str(e)}")
+    
+    return {"query": q, **result}
+
+@router.get("/market/providers")
+async def get_market_data_providers():
+    """
+    The market data providers in the order the next request tries them, with the
+    health of each in this worker: recent success rate, smoothed latency, and
+    whether it is cooling down after a rate limit or a run of failures.
+    """
+    market_data = get_market_data()
+    return {"routing": market_data.routing, "providers": market_data.health()}
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List
-from ..db.database import get_db
+from ..db.database import get_db, NEWS_SEARCH_ENABLED
 from ..db.models import Stock, StockNews
 from ..services.news_service import get_stock_news
+from ..services.news_search_service import search_news
+from ..services.dedup_service import select_representatives
+from ..services.sentiment_service import score_texts, daily_sentiment
+from ..services.stock_service import get_stock_data
+from ..core.metrics import track_stage
 from datetime import datetime
 
 router = APIRouter()
 
 @router.get("/stocks/{symbol}/news")
-async def get_stock_news_endpoint(symbol: str, period: str = "7d", date: str = None, db: Session = Depends(get_db)):
+async def get_stock_news_endpoint(symbol: str, period: str = "7d", date: str = None, dedupe: bool = True, db: Session = Depends(get_db)):
     stock = db.query(Stock).filter(Stock.symbol == symbol).first()
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
@@ -29,11 +34,10 @@ async def get_stock_news_endpoint(symbol: str, period: str = "7d", date: str = N
     elif news_data["status"] != "success" or "data" not in news_data:
         raise HTTPException(status_code=500, detail="Invalid response format from news service")
     
-    # Clear existing news for this stock and period
-    db.query(StockNews).filter(StockNews.stock_id == stock.id).delete()
-    
-    # Add new news data
-    new_news = []
+    # Parse the articles, skipping invalid ones and duplicate URLs
+    articles = []
+    parsed_articles = []
+    seen_urls = set()
     for article in news_data["data"]:
         try:
             news_item = StockNews(
@@ -43,30 +47,147 @@ async def get_stock_news_endpoint(symbol: str, period: str = "7d", date: str = N
                 url=article.get("url", ""),
                 source=article.get("source", ""),
                 published_at=datetime.strptime(article["published_at"], "%Y-%m-%dT%H:%M:%SZ"),
+                cluster_id=article.get("cluster_id"),
+                sentiment=article.get("sentiment"),
             )
-            new_news.append(news_item)
         except (KeyError, ValueError) as e:
             continue  # Skip invalid articles
+        if news_item.url and news_item.url in seen_urls:
+            continue
+        seen_urls.add(news_item.url)
+        articles.append(news_item)
+        parsed_articles.append(article)
     
-    if not new_news:
+    if not articles:
         raise HTTPException(status_code=404, detail="No valid news articles found")
     
-    db.add_all(new_news)
-    db.commit()
-    
-    # Replace the return statements at the end of get_stock_news_endpoint in news.py:
-
-    # Return serialized data
+    # Return serialized data; with dedupe, only one article per cluster of
+    # near-duplicates, with the number of copies left out
+    shown = {id(article) for article in select_representatives(parsed_articles)} if dedupe else None
     response_data = [{
         "title": news.title,
         "description": news.description,
         "url": news.url,
         "source": news.source,
-        "published_at": news.published_at.strftime("%Y-%m-%d %H:%M:%S")
-    } for news in new_news]
+        "published_at": news.published_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "cluster_id": news.cluster_id,
+        "sentiment": news.sentiment,
+        "duplicates": article.get("cluster_size", 1) - 1
+    } for news, article in zip(articles, parsed_articles) if shown is None or id(article) in shown]
+    
+    # Accumulate articles (for news search) rather than replacing them: only store
+    # the ones whose URL isn't stored for this stock yet
+    with track_stage("db_write"):
+        stored_urls = {
+            url for (url,) in db.query(StockNews.url)
+            .filter(StockNews.stock_id == stock.id, StockNews.url.in_(list(seen_urls)))
+            .all()
+        }
+        new_news = [news for news in articles if not news.url or news.url not in stored_urls]
+        if new_news:
+            db.add_all(new_news)
+            db.commit()
+    
+    # Always return with a data property, plus how fresh the data is
+    result = {"data": response_data, "freshness": news_data.get("freshness", "fresh")}
+    if "as_of" in news_data:
+        result["as_of"] = news_data["as_of"]
     
     # Include warning in response if present
     if "warning" in news_data and news_data["warning"]:
-        return {"data": response_data, "warning": news_data["warning"]}
+        result["warning"] = news_data["warning"]
+    
+    return result
+
+@router.get("/stocks/{symbol}/sentiment")
+async def get_stock_sentiment(symbol: str, response: Response, period: str = "1mo", db: Session = Depends(get_db)):
+    """
+    Daily news sentiment aligned with the closing prices of the period, computed
+    locally from the articles stored for the stock (no News API or Together AI call).
+    Stored articles that haven't been scored yet are scored in one batch first.
+    """
+    stock = db.query(Stock).filter(Stock.symbol == symbol).first()
+    if not stock:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    
+    # Validate period parameter
+    valid_periods = ["7d", "1mo", "1y", "3y", "5y", "max"]
+    if period not in valid_periods:
+        raise HTTPException(status_code=400, detail=f"Invalid period. Must be one of: {', '.join(valid_periods)}")
+    
+    try:
+        stock_data = get_stock_data(symbol, period=period)
+    except Exception as e:
+        raise HTTPException(
+            status_code=503, 
+            detail=f"Unable to retrieve stock price data for {symbol}: {str(e)}"
+        )
+    
+    response.headers["X-Data-Freshness"] = stock_data.get("freshness", "fresh")
+    if "as_of" in stock_data:
+        response.headers["X-Data-As-Of"] = stock_data["as_of"]
+    
+    prices = stock_data["data"].priced()
+    dates = prices.dates()
+    news = []
+    if dates:
+        news = db.query(StockNews).filter(
+            StockNews.stock_id == stock.id,
+            StockNews.published_at >= datetime.strptime(dates[0], "%Y-%m-%d")
+        ).all()
+    
+    unscored = [item for item in news if item.sentiment is None]
+    if unscored:
+        with track_stage("sentiment"):
+            scores = score_texts([f"{item.title or ''}. {item.description or ''}" for item in unscored])
+        for item, score in zip(unscored, scores.tolist()):
+            item.sentiment = round(score, 4)
+        db.commit()
+    
+    series = daily_sentiment(dates, [{
+        "published_at": item.published_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "sentiment": item.sentiment,
+        "cluster_id": item.cluster_id,
+        "url": item.url
+    } for item in news])
+    
+    return {
+        "symbol": symbol,
+        "period": period,
+        "timestamps": prices.timestamps(),
+        "close": prices.close.tolist(),
+        **series
+    }
+
+@router.get("/news/search")
+async def search_news_endpoint(
+    q: str,
+    symbol: str = None,
+    from_date: str = Query(None, alias="from"),
+    to_date: str = Query(None, alias="to"),
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_db)
+):
+    """
+    Full-text search over all stored articles, ranked by BM25 with highlighted
+    snippets. `from` and `to` are inclusive dates in YYYY-MM-DD format.
+    """
+    if not NEWS_SEARCH_ENABLED:
+        raise HTTPException(status_code=503, detail="News search is not available with this database")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    if limit < 1 or limit > 100 or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid limit or offset. Limit must be between 1 and 100")
+    
+    try:
+        parsed_from = datetime.strptime(from_date, "%Y-%m-%d") if from_date else None
+        parsed_to = datetime.strptime(to_date, "%Y-%m-%d") if to_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    
+    if symbol and not db.query(Stock).filter(Stock.symbol == symbol).first():
+        raise HTTPException(status_code=404, detail="Stock not found")
     
-    return {"data": response_data}  # Always return with a data property
\ No newline at end of file
+    result = search_news(db, q, symbol, parsed_from, parsed_to, limit, offset)
+    return {"query": q, **result}
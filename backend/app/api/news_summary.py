@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any
 from ..db.database import get_db
@@ -6,9 +6,47 @@ from ..db.models import Stock, StockNews, StockPrice
 from ..services.ai_service import generate_news_summary
 from ..services.stock_service import get_stock_data
 from ..services.news_service import get_stock_news
+from ..services.correlation_service import get_symbol_statistics
+from ..services.summary_service import get_precomputed_summary, precompute_summaries
+from ..core.singleflight import single_flight
+from ..core.refresh import refresh_in_background
 
 router = APIRouter()
 
+# Most symbols summarized in one precompute batch
+MAX_PRECOMPUTE_SYMBOLS = 50
+
+@router.post("/stocks/news-summaries/precompute", status_code=202)
+async def precompute_news_summaries(symbols: str, response: Response, period: str = "7d", db: Session = Depends(get_db)):
+    """
+    Generate the summaries of several symbols (comma-separated) in the background,
+    in one batched pass of the LLM backend; the summary endpoint then serves them
+    for SUMMARY_CACHE_TTL seconds.
+    """
+    requested = list(dict.fromkeys(symbol.strip() for symbol in symbols.split(",") if symbol.strip()))
+    if not requested or len(requested) > MAX_PRECOMPUTE_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_PRECOMPUTE_SYMBOLS} symbols")
+    
+    # Validate period parameter
+    valid_periods = ["7d", "1mo", "1y", "3y", "5y", "max"]
+    if period not in valid_periods:
+        raise HTTPException(status_code=400, detail=f"Invalid period. Must be one of: {', '.join(valid_periods)}")
+    
+    stocks = db.query(Stock).filter(Stock.symbol.in_(requested)).all()
+    unknown = sorted(set(requested) - {stock.symbol for stock in stocks})
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Stocks not found: {', '.join(unknown)}")
+    
+    names = {stock.symbol: stock.name for stock in stocks}
+    scheduled = refresh_in_background(
+        ("summaries", period, tuple(sorted(requested))),
+        "summaries",
+        lambda: precompute_summaries(requested, period, names)
+    )
+    if not scheduled:
+        response.status_code = 200
+    return {"status": "scheduled" if scheduled else "running", "symbols": requested, "period": period}
+
 @router.get("/stocks/{symbol}/news-summary")
 async def get_stock_news_summary(symbol: str, period: str = "7d", date: str = None, db: Session = Depends(get_db)):
     # Verify stock exists
@@ -16,6 +54,12 @@ async def get_stock_news_summary(symbol: str, period: str = "7d", date: str = No
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
     
+    # Serve a summary precomputed in a batch if there is a recent one
+    if not date:
+        precomputed = get_precomputed_summary(symbol, period)
+        if precomputed:
+            return precomputed
+    
     # Get news data with better error handling
     try:
         news_data = get_stock_news(symbol, period, date)
@@ -77,9 +121,21 @@ async def get_stock_news_summary(symbol: str, period: str = "7d", date: str = No
             }
         }
     
+    # Beta and correlation against the market from cached prices, if available
+    try:
+        market_statistics = get_symbol_statistics(symbol)
+    except Exception as e:
+        import logging
+        logging.warning(f"Could not compute market statistics for {symbol}: {str(e)}")
+        market_statistics = None
+    
     # Generate summary using Together AI with better error handling
     try:
-        summary_result = generate_news_summary(symbol, news_data["data"], price_history, date)
+        # Concurrent requests for the same summary share a single Together AI completion
+        summary_result = single_flight(
+            ("together", symbol, period, date),
+            lambda: generate_news_summary(symbol, news_data["data"], price_history, date, market_statistics, stock.name)
+        )
         
         if summary_result["status"] == "error":
             # Return a formatted error message instead of throwing an exception
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import List, Set
+import asyncio
+import logging
+from ..db.database import SessionLocal
+from ..db.models import Stock
+from ..services.quote_service import CONNECTION_QUEUE_SIZE, get_quote_hub
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def _known_symbols(symbols: List[str]) -> Set[str]:
+    db = SessionLocal()
+    try:
+        return {stock.symbol for stock in db.query(Stock.symbol).filter(Stock.symbol.in_(symbols)).all()}
+    finally:
+        db.close()
+
+def _parse_symbols(value) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list):
+        return []
+    return list(dict.fromkeys(str(symbol).strip() for symbol in value if str(symbol).strip()))
+
+@router.websocket("/ws/quotes")
+async def stream_quotes(websocket: WebSocket, symbols: str = None):
+    """
+    Stream live quotes of the subscribed symbols.
+
+    Symbols can be given in the query string (?symbols=AAPL,MSFT) and changed with
+    messages {"action": "subscribe" | "unsubscribe", "symbols": [...]}. The server sends
+    {"type": "quote", ...} whenever a quote changes (the latest known one right after
+    subscribing), {"type": "subscribed", "symbols": [...]} after each change of the
+    subscription and {"type": "error", "detail": ...} for invalid requests.
+
+    Each symbol is polled once for all connections, so upstream calls grow with the
+    number of distinct symbols watched, not with the number of viewers.
+    """
+    await websocket.accept()
+    hub = get_quote_hub()
+    queue = asyncio.Queue(maxsize=CONNECTION_QUEUE_SIZE)
+    subscribed: Set[str] = set()
+
+    async def subscribe(requested: List[str]):
+        new = [symbol for symbol in requested if symbol not in subscribed]
+        if len(subscribed) + len(new) > settings.QUOTE_MAX_SYMBOLS_PER_CONNECTION:
+            await websocket.send_json({"type": "error", "detail": f"At most {settings.QUOTE_MAX_SYMBOLS_PER_CONNECTION} symbols per connection"})
+            return
+        known = _known_symbols(new) if new else set()
+        unknown = [symbol for symbol in new if symbol not in known]
+        if unknown:
+            await websocket.send_json({"type": "error", "detail": f"Stocks not found: {', '.join(unknown)}"})
+        for symbol in new:
+            if symbol in known:
+                subscribed.add(symbol)
+                hub.subscribe(symbol, queue)
+        await websocket.send_json({"type": "subscribed", "symbols": sorted(subscribed)})
+
+    async def unsubscribe(requested: List[str]):
+        for symbol in requested:
+            if symbol in subscribed:
+                subscribed.discard(symbol)
+                hub.unsubscribe(symbol, queue)
+        await websocket.send_json({"type": "subscribed", "symbols": sorted(subscribed)})
+
+    async def receive():
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+            action = message.get("action")
+            requested = _parse_symbols(message.get("symbols"))
+            if action == "subscribe":
+                await subscribe(requested)
+            elif action == "unsubscribe":
+                await unsubscribe(requested)
+            else:
+                await websocket.send_json({"type": "error", "detail": "Invalid action. Must be one of: subscribe, unsubscribe"})
+
+    async def send():
+        while True:
+            quote = await queue.get()
+            # Updates queued before an unsubscribe are dropped
+            if quote["symbol"] in subscribed:
+                await websocket.send_json(quote)
+
+    tasks = []
+    try:
+        if symbols:
+            await subscribe(_parse_symbols(symbols))
+        tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(send())]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Quote stream error: {str(e)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        for symbol in subscribed:
+            hub.unsubscribe(symbol, queue)
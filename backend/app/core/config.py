@@ -15,6 +15,37 @@ class Settings:
     # Use SQLite for local development, but allow override via env var for production
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./stock_news.db")
     
+    # Path of the SQLite price cache (defaults to backend/stock_values.db)
+    STOCK_VALUES_DB_PATH: str = os.getenv("STOCK_VALUES_DB_PATH", "")
+    
+    # Where daily prices are stored: 'sqlite' (the file above) or 'postgres', which API
+    # instances can share; PRICE_STORE_URL defaults to DATABASE_URL. The Postgres price
+    # table is hash-partitioned by symbol into PRICE_STORE_PARTITIONS partitions, and
+    # connections are pooled (PRICE_STORE_POOL_SIZE, plus PRICE_STORE_MAX_OVERFLOW at peaks)
+    PRICE_STORE_BACKEND: str = os.getenv("PRICE_STORE_BACKEND", "sqlite")
+    PRICE_STORE_URL: str = os.getenv("PRICE_STORE_URL", "")
+    PRICE_STORE_PARTITIONS: int = int(os.getenv("PRICE_STORE_PARTITIONS", "16"))
+    PRICE_STORE_POOL_SIZE: int = int(os.getenv("PRICE_STORE_POOL_SIZE", "5"))
+    PRICE_STORE_MAX_OVERFLOW: int = int(os.getenv("PRICE_STORE_MAX_OVERFLOW", "10"))
+    
+    # Hot tier of the daily price cache: each requested symbol's history as a memory-mapped
+    # NumPy file (in PRICE_HOT_CACHE_DIR, by default next to stock_values.db) shared by the
+    # worker processes, rebuilt after writes or when older than PRICE_HOT_CACHE_MAX_AGE seconds
+    PRICE_HOT_CACHE: bool = os.getenv("PRICE_HOT_CACHE", "true").lower() == "true"
+    PRICE_HOT_CACHE_DIR: str = os.getenv("PRICE_HOT_CACHE_DIR", "")
+    PRICE_HOT_CACHE_MAX_AGE: int = int(os.getenv("PRICE_HOT_CACHE_MAX_AGE", "300"))
+    
+    # Market data providers to try, comma-separated in order of priority: 'yahoo' (Yahoo
+    # Finance) and 'fixtures' (CSV or Parquet files in MARKET_DATA_FIXTURES_DIR, for working
+    # offline). MARKET_DATA_ROUTING 'priority' tries healthy providers in that order, 'fastest'
+    # by their observed latency and success rate. A provider that is rate-limited, or fails
+    # MARKET_DATA_FAILURE_THRESHOLD times in a row, is tried last for MARKET_DATA_COOLDOWN seconds
+    MARKET_DATA_PROVIDERS: str = os.getenv("MARKET_DATA_PROVIDERS", "yahoo")
+    MARKET_DATA_ROUTING: str = os.getenv("MARKET_DATA_ROUTING", "priority")
+    MARKET_DATA_FIXTURES_DIR: str = os.getenv("MARKET_DATA_FIXTURES_DIR", "")
+    MARKET_DATA_COOLDOWN: float = float(os.getenv("MARKET_DATA_COOLDOWN", "60"))
+    MARKET_DATA_FAILURE_THRESHOLD: int = int(os.getenv("MARKET_DATA_FAILURE_THRESHOLD", "3"))
+    
     # MongoDB configuration with environment-specific defaults
     MONGODB_URL: str = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
     MONGODB_DB: str = os.getenv("MONGODB_DB", "stocknews")
@@ -22,6 +53,26 @@ class Settings:
     # Redis configuration with environment-specific defaults
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     
+    # Feature flags for optional backends
+    # Clients for disabled backends are never created, and enabled ones are only
+    # created on first use, so they don't slow down cold starts
+    ENABLE_MONGODB: bool = os.getenv("ENABLE_MONGODB", "false").lower() == "true"
+    ENABLE_CELERY: bool = os.getenv("ENABLE_CELERY", "false").lower() == "true"
+    
+    # Coalescing of identical concurrent upstream fetches
+    # 'local' coalesces within a worker process, 'redis' also coalesces across workers
+    SINGLEFLIGHT_BACKEND: str = os.getenv("SINGLEFLIGHT_BACKEND", "local")
+    SINGLEFLIGHT_TIMEOUT: int = int(os.getenv("SINGLEFLIGHT_TIMEOUT", "60"))
+    
+    # Stale-while-revalidate for cached prices and news (in seconds)
+    # Cached data younger than the fresh TTL is served as is; data older than that but
+    # within the stale budget is served immediately and refreshed in the background
+    PRICE_FRESH_TTL: int = int(os.getenv("PRICE_FRESH_TTL", "300"))
+    PRICE_STALE_BUDGET: int = int(os.getenv("PRICE_STALE_BUDGET", "86400"))
+    NEWS_FRESH_TTL: int = int(os.getenv("NEWS_FRESH_TTL", "900"))
+    NEWS_STALE_BUDGET: int = int(os.getenv("NEWS_STALE_BUDGET", "21600"))
+    REFRESH_WORKERS: int = int(os.getenv("REFRESH_WORKERS", "4"))
+    
     # CORS settings for frontend
     # Allow requests from all possible frontend deployment locations
     CORS_ORIGINS: list = [
@@ -45,5 +96,55 @@ class Settings:
     TOGETHER_API_BASE_URL: str = "https://api.together.xyz/v1/chat/completions"
     TOGETHER_API_MODEL: str = "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free"
     TOGETHER_API_TIMEOUT: int = 120
+    TOGETHER_MAX_CONCURRENCY: int = int(os.getenv("TOGETHER_MAX_CONCURRENCY", "4"))
+    
+    # Backend generating AI summaries: 'together' (Together AI), 'openai' (any OpenAI-compatible
+    # chat completions API) or 'local' (extractive summaries computed in-process, no API key needed)
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "together")
+    
+    # OpenAI-compatible API, e.g. OpenAI or a local llama.cpp server (which accepts any API key)
+    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    OPENAI_API_BASE_URL: str = os.getenv("OPENAI_API_BASE_URL", "https://api.openai.com/v1/chat/completions")
+    OPENAI_API_MODEL: str = os.getenv("OPENAI_API_MODEL", "gpt-4o-mini")
+    OPENAI_API_TIMEOUT: int = 120
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+    
+    LOCAL_LLM_MAX_CONCURRENCY: int = int(os.getenv("LOCAL_LLM_MAX_CONCURRENCY", "2"))
+    
+    # How long precomputed summaries are served (in seconds)
+    SUMMARY_CACHE_TTL: int = int(os.getenv("SUMMARY_CACHE_TTL", "3600"))
+    
+    # Input-token budget of AI summary prompts (estimated locally): the instructions and price
+    # statistics come first, and the most relevant articles fill the rest
+    SUMMARY_PROMPT_TOKEN_BUDGET: int = int(os.getenv("SUMMARY_PROMPT_TOKEN_BUDGET", "1500"))
+    SUMMARY_DESCRIPTION_TOKENS: int = int(os.getenv("SUMMARY_DESCRIPTION_TOKENS", "48"))
+    
+    # Live quotes over WebSocket: seconds between polls of each subscribed symbol, threads
+    # polling Yahoo Finance, and symbols one connection may subscribe to
+    QUOTE_POLL_INTERVAL: float = float(os.getenv("QUOTE_POLL_INTERVAL", "15"))
+    QUOTE_POLL_WORKERS: int = int(os.getenv("QUOTE_POLL_WORKERS", "4"))
+    QUOTE_MAX_SYMBOLS_PER_CONNECTION: int = int(os.getenv("QUOTE_MAX_SYMBOLS_PER_CONNECTION", "50"))
+    
+    # 'local' fans quotes out within one worker; 'redis' shares them across workers through
+    # Redis pub/sub (REDIS_URL), with a single worker polling each symbol
+    QUOTE_PUBSUB_BACKEND: str = os.getenv("QUOTE_PUBSUB_BACKEND", "local")
+    
+    # Maintenance of the price cache and news databases (pruning, retention, VACUUM/ANALYZE):
+    # hours between scheduled runs (0 disables them) and days of news kept (0 keeps all)
+    MAINTENANCE_INTERVAL_HOURS: float = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+    NEWS_RETENTION_DAYS: int = int(os.getenv("NEWS_RETENTION_DAYS", "365"))
+    
+    # Opt-in profiling of API requests: requests with an X-Profile-Token header matching
+    # PROFILING_TOKEN and a PROFILING_SAMPLE_RATE share of all others are profiled with
+    # PROFILER ('cprofile', or 'pyinstrument' if installed). Profiled requests and requests
+    # slower than PROFILING_SLOW_REQUEST_MS are kept with their stage timings (the last
+    # PROFILING_MAX_CAPTURES profiled ones and the slowest PROFILING_MAX_CAPTURES others)
+    # for /api/admin/profiles (which needs the token too)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILER: str = os.getenv("PROFILER", "cprofile")
+    PROFILING_SLOW_REQUEST_MS: float = float(os.getenv("PROFILING_SLOW_REQUEST_MS", "1000"))
+    PROFILING_MAX_CAPTURES: int = int(os.getenv("PROFILING_MAX_CAPTURES", "50"))
 
 settings = Settings()
\ No newline at end of file
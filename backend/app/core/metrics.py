@@ -0,0 +1,104 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from prometheus_client import Counter, Histogram, CollectorRegistry, generate_latest, multiprocess
+from prometheus_client import CONTENT_TYPE_LATEST
+
+# Latency of each API route, labelled by the route template rather than the raw path
+# so that per-symbol URLs don't create a new time series each
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent processing HTTP requests",
+    ["method", "route", "status"],
+)
+
+# Latency of the individual stages of a request (cache lookup, upstream calls, DB writes)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Time spent in each processing stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+
+# Price cache lookups by result: 'hit' (no API call needed), 'partial' (some dates
+# need an API call) or 'miss' (nothing cached for the range)
+CACHE_REQUESTS = Counter(
+    "price_cache_requests_total",
+    "Price cache lookups by result",
+    ["result"],
+)
+
+# Calls made to upstream providers ('yahoo', 'fixtures', 'newsapi', 'together')
+UPSTREAM_CALLS = Counter(
+    "upstream_calls_total",
+    "Calls made to upstream APIs",
+    ["provider"],
+)
+
+UPSTREAM_RATE_LIMITS = Counter(
+    "upstream_rate_limited_total",
+    "Upstream calls rejected with HTTP 429",
+    ["provider"],
+)
+
+# Stale-while-revalidate background refreshes by kind ('prices', 'news') and result
+BACKGROUND_REFRESHES = Counter(
+    "background_refreshes_total",
+    "Background refreshes of stale cached data",
+    ["kind", "result"],
+)
+
+# Estimated input tokens of each AI summary prompt
+SUMMARY_PROMPT_TOKENS = Histogram(
+    "summary_prompt_tokens",
+    "Estimated input tokens of AI summary prompts",
+    buckets=(250, 500, 750, 1000, 1500, 2000, 3000, 4000, 8000),
+)
+
+# Stages of the request being captured by the profiling middleware: when it started, and
+# (stage, seconds from the start of the request, duration in seconds) for each stage
+_request_stages: ContextVar[Optional[Tuple[float, List[Tuple[str, float, float]]]]] = ContextVar("request_stages", default=None)
+
+@contextmanager
+def track_stage(stage: str):
+    """
+    Record the time spent in the wrapped block in the stage latency histogram,
+    and in the stages of the request if it is being captured.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage=stage).observe(elapsed)
+        collector = _request_stages.get()
+        if collector is not None:
+            collector[1].append((stage, start - collector[0], elapsed))
+
+@contextmanager
+def collect_stages():
+    """
+    Collect the stages timed with track_stage within the block, including in the
+    threads run_in_threadpool runs sync code in (they copy the context), but not in
+    background refreshes. Yields the list they are appended to.
+    """
+    stages = []
+    token = _request_stages.set((time.perf_counter(), stages))
+    try:
+        yield stages
+    finally:
+        _request_stages.reset(token)
+
+def render_metrics():
+    """
+    Return the metrics in the Prometheus text format together with its content type.
+    When running under several worker processes (PROMETHEUS_MULTIPROC_DIR is set),
+    the metrics of all workers are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
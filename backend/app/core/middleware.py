@@ -1,7 +1,11 @@
 from fastapi import Request
+from starlette.datastructures import MutableHeaders
 import asyncio
+import time
 from typing import Callable
 import logging
+from .metrics import REQUEST_LATENCY
+from .profiling import capture_request
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -14,6 +18,7 @@ class SequentialRequestMiddleware:
     """
     Middleware to ensure sequential processing of API requests.
     Only one request will be processed at a time, with others waiting in a queue.
+    Requests are captured for profiling while they are processed (see core.profiling).
     """
     
     def __init__(self, app):
@@ -25,18 +30,77 @@ class SequentialRequestMiddleware:
             await self.app(scope, receive, send)
             return
             
-        # Create a new send function that we'll use to intercept the response
+        capture = None
+        
+        # Intercept the response to record the status of captured requests, and tell
+        # clients of profiled ones where to download their profile
         async def send_wrapper(message):
+            if message["type"] == "http.response.start" and capture is not None:
+                capture.status = message["status"]
+                if capture.profiler is not None:
+                    MutableHeaders(scope=message).append("X-Profile-Id", capture.id)
             await send(message)
             
         # Process the request with semaphore to ensure sequential processing
+        queued_at = time.perf_counter()
         async with request_semaphore:
             # Extract path for logging
             path = scope.get("path", "unknown")
             method = scope.get("method", "unknown")
             logger.info(f"Processing request: {method} {path}")
             
-            # Process the request
-            await self.app(scope, receive, send_wrapper)
+            # Process the request, profiled and timed per stage if profiling is enabled
+            with capture_request(scope, time.perf_counter() - queued_at) as capture:
+                await self.app(scope, receive, send_wrapper)
             
-            logger.info(f"Request completed: {method} {path}")
\ No newline at end of file
+            logger.info(f"Request completed: {method} {path}")
+
+
+class MetricsMiddleware:
+    """
+    Middleware to record the latency of every API request per route and
+    populate the X-Process-Time response header.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        # Maps endpoint functions to their route templates, e.g. /api/stocks/{symbol}/prices
+        self.route_templates = {}
+    
+    def get_route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if endpoint not in self.route_templates:
+            template = "unmatched"
+            for route in getattr(scope.get("app"), "routes", []):
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            self.route_templates[endpoint] = template
+        return self.route_templates[endpoint]
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_time = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Process-Time", f"{time.perf_counter() - start_time:.4f}")
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(
+                method=scope.get("method", "unknown"),
+                route=self.get_route_template(scope),
+                status=str(status_code)
+            ).observe(time.perf_counter() - start_time)
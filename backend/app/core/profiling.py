@@ -0,0 +1,247 @@
+import cProfile
+import heapq
+import hmac
+import io
+import logging
+import marshal
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from .config import settings
+from .metrics import collect_stages
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Requests that are never captured, so reading the captures doesn't push them out
+EXCLUDED_PREFIXES = ("/api/admin/", "/metrics")
+
+# Functions listed in cProfile text reports, by cumulative time
+TEXT_REPORT_LINES = 60
+
+# Download formats of each profiler, the default first: (media type, file extension)
+PROFILE_FORMATS = {
+    "cprofile": {"text": ("text/plain", "txt"), "pstats": ("application/octet-stream", "prof")},
+    "pyinstrument": {"html": ("text/html", "html"), "text": ("text/plain", "txt")},
+}
+
+# Captured requests, each kind bounded by PROFILING_MAX_CAPTURES: the profiled ones,
+# oldest first, and the other slow ones as a min-heap of (duration, sequence, capture),
+# so that the fastest is evicted first and a burst of slowish requests can't push out
+# the slowest ones
+_profiled: deque = deque()
+_slow: List[Tuple[float, int, "RequestCapture"]] = []
+_slow_sequence = 0
+_captures_lock = threading.Lock()
+
+# A single profiler runs at a time: requests are processed one at a time anyway, and
+# profilers don't nest
+_profiler_lock = threading.Lock()
+
+
+class _CProfiler:
+    name = "cprofile"
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def render(self, fmt: str) -> bytes:
+        if fmt == "pstats":
+            # What Profile.dump_stats writes, readable with pstats or snakeviz
+            self._profile.create_stats()
+            return marshal.dumps(self._profile.stats)
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats("cumulative").print_stats(TEXT_REPORT_LINES)
+        return stream.getvalue().encode()
+
+
+class _PyinstrumentProfiler:
+    name = "pyinstrument"
+
+    def __init__(self):
+        from pyinstrument import Profiler
+        # Time spent awaiting is attributed to the awaiting code, not to whatever else
+        # the event loop ran meanwhile
+        self._profiler = Profiler(async_mode="enabled")
+
+    def start(self) -> None:
+        self._profiler.start()
+
+    def stop(self) -> None:
+        self._profiler.stop()
+
+    def render(self, fmt: str) -> bytes:
+        if fmt == "html":
+            return self._profiler.output_html().encode()
+        return self._profiler.output_text(unicode=True, color=False).encode()
+
+
+def _create_profiler():
+    if settings.PROFILER == "cprofile":
+        return _CProfiler()
+    if settings.PROFILER == "pyinstrument":
+        return _PyinstrumentProfiler()
+    raise ValueError(f"Unknown profiler: {settings.PROFILER}. Must be one of: {', '.join(PROFILE_FORMATS)}")
+
+
+class RequestCapture:
+    """
+    A captured request: what was requested, how long it and each of its stages took,
+    and its profile if it was profiled.
+    """
+
+    def __init__(self, scope, queued_seconds: float, profiler):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = scope.get("method", "unknown")
+        self.path = scope.get("path", "unknown")
+        self.query = scope.get("query_string", b"").decode("latin-1")
+        self.started_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        self.queued_seconds = queued_seconds
+        self.profiler = profiler
+        # Until the response starts; a request that fails before is answered with a 500
+        self.status = 500
+        self.duration = 0.0
+        self.stages: List[Tuple[str, float, float]] = []
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 2),
+            "queued_ms": round(self.queued_seconds * 1000, 2),
+            "profiler": self.profiler.name if self.profiler is not None else None,
+            "profile_formats": list(PROFILE_FORMATS[self.profiler.name]) if self.profiler is not None else [],
+            "stages": [
+                {"stage": stage, "start_ms": round(start * 1000, 2), "duration_ms": round(duration * 1000, 2)}
+                for stage, start, duration in self.stages
+            ]
+        }
+
+
+def is_valid_token(token: Optional[str]) -> bool:
+    """
+    Whether a token matches PROFILING_TOKEN (never, if it isn't set).
+    """
+    if not settings.PROFILING_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), settings.PROFILING_TOKEN.encode())
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile-token":
+            if is_valid_token(value.decode("latin-1")):
+                return True
+            break
+    return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+def _start_profiler(scope):
+    if not _wants_profile(scope) or not _profiler_lock.acquire(blocking=False):
+        return None
+    try:
+        profiler = _create_profiler()
+        profiler.start()
+        return profiler
+    except Exception as e:
+        _profiler_lock.release()
+        logger.warning(f"Could not profile {scope.get('path')}: {str(e)}")
+        return None
+
+
+@contextmanager
+def capture_request(scope, queued_seconds: float = 0.0):
+    """
+    Capture the request handled within the block, if PROFILING_ENABLED: profile it if it
+    carries the profiling token or is sampled, time its stages, and keep it if it was
+    profiled (the last PROFILING_MAX_CAPTURES of them) or took longer than
+    PROFILING_SLOW_REQUEST_MS (the slowest PROFILING_MAX_CAPTURES of them). Yields the
+    capture, or None if the request isn't captured.
+    """
+    if not settings.PROFILING_ENABLED or scope.get("path", "").startswith(EXCLUDED_PREFIXES):
+        yield None
+        return
+
+    capture = RequestCapture(scope, queued_seconds, _start_profiler(scope))
+    start = time.perf_counter()
+    try:
+        with collect_stages() as stages:
+            yield capture
+    finally:
+        capture.duration = time.perf_counter() - start
+        if capture.profiler is not None:
+            capture.profiler.stop()
+            _profiler_lock.release()
+        capture.stages = stages
+        if capture.profiler is not None or capture.duration * 1000 >= settings.PROFILING_SLOW_REQUEST_MS:
+            _keep(capture)
+
+
+def _keep(capture: RequestCapture) -> None:
+    global _slow_sequence
+    max_captures = max(settings.PROFILING_MAX_CAPTURES, 1)
+    with _captures_lock:
+        if capture.profiler is not None:
+            _profiled.append(capture)
+            while len(_profiled) > max_captures:
+                _profiled.popleft()
+        else:
+            _slow_sequence += 1
+            entry = (capture.duration, _slow_sequence, capture)
+            if len(_slow) < max_captures:
+                heapq.heappush(_slow, entry)
+            elif entry > _slow[0]:
+                heapq.heapreplace(_slow, entry)
+            else:
+                return
+            while len(_slow) > max_captures:
+                heapq.heappop(_slow)
+    logger.info(
+        f"Captured {capture.method} {capture.path} ({capture.duration * 1000:.0f} ms"
+        + (f", profiled with {capture.profiler.name})" if capture.profiler is not None else ")")
+    )
+
+
+def get_captures(limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Summaries of the captured requests, slowest first.
+    """
+    with _captures_lock:
+        captures = list(_profiled) + [capture for _, _, capture in _slow]
+    captures.sort(key=lambda capture: capture.duration, reverse=True)
+    return [capture.summary() for capture in captures[:limit]]
+
+
+def get_capture(capture_id: str) -> Optional[RequestCapture]:
+    with _captures_lock:
+        captures = list(_profiled) + [capture for _, _, capture in _slow]
+    return next((capture for capture in captures if capture.id == capture_id), None)
+
+
+def render_profile(capture: RequestCapture, fmt: Optional[str] = None) -> Tuple[bytes, str, str]:
+    """
+    The profile of a captured request in one of its profiler's formats (the first by
+    default), with its media type and a file name. Raises ValueError for other formats.
+    """
+    formats = PROFILE_FORMATS[capture.profiler.name]
+    fmt = fmt or next(iter(formats))
+    if fmt not in formats:
+        raise ValueError(f"Unknown format for a {capture.profiler.name} profile: {fmt}. Must be one of: {', '.join(formats)}")
+    media_type, extension = formats[fmt]
+    return capture.profiler.render(fmt), media_type, f"profile-{capture.id}.{extension}"
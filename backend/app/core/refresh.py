@@ -0,0 +1,57 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+from .config import settings
+from .metrics import BACKGROUND_REFRESHES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Background refreshes run on a small dedicated pool so they never block requests
+_executor = ThreadPoolExecutor(max_workers=settings.REFRESH_WORKERS, thread_name_prefix="refresh")
+
+# Refresh state by key, e.g. ('prices', 'AAPL'): status, started_at, finished_at, error
+_refresh_state: Dict[Tuple, Dict[str, Any]] = {}
+_state_lock = threading.Lock()
+
+
+def refresh_in_background(key: Tuple, kind: str, fn: Callable[[], Any]) -> bool:
+    """
+    Run fn on the background pool unless a refresh with the same key is already
+    running. Returns True if a refresh was scheduled.
+    """
+    with _state_lock:
+        state = _refresh_state.get(key)
+        if state and state["status"] == "running":
+            return False
+        _refresh_state[key] = {"status": "running", "started_at": time.time(), "finished_at": None, "error": None}
+
+    def run():
+        error = None
+        try:
+            fn()
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"Background refresh of {key} failed: {error}")
+        finally:
+            with _state_lock:
+                _refresh_state[key].update(
+                    status="failed" if error else "done",
+                    finished_at=time.time(),
+                    error=error
+                )
+            BACKGROUND_REFRESHES.labels(kind=kind, result="failed" if error else "done").inc()
+
+    logger.info(f"Scheduling background refresh of {key}")
+    _executor.submit(run)
+    return True
+
+
+def get_refresh_state(key: Tuple) -> Dict[str, Any]:
+    """
+    Return a copy of the refresh state for a key, or an empty dict if it was never refreshed.
+    """
+    with _state_lock:
+        return dict(_refresh_state.get(key, {}))
@@ -0,0 +1,136 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Tuple
+from .config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Lua script that deletes the lock only if it is still held by the caller
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# How long a cross-worker result stays available to followers
+RESULT_TTL_MS = 10000
+
+# How often cross-worker followers check for the leader's result
+POLL_INTERVAL = 0.05
+
+
+class _Call:
+    """
+    An in-flight call whose result is shared by every caller with the same key.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# In-flight calls of this process, by key
+_calls = {}
+_calls_lock = threading.Lock()
+
+_redis_client = None
+
+
+def _get_redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis_client
+
+
+def _local_single_flight(key: Tuple, fn: Callable[[], Any]) -> Any:
+    with _calls_lock:
+        call = _calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _Call()
+            _calls[key] = call
+
+    if not is_leader:
+        logger.info(f"Waiting for in-flight call {key}")
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+
+
+def _redis_single_flight(key: Tuple, fn: Callable[[], Any]) -> Any:
+    name = "singleflight:" + ":".join(str(part) for part in key)
+    lock_key = f"{name}:lock"
+    result_key = f"{name}:result"
+    token = uuid.uuid4().hex
+
+    try:
+        client = _get_redis()
+        is_leader = client.set(lock_key, token, nx=True, px=settings.SINGLEFLIGHT_TIMEOUT * 1000)
+    except Exception as e:
+        logger.warning(f"Redis unavailable for request coalescing, calling directly: {str(e)}")
+        return fn()
+
+    if is_leader:
+        try:
+            # Drop the result of a previous flight so followers wait for this one
+            client.delete(result_key)
+            result = fn()
+            client.set(result_key, json.dumps(result), px=RESULT_TTL_MS)
+            return result
+        finally:
+            try:
+                client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+            except Exception as e:
+                logger.warning(f"Failed to release coalescing lock {lock_key}: {str(e)}")
+
+    # Another worker is fetching: wait for its result while it holds the lock
+    logger.info(f"Waiting for in-flight call {key} in another worker")
+    deadline = time.monotonic() + settings.SINGLEFLIGHT_TIMEOUT
+    try:
+        while time.monotonic() < deadline:
+            raw_result = client.get(result_key)
+            if raw_result is not None:
+                return json.loads(raw_result)
+            if not client.exists(lock_key):
+                # The leader finished without a result (e.g. it failed), so fetch ourselves
+                break
+            time.sleep(POLL_INTERVAL)
+    except Exception as e:
+        logger.warning(f"Redis error while waiting for in-flight call {key}: {str(e)}")
+    return fn()
+
+
+def single_flight(key: Tuple, fn: Callable[[], Any]) -> Any:
+    """
+    Run fn once for all concurrent callers with the same key, e.g.
+    ('yahoo', symbol, period). The first caller (the leader) runs fn and the
+    others wait for and share its result, or its exception.
+
+    Calls are always coalesced within the process. With SINGLEFLIGHT_BACKEND=redis
+    they are also coalesced across workers through a Redis lock; in that case the
+    result must be JSON-serializable, and followers in other workers run fn
+    themselves if the leader fails.
+    """
+    if settings.SINGLEFLIGHT_BACKEND == "redis":
+        return _local_single_flight(key, lambda: _redis_single_flight(key, fn))
+    return _local_single_flight(key, fn)
@@ -1,8 +1,9 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from pymongo import MongoClient
 from ..core.config import settings
 from .models import Base
+from .fts import ensure_news_fts
+from .schema import upgrade_schema
 import os
 
 # SQLite setup
@@ -21,11 +22,13 @@ if settings.DATABASE_URL.startswith('sqlite'):
 
 engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
 Base.metadata.create_all(bind=engine)  # Create new tables with updated schema
+upgrade_schema(engine)  # Add columns the models gained to existing tables
+NEWS_SEARCH_ENABLED = ensure_news_fts(engine)  # Full-text index over stored news
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # MongoDB setup
-mongo_client = MongoClient(settings.MONGODB_URL)
-mongo_db = mongo_client[settings.MONGODB_DB]
+# The client is created lazily on first use, and only when MongoDB is enabled
+_mongo_db = None
 
 def get_db():
     db = SessionLocal()
@@ -35,4 +38,11 @@ def get_db():
         db.close()
 
 def get_mongo_db():
-    return mongo_db
\ No newline at end of file
+    global _mongo_db
+    if not settings.ENABLE_MONGODB:
+        raise RuntimeError("MongoDB is disabled. Set ENABLE_MONGODB=true to enable it.")
+    if _mongo_db is None:
+        from pymongo import MongoClient
+        mongo_client = MongoClient(settings.MONGODB_URL)
+        _mongo_db = mongo_client[settings.MONGODB_DB]
+    return _mongo_db
@@ -0,0 +1,61 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# External-content FTS5 table over the title and description of stock_news: it
+# stores only the index, and the triggers keep it in sync with the table
+NEWS_FTS_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS stock_news_fts USING fts5(
+        title,
+        description,
+        content='stock_news',
+        content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stock_news_fts_insert AFTER INSERT ON stock_news BEGIN
+        INSERT INTO stock_news_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stock_news_fts_delete AFTER DELETE ON stock_news BEGIN
+        INSERT INTO stock_news_fts(stock_news_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stock_news_fts_update AFTER UPDATE ON stock_news BEGIN
+        INSERT INTO stock_news_fts(stock_news_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO stock_news_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def ensure_news_fts(engine: Engine) -> bool:
+    """
+    Create the full-text index over stored news and its triggers if they don't exist,
+    indexing the articles already stored. Only SQLite is supported; returns False
+    (and leaves news search disabled) for other databases or SQLite builds without FTS5.
+    """
+    if engine.dialect.name != "sqlite":
+        logger.info("News full-text search requires SQLite, skipping the FTS5 index")
+        return False
+
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stock_news_fts'"
+            )).first() is not None
+            for statement in NEWS_FTS_STATEMENTS:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text("INSERT INTO stock_news_fts(stock_news_fts) VALUES ('rebuild')"))
+                logger.info("Created the news full-text index")
+        return True
+    except Exception as e:
+        logger.error(f"Could not create the news full-text index: {str(e)}")
+        return False
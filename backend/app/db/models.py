@@ -33,7 +33,9 @@ class StockNews(Base):
     stock_id = Column(Integer, ForeignKey("stocks.id"))
     title = Column(String)
     description = Column(Text)
-    url = Column(String)
+    url = Column(String, index=True)
     source = Column(String)
     published_at = Column(DateTime, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+    cluster_id = Column(String, index=True)  # Shared by near-duplicate copies of a story
+    sentiment = Column(Float)  # Compound score in (-1, 1)
\ No newline at end of file
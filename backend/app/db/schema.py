@@ -0,0 +1,33 @@
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from .models import Base
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Add the columns and indexes that the models gained since an existing
+    database was created: create_all only creates missing tables, so databases that
+    aren't reset at startup (production, Postgres, tools) would otherwise keep the old
+    schema. Idempotent; new columns must be nullable, as existing rows get NULL.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            added = [column for column in table.columns if column.name not in existing]
+            for column in added:
+                if not column.nullable:
+                    logger.error(f"Can't add the non-nullable column {table.name}.{column.name} to an existing table")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                logger.info(f"Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
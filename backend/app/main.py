@@ -1,8 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from .api import stocks, news, news_summary
+from .api import stocks, news, news_summary, market, quotes, admin
 import logging
-from .core.middleware import SequentialRequestMiddleware
+from .core.middleware import SequentialRequestMiddleware, MetricsMiddleware
+from .core.metrics import render_metrics
+from .db.database import SessionLocal
+from .db.seed import seed_default_stocks
+from .services.search_service import build_search_index
+from .services.maintenance_service import start_maintenance_scheduler
 
 # Configure logging
 logging.basicConfig(
@@ -27,7 +32,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Process-Time", "X-Rate-Limit"],
+    expose_headers=["X-Process-Time", "X-Rate-Limit", "X-Data-Freshness", "X-Data-As-Of", "X-Profile-Id"],
     max_age=600,  # Cache preflight requests for 10 minutes
 )
 
@@ -35,15 +40,48 @@ app.add_middleware(
 # This helps reduce the number of Yahoo Finance API calls
 app.add_middleware(SequentialRequestMiddleware)
 
+# Add metrics middleware last so it is the outermost one and the recorded latency
+# (and X-Process-Time header) includes the time spent waiting for the semaphore
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(stocks.router, prefix="/api")
 app.include_router(news.router, prefix="/api")
 app.include_router(news_summary.router, prefix="/api")
+app.include_router(market.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(quotes.router)
+
+@app.on_event("startup")
+def load_stocks():
+    """
+    Seed the stocks table if needed and build the symbol search index from it.
+    """
+    db = SessionLocal()
+    try:
+        build_search_index([
+            {"symbol": stock.symbol, "name": stock.name, "category": stock.category, "region": stock.region}
+            for stock in seed_default_stocks(db)
+        ])
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def schedule_maintenance():
+    """
+    Prune, expire and compact the cache databases every MAINTENANCE_INTERVAL_HOURS.
+    """
+    start_maintenance_scheduler(SessionLocal)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to Stock News API"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, headers={"Content-Type": content_type})
+
 @app.get("/api")
 async def api_root():
     return {
@@ -51,7 +89,16 @@ async def api_root():
         "version": settings.VERSION,
         "endpoints": [
             "/api/stocks",
+            "/api/stocks/search",
             "/api/stocks/{symbol}/news",
-            "/api/stocks/{symbol}/news-summary"
+            "/api/stocks/{symbol}/sentiment",
+            "/api/news/search",
+            "/api/stocks/{symbol}/news-summary",
+            "/api/stocks/news-summaries/precompute",
+            "/api/stocks/{symbol}/indicators",
+            "/api/market/snapshot",
+            "/api/market/correlation",
+            "/api/market/screener",
+            "/ws/quotes"
         ]
     }
\ No newline at end of file
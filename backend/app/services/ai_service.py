@@ -1,32 +1,30 @@
 import logging
-import json
-import requests
 from typing import Dict, Any, List
 from ..core.config import settings
-from time import sleep
+from ..core.metrics import SUMMARY_PROMPT_TOKENS
+from .prompt_service import estimate_tokens, select_articles, format_price_statistics
+from .llm_service import CompletionRequest, LLMError, get_llm_backend
+from .price_series import PriceSeries, date_strings
 
 logger = logging.getLogger(__name__)
 
-def generate_news_summary(symbol: str, news_articles: List[Dict[str, Any]], price_data: List[Dict[str, Any]], date: str = None) -> Dict[str, Any]:
+# Marks where the articles go in the prompt, once the budget left for them is known
+NEWS_PLACEHOLDER = "<<news articles>>"
+
+def build_summary_request(symbol: str, news_articles: List[Dict[str, Any]], price_data: PriceSeries, date: str = None, market_statistics: Dict[str, Any] = None, company_name: str = None) -> Dict[str, Any]:
     """
-    Generate a summary of news articles and analyze correlation with price trends using Together AI.
+    Build the completion request for a summary of news articles and their correlation with price trends.
     
     Args:
         symbol: The stock symbol
         news_articles: List of news articles with title, description, etc.
-        price_data: List of price data points with timestamp, close, etc.
+        price_data: Daily prices of the period
+        market_statistics: Optional beta, correlation and volatility against the market benchmark
+        company_name: Optional company name, used to rank articles by relevance
     
     Returns:
-        Dictionary with summary and analysis
+        Dictionary with status 'success' and the CompletionRequest, or status 'error' and a message
     """
-    # Validate API key
-    if not settings.TOGETHER_API_KEY:
-        logger.error("TOGETHER_API_KEY not configured in settings")
-        return {
-            "status": "error",
-            "message": "TOGETHER_API_KEY environment variable is not properly configured"
-        }
-    
     if not news_articles:
         logger.warning(f"No news articles provided for {symbol}")
         return {
@@ -62,37 +60,32 @@ def generate_news_summary(symbol: str, news_articles: List[Dict[str, Any]], pric
         # Use filtered news if available, otherwise use original news
         news_to_analyze = filtered_news if filtered_news else news_articles
         
-        # Filter price data for the specific date
-        filtered_price = []
-        for price_point in price_data:
-            timestamp = price_point.get('timestamp', '')
-            # Extract date part from timestamp
-            if timestamp:
-                # Handle different timestamp formats
-                if ' ' in timestamp:  # Format: YYYY-MM-DD HH:MM:SS
-                    price_date = timestamp.split(' ')[0]
-                else:  # Try to extract YYYY-MM-DD part
-                    price_date = timestamp[:10] if len(timestamp) >= 10 else timestamp
-                
-                # Compare with the requested date
-                if price_date == date:  # Exact date match
-                    filtered_price.append(price_point)
+        # Filter price data for the specific date (a binary search over the dates)
+        try:
+            filtered_price = price_data.between(date, date)
+        except ValueError:  # Not a YYYY-MM-DD date, so no price matches it
+            filtered_price = price_data[:0]
+        # A date without trading only has an empty price, which doesn't count as a match
+        filtered_price = filtered_price.priced()
         
         # Use filtered price if available, otherwise use original price data
-        price_to_analyze = filtered_price if filtered_price else price_data
+        price_to_analyze = filtered_price if len(filtered_price) else price_data
     else:
         news_to_analyze = news_articles
         price_to_analyze = price_data
     
-    # Prepare news data for the prompt
-    news_text = "\n\n".join([f"Title: {article.get('title', '')}\nSource: {article.get('source', '')}\nDate: {article.get('published_at', '')}\nDescription: {article.get('description', '')}" 
-                           for article in news_to_analyze[:10]])  # Limit to 10 articles to avoid token limits
+    # Dates without trading are cached with empty prices
+    price_to_analyze = price_to_analyze.priced()
+    if not len(price_to_analyze):
+        logger.warning(f"No closing prices provided for {symbol}")
+        return {
+            "status": "error",
+            "message": "No price data available for analysis"
+        }
     
     # Extract price trend information
-    start_price = price_to_analyze[0]['close'] if price_to_analyze else None
-    end_price = price_to_analyze[-1]['close'] if price_to_analyze else None
-    price_change = None
-    price_change_percent = None
+    start_price = float(price_to_analyze.close[0])
+    end_price = float(price_to_analyze.close[-1])
     
     # Extract date information for analysis period
     # If a specific date is provided, use it directly to avoid any inconsistencies
@@ -100,18 +93,37 @@ def generate_news_summary(symbol: str, news_articles: List[Dict[str, Any]], pric
         start_date = date
         end_date = date
     else:
-        start_date = price_to_analyze[0].get('timestamp', 'N/A').split(' ')[0] if price_to_analyze and ' ' in price_to_analyze[0].get('timestamp', 'N/A') else price_to_analyze[0].get('timestamp', 'N/A')[:10] if price_to_analyze else 'N/A'
-        end_date = price_to_analyze[-1].get('timestamp', 'N/A').split(' ')[0] if price_to_analyze and ' ' in price_to_analyze[-1].get('timestamp', 'N/A') else price_to_analyze[-1].get('timestamp', 'N/A')[:10] if price_to_analyze else 'N/A'
+        start_date, end_date = date_strings(price_to_analyze.days[[0, -1]])
+    
+    price_change = end_price - start_price
+    price_change_percent = (price_change / start_price) * 100
     
-    if start_price is not None and end_price is not None:
-        price_change = end_price - start_price
-        price_change_percent = (price_change / start_price) * 100
+    # Daily closes and moves, so the analysis can tie news to the days the price moved
+    price_text = format_price_statistics(price_to_analyze, [(article.get('published_at') or '')[:10] for article in news_to_analyze])
+
+    # Describe how the stock moves with the market, so price moves can be told apart from market-wide ones
+    market_context = ""
+    if market_statistics:
+        def fmt(value, suffix=""):
+            return f"{value:.2f}{suffix}" if value is not None else "N/A"
+        benchmark = market_statistics["benchmark"].replace("^", "")
+        market_context = (
+            f"Market context over the last year (daily returns against {benchmark}): "
+            f"beta {fmt(market_statistics.get('beta'))}, correlation {fmt(market_statistics.get('correlation'))}, "
+            f"annualized volatility {fmt(market_statistics.get('volatility') * 100 if market_statistics.get('volatility') is not None else None, '%')}. "
+            f"Over that year {symbol.replace('^', '')} changed {fmt(market_statistics.get('change_percent'), '%')} "
+            f"and {benchmark} changed {fmt(market_statistics.get('benchmark_change_percent'), '%')}."
+        )
 
     # Construct the prompt for the AI
     prompt = f"""
 You are a financial analyst assistant. Based on the following news articles about {symbol.replace("^","")} stock and its price data, create a structured, professional analysis with proper HTML formatting for web display.
 
 {"Analysis for specific date: " + date if date else "Analysis for period: " + start_date + " to " + end_date}
+{market_context}
+
+Price data:
+{price_text}
 
 Format your response using the following HTML structure:
 
@@ -150,111 +162,115 @@ Format your response using the following HTML structure:
   </ul>
 </div>
 
-News Articles:
-{news_text}
+News Articles (date, source, title and description):
+{NEWS_PLACEHOLDER}
 
 Your analysis should be factual, balanced, and focus only on the relationship between news and price movements. Do not include any disclaimers, introductions, or conclusions - just the four HTML-formatted sections above. Ensure all HTML tags are properly closed and formatted. Make sure to reference the specific date in your analysis.
 """
     
-    # Prepare the API request
-    headers = {
-        "Authorization": f"Bearer {settings.TOGETHER_API_KEY}",
-        "Content-Type": "application/json"
-    }
+    # Fill the rest of the input-token budget with the most relevant recent articles
+    news_budget = settings.SUMMARY_PROMPT_TOKEN_BUDGET - estimate_tokens(prompt)
+    news_text, chosen_articles, available_articles = select_articles(
+        symbol, news_to_analyze, max(news_budget, 0), settings.SUMMARY_DESCRIPTION_TOKENS, company_name
+    )
+    prompt = prompt.replace(NEWS_PLACEHOLDER, news_text)
+    prompt_tokens = estimate_tokens(prompt)
+    SUMMARY_PROMPT_TOKENS.observe(prompt_tokens)
+    logger.info(f"Summary prompt for {symbol}: about {prompt_tokens} tokens with {len(chosen_articles)} of {available_articles} stories")
     
-    data = {
-        "model": settings.TOGETHER_API_MODEL,
-        "messages": [
-            {"role": "user", "content": prompt}
-        ],
-        "max_tokens": 1000,
-        "temperature": 0.7,
-        "top_p": 0.9,
-        "top_k": 40,
-        "repetition_penalty": 1.0,
-        "stop": ["<|im_end|>", "<|endoftext|>"]
+    context = {
+        "symbol": symbol,
+        "start_date": start_date,
+        "end_date": end_date,
+        "price_change": price_change,
+        "price_change_percent": price_change_percent,
+        "articles": chosen_articles,
+        "closes": list(zip(price_to_analyze.dates(), price_to_analyze.close.tolist()))
     }
-    
-    try:
-        # Add retry logic for Together API
-        max_retries = 3
-        retry_delay = 2
-        
-        for attempt in range(max_retries):
-            try:
-                response = requests.post(
-                    settings.TOGETHER_API_BASE_URL,
-                    headers=headers,
-                    json=data,
-                    timeout=settings.TOGETHER_API_TIMEOUT
-                )
-                
-                # Handle rate limiting specifically
-                if response.status_code == 429:
-                    logger.warning(f"Together API rate limit hit (attempt {attempt+1}/{max_retries})")
-                    if attempt == max_retries - 1:
-                        return {
-                            "status": "error",
-                            "message": "Together API rate limit reached. Please try again later."
-                        }
-                    sleep(retry_delay * (attempt + 1))
-                    continue
-                
-                response.raise_for_status()
-                result = response.json()
-                break  # Success, exit retry loop
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"API request error (attempt {attempt+1}/{max_retries}): {str(e)}")
-                if attempt == max_retries - 1:
-                    raise
-                sleep(retry_delay * (attempt + 1))
-        else:
-            # This executes if the for loop completes without a break
-            return {
-                "status": "error",
-                "message": f"Failed to connect to Together API after {max_retries} attempts"
-            }
-        
-        if 'choices' in result and len(result['choices']) > 0:
-            # For chat completions API, the response format is different
-            # The response contains 'message' with 'content' instead of 'text'
-            if 'message' in result['choices'][0] and 'content' in result['choices'][0]['message']:
-                summary_text = result['choices'][0]['message']['content'].strip()
-            elif 'text' in result['choices'][0]:
-                summary_text = result['choices'][0]['text'].strip()
-            else:
-                logger.error(f"Unexpected API response format: {result}")
-                return {
-                    "status": "error",
-                    "message": "Failed to generate summary: Could not find content in API response"
-                }
-            
-            # Use the full response without any filtering
-            formatted_text = summary_text
-            
-            return {
-                "status": "success",
-                "data": {
-                    "formatted_text": formatted_text
-                }
-            }
-        else:
-            logger.error(f"Unexpected API response format: {result}")
-            return {
-                "status": "error",
-                "message": "Failed to generate summary: Unexpected API response format"
-            }
-            
-    except requests.exceptions.RequestException as e:
-        logger.error(f"API request error: {str(e)}")
+    return {"status": "success", "request": CompletionRequest(prompt, context, max_tokens=1000, temperature=0.7)}
+
+def _summary_result(output: Any) -> Dict[str, Any]:
+    if isinstance(output, LLMError):
         return {
             "status": "error",
-            "message": f"Failed to generate summary: {str(e)}"
+            "message": str(output)
         }
-    except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}")
+    if isinstance(output, Exception):
+        logger.error(f"Unexpected error: {str(output)}")
         return {
             "status": "error",
-            "message": f"An unexpected error occurred: {str(e)}"
-        }
\ No newline at end of file
+            "message": f"An unexpected error occurred: {str(output)}"
+        }
+    return {
+        "status": "success",
+        "data": {
+            "formatted_text": output
+        }
+    }
+
+def _get_configured_backend():
+    """
+    Return (backend, None), or (None, error result) if the configured backend can't be used.
+    """
+    try:
+        backend = get_llm_backend()
+    except ValueError as e:
+        logger.error(str(e))
+        return None, {"status": "error", "message": str(e)}
+    if backend.configuration_error:
+        logger.error(f"LLM backend '{backend.name}' is not configured: {backend.configuration_error}")
+        return None, {"status": "error", "message": backend.configuration_error}
+    return backend, None
+
+def generate_news_summary(symbol: str, news_articles: List[Dict[str, Any]], price_data: PriceSeries, date: str = None, market_statistics: Dict[str, Any] = None, company_name: str = None) -> Dict[str, Any]:
+    """
+    Generate a summary of news articles and analyze correlation with price trends
+    using the configured LLM backend (LLM_BACKEND).
+    
+    Args:
+        symbol: The stock symbol
+        news_articles: List of news articles with title, description, etc.
+        price_data: Daily prices of the period
+        market_statistics: Optional beta, correlation and volatility against the market benchmark
+        company_name: Optional company name, used to rank articles by relevance
+    
+    Returns:
+        Dictionary with summary and analysis
+    """
+    backend, error = _get_configured_backend()
+    if error:
+        return error
+    
+    built = build_summary_request(symbol, news_articles, price_data, date, market_statistics, company_name)
+    if built["status"] != "success":
+        return built
+    
+    try:
+        return _summary_result(backend.generate(built["request"]))
+    except Exception as e:
+        return _summary_result(e)
+
+def generate_news_summaries(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Generate the summaries of several symbols in one batched pass of the LLM backend,
+    within its concurrency cap. Each item holds the keyword arguments of
+    generate_news_summary; results are returned in the same order.
+    """
+    backend, error = _get_configured_backend()
+    if error:
+        return [error for _ in items]
+    
+    results: List[Dict[str, Any]] = [None] * len(items)
+    pending = []
+    for index, item in enumerate(items):
+        built = build_summary_request(**item)
+        if built["status"] == "success":
+            pending.append((index, built["request"]))
+        else:
+            results[index] = built
+    
+    outputs = backend.generate_batch([request for _, request in pending])
+    for (index, _), output in zip(pending, outputs):
+        results[index] = _summary_result(output)
+    logger.info(f"Generated {len(pending)} summaries in one batch with the '{backend.name}' backend")
+    return results
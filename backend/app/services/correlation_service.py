@@ -0,0 +1,360 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from .stock_values_db import get_close_history, get_date_range_for_period, register_store_listener
+from .stock_service import refresh_stock_data
+from ..core.refresh import refresh_in_background
+from ..core.config import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Symbol that betas are measured against
+BENCHMARK_SYMBOL = "^GSPC"
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class ReturnsMatrix:
+    """
+    Daily closes of several symbols aligned on a common date index, as one
+    contiguous (dates x symbols) array, with NaN where a symbol has no bar.
+    Returns are log returns from each symbol's previous available close, so a
+    holiday on one exchange doesn't drop the next day's move.
+    """
+
+    def __init__(self, dates: List[str], symbols: List[str], closes: np.ndarray):
+        self.dates = dates
+        self.symbols = symbols
+        self.index = {symbol: column for column, symbol in enumerate(symbols)}
+        self.closes = closes
+        self.returns = _log_returns(closes)
+        # Symbols the matrix was built for, including those with no cached prices
+        self.requested = set(symbols)
+        # When it was fully built, and when the requested symbols without cached prices
+        # were last looked up
+        self.built_at = time.time()
+        self.missing_checked_at = self.built_at
+        # Requested symbols whose prices were stored after their column was loaded
+        self.stale_symbols = set()
+
+    def select(self, symbols: List[str]) -> "ReturnsMatrix":
+        """
+        Return the matrix restricted to the given symbols (which must all be present),
+        without the leading dates on which none of them traded.
+        """
+        columns = [self.index[symbol] for symbol in symbols]
+        closes = np.take(self.closes, columns, axis=1)
+        traded = np.flatnonzero(~np.isnan(closes).all(axis=1))
+        start = traded[0] if len(traded) else len(self.dates)
+        return ReturnsMatrix(self.dates[start:], list(symbols), np.ascontiguousarray(closes[start:]))
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """
+    Forward-fill NaN values down each column, leaving leading NaN values in place.
+    """
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[rows, np.arange(values.shape[1])]
+    return filled
+
+
+def _log_returns(closes: np.ndarray) -> np.ndarray:
+    if len(closes) < 2:
+        return np.empty((0, closes.shape[1]))
+    previous = _forward_fill(closes)[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.log(closes[1:] / previous)
+
+
+# Matrices by period, shared by every subset of symbols requested; the columns of symbols
+# whose prices are stored are reloaded on the next request. A lock per period keeps
+# concurrent requests from loading the same columns, without blocking the other periods
+_matrices: Dict[str, ReturnsMatrix] = {}
+_matrices_lock = threading.Lock()
+_build_locks: Dict[str, threading.Lock] = {}
+
+
+def _load_closes(symbols: List[str], start_date: str) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    The closes of the symbols since start_date aligned on their dates, with the dates
+    and the symbols that have cached prices.
+    """
+    history = get_close_history(symbols, start_date)
+    cached_symbols = [symbol for symbol in symbols if symbol in history]
+
+    all_dates = sorted({date for symbol in cached_symbols for date, _ in history[symbol]})
+    date_index = np.array(all_dates, dtype="datetime64[D]")
+    closes = np.full((len(all_dates), len(cached_symbols)), np.nan)
+    for column, symbol in enumerate(cached_symbols):
+        rows = history[symbol]
+        positions = np.searchsorted(date_index, np.array([date for date, _ in rows], dtype="datetime64[D]"))
+        closes[positions, column] = [close for _, close in rows]
+    return all_dates, cached_symbols, closes
+
+
+def _build_matrix(symbols: List[str], period: str, base: Optional[ReturnsMatrix] = None) -> ReturnsMatrix:
+    """
+    Build the matrix of the symbols from the price cache or, given the current matrix,
+    reload only their columns and keep the others (from the start of the period on).
+    """
+    start_date = get_date_range_for_period(period)[0].strftime("%Y-%m-%d")
+    dates, loaded, closes = _load_closes(symbols, start_date)
+    if base is None:
+        logger.info(f"Built {period} returns matrix of {len(dates)} dates x {len(loaded)} symbols")
+        matrix = ReturnsMatrix(dates, loaded, closes)
+        matrix.requested.update(symbols)
+        return matrix
+
+    reloaded = set(symbols)
+    kept = [symbol for symbol in base.symbols if symbol not in reloaded]
+    first = bisect.bisect_left(base.dates, start_date)
+    base_dates = base.dates[first:]
+    all_dates = sorted(set(base_dates) | set(dates))
+    date_index = np.array(all_dates, dtype="datetime64[D]")
+    merged = np.full((len(all_dates), len(kept) + len(loaded)), np.nan)
+    rows = np.searchsorted(date_index, np.array(base_dates, dtype="datetime64[D]"))
+    merged[rows, :len(kept)] = base.closes[first:][:, [base.index[symbol] for symbol in kept]]
+    merged[np.searchsorted(date_index, np.array(dates, dtype="datetime64[D]")), len(kept):] = closes
+    # Without the dates only the reloaded symbols had, if they no longer do
+    traded = np.flatnonzero(~np.isnan(merged).all(axis=1))
+
+    logger.info(f"Reloaded {len(symbols)} columns of the {period} returns matrix of {len(traded)} dates x {merged.shape[1]} symbols")
+    matrix = ReturnsMatrix([all_dates[row] for row in traded], kept + loaded, np.ascontiguousarray(merged[traded]))
+    matrix.requested = base.requested | reloaded
+    matrix.built_at = base.built_at
+    matrix.missing_checked_at = base.missing_checked_at
+    return matrix
+
+
+def _expired(matrix: ReturnsMatrix, now: float) -> bool:
+    # A shared Postgres price store is also written by other instances, which don't notify this one
+    return settings.PRICE_STORE_BACKEND == "postgres" and now - matrix.built_at > settings.PRICE_FRESH_TTL
+
+
+def _needs_update(matrix: Optional[ReturnsMatrix], symbols: List[str], now: float) -> bool:
+    return (
+        matrix is None
+        or _expired(matrix, now)
+        or bool(matrix.stale_symbols)
+        or any(symbol not in matrix.requested for symbol in symbols)
+        or (any(symbol not in matrix.index for symbol in symbols) and now - matrix.missing_checked_at > settings.PRICE_FRESH_TTL)
+    )
+
+
+def _update_matrix(symbols: List[str], period: str) -> ReturnsMatrix:
+    """
+    Bring the matrix of a period up to date for the symbols, loading only the columns
+    that changed, outside of _matrices_lock so that requests served from the current
+    matrices don't wait for it. Called with the period's build lock held.
+    """
+    now = time.time()
+    with _matrices_lock:
+        base = _matrices.get(period)
+        if not _needs_update(base, symbols, now):
+            return base
+        full = base is None or _expired(base, now)
+        reload = set()
+        if not full:
+            reload = base.stale_symbols | {symbol for symbol in symbols if symbol not in base.requested}
+            recheck_missing = now - base.missing_checked_at > settings.PRICE_FRESH_TTL
+            if recheck_missing:
+                reload |= {symbol for symbol in base.requested if symbol not in base.index}
+        if base is not None:
+            # Prices stored while the columns load mark the new matrix stale
+            stale_symbols = base.stale_symbols
+            base.stale_symbols = set()
+
+    try:
+        if full:
+            known = list(base.requested) if base is not None else []
+            matrix = _build_matrix(list(dict.fromkeys(known + symbols)), period)
+        else:
+            matrix = _build_matrix(sorted(reload), period, base)
+            if recheck_missing:
+                matrix.missing_checked_at = now
+    except Exception:
+        if base is not None:
+            with _matrices_lock:
+                base.stale_symbols |= stale_symbols
+        raise
+
+    with _matrices_lock:
+        if base is not None:
+            matrix.stale_symbols = base.stale_symbols
+        _matrices[period] = matrix
+    return matrix
+
+
+def get_returns_matrix(symbols: List[str], period: str = "1y") -> ReturnsMatrix:
+    """
+    Return the aligned closes and returns of the given symbols from the price cache.
+    The matrix is built once per period and grown when new symbols are requested; the
+    columns of symbols whose prices are stored are reloaded (with a shared Postgres
+    price store, which other instances write to, the whole matrix is rebuilt after
+    PRICE_FRESH_TTL). Symbols with no cached prices are left out and warmed up in the
+    background (and looked up again after PRICE_FRESH_TTL), so this never waits on
+    Yahoo Finance.
+    """
+    with _matrices_lock:
+        matrix = _matrices.get(period)
+        build_lock = _build_locks.setdefault(period, threading.Lock())
+    if _needs_update(matrix, symbols, time.time()):
+        with build_lock:
+            matrix = _update_matrix(symbols, period)
+
+    missing = [symbol for symbol in symbols if symbol not in matrix.index]
+    for symbol in missing:
+        refresh_in_background(("prices", symbol), "prices", lambda symbol=symbol: refresh_stock_data(symbol, period))
+    return matrix.select([symbol for symbol in symbols if symbol in matrix.index])
+
+
+def _benchmark_statistics(returns: np.ndarray, benchmark: np.ndarray, window: int, include_rolling: bool = True):
+    """
+    Full-period and rolling correlation (None unless include_rolling) and beta of every
+    column against the benchmark returns, over the dates on which both have a return.
+    """
+    both = ~np.isnan(returns) & ~np.isnan(benchmark)[:, None]
+    x = np.where(both, returns, 0.0)
+    y = np.where(both, benchmark[:, None], 0.0)
+
+    # Running sums along the dates give both the full-period and the rolling statistics
+    sums = [np.cumsum(values, axis=0) for values in (both.astype(np.float64), x, y, x * x, y * y, x * y)]
+    zero = np.zeros((1, returns.shape[1]))
+    sums = [np.vstack((zero, values)) for values in sums]
+
+    def statistics(lag: int):
+        n, sx, sy, sxx, syy, sxy = [values[lag:] - values[:-lag] for values in sums]
+        covariance = n * sxy - sx * sy
+        variance_x = n * sxx - sx * sx
+        variance_y = n * syy - sy * sy
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = covariance / np.sqrt(variance_x * variance_y)
+            beta = covariance / variance_y
+        return n, correlation, beta
+
+    n, correlation, beta = statistics(len(returns)) if len(returns) else (zero, zero * np.nan, zero * np.nan)
+    enough = n[0] >= 3
+    full_correlation = np.where(enough, correlation[0], np.nan)
+    full_beta = np.where(enough, beta[0], np.nan)
+
+    if not include_rolling:
+        rolling_correlation = None
+    elif len(returns) >= window:
+        n, rolling_correlation, _ = statistics(window)
+        rolling_correlation = np.where(n >= max(3, window // 2), rolling_correlation, np.nan)
+        rolling_correlation = np.vstack((np.full((window - 1, returns.shape[1]), np.nan), rolling_correlation))
+    else:
+        rolling_correlation = np.full(returns.shape, np.nan)
+    return full_correlation, full_beta, rolling_correlation
+
+
+def correlation_matrix(returns: np.ndarray) -> np.ndarray:
+    """
+    Pairwise correlation of the columns over the dates on which both have a return,
+    computed with matrix products instead of a loop over pairs.
+    """
+    present = (~np.isnan(returns)).astype(np.float64)
+    x = np.nan_to_num(returns)
+    n = present.T @ present
+    sx = x.T @ present
+    sxx = (x * x).T @ present
+    sxy = x.T @ x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = (n * sxy - sx * sx.T) / np.sqrt((n * sxx - sx * sx) * (n * sxx.T - sx.T * sx.T))
+    return np.where(n >= 3, correlation, np.nan)
+
+
+def compute_market_statistics(matrix: ReturnsMatrix, benchmark: str = BENCHMARK_SYMBOL, window: int = 60,
+                              include_matrix: bool = True, include_rolling: bool = True) -> Dict:
+    """
+    Compute annualized volatility, beta and correlation against the benchmark and
+    (optionally) the rolling correlation against the benchmark and the pairwise
+    correlation matrix of the symbols in one vectorized pass over the returns.
+    """
+    returns = matrix.returns
+    present = ~np.isnan(returns)
+    counts = present.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(present, returns, 0.0).sum(axis=0) / counts
+        variances = np.where(present, (returns - means) ** 2, 0.0).sum(axis=0) / (counts - 1)
+    volatility = np.where(counts >= 3, np.sqrt(variances * TRADING_DAYS_PER_YEAR), np.nan)
+
+    if benchmark in matrix.index:
+        full_correlation, beta, rolling_correlation = _benchmark_statistics(returns, returns[:, matrix.index[benchmark]], window, include_rolling)
+    else:
+        full_correlation = beta = np.full(len(matrix.symbols), np.nan)
+        rolling_correlation = np.full(returns.shape, np.nan) if include_rolling else None
+
+    last_closes = _forward_fill(matrix.closes)[-1] if len(matrix.dates) else np.full(len(matrix.symbols), np.nan)
+    first_rows = np.argmax(~np.isnan(matrix.closes), axis=0) if len(matrix.dates) else np.zeros(len(matrix.symbols), dtype=int)
+    first_closes = matrix.closes[first_rows, np.arange(len(matrix.symbols))] if len(matrix.dates) else last_closes
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_percent = (last_closes / first_closes - 1.0) * 100
+
+    result = {
+        "as_of": matrix.dates[-1] if matrix.dates else None,
+        "observations": len(returns),
+        "statistics": {
+            symbol: {
+                "volatility": _to_json_value(volatility[column]),
+                "beta": _to_json_value(beta[column]),
+                "correlation": _to_json_value(full_correlation[column]),
+                "change_percent": _to_json_value(change_percent[column])
+            }
+            for column, symbol in enumerate(matrix.symbols)
+        }
+    }
+    if include_rolling:
+        result["rolling_correlation"] = {
+            "window": window,
+            "timestamps": [f"{date} 00:00:00" for date in matrix.dates[1:]],
+            "series": {symbol: _to_json_values(rolling_correlation[:, column]) for column, symbol in enumerate(matrix.symbols)}
+        }
+    if include_matrix:
+        result["correlation_matrix"] = [_to_json_values(row) for row in correlation_matrix(returns)]
+    return result
+
+
+def get_symbol_statistics(symbol: str, period: str = "1y", benchmark: str = BENCHMARK_SYMBOL) -> Optional[Dict]:
+    """
+    Volatility, beta and correlation of one symbol against the benchmark, plus the
+    benchmark's change over the same dates, or None if either isn't cached yet.
+    """
+    matrix = get_returns_matrix([symbol, benchmark], period)
+    if symbol not in matrix.index or benchmark not in matrix.index or symbol == benchmark:
+        return None
+    statistics = compute_market_statistics(matrix, benchmark, include_matrix=False, include_rolling=False)
+    return {
+        **statistics["statistics"][symbol],
+        "benchmark": benchmark,
+        "benchmark_change_percent": statistics["statistics"][benchmark]["change_percent"],
+        "period": period,
+        "as_of": statistics["as_of"]
+    }
+
+
+def _to_json_value(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def _to_json_values(values: np.ndarray) -> List:
+    rounded = np.round(values, 4)
+    result = rounded.tolist()
+    for index in np.flatnonzero(np.isnan(rounded)).tolist():
+        result[index] = None
+    return result
+
+
+def _invalidate_matrices(symbol: str) -> None:
+    with _matrices_lock:
+        for matrix in _matrices.values():
+            if symbol in matrix.requested:
+                matrix.stale_symbols.add(symbol)
+
+
+register_store_listener(_invalidate_matrices)
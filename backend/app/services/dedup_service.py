@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import re
+from typing import Any, Dict, List
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# MinHash signature length, split into LSH bands of rows: two articles become
+# candidates if any band is identical, which happens with probability
+# 1 - (1 - s^ROWS)^BANDS for Jaccard similarity s (about 99% at s = 0.7)
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+
+# Minimum estimated Jaccard similarity of the shingles for two articles to be near-duplicates;
+# different stories sharing boilerplate (e.g. a wire service's standard sentences) reach 0.6
+SIMILARITY_THRESHOLD = 0.7
+
+# Words per shingle
+SHINGLE_SIZE = 3
+
+# Multiply-shift hash functions h(x) = ((a * x + b) mod 2^64) >> 32, with odd a
+_random = np.random.RandomState(20240601)
+_A = _random.randint(0, 1 << 62, NUM_PERMUTATIONS, dtype=np.int64).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _random.randint(0, 1 << 62, NUM_PERMUTATIONS, dtype=np.int64).astype(np.uint64)
+
+# Multipliers combining the hashes of the words of a shingle
+_SHINGLE_MULTIPLIERS = [np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F)]
+
+# Signature value of texts without words, above any hash value
+EMPTY = np.uint64(1 << 32)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def _article_text(article: Dict[str, Any]) -> str:
+    title = article.get("title") or ""
+    source = article.get("source") or ""
+    # Syndicated titles often end with ' - <source>'
+    if source and title.endswith(f" - {source}"):
+        title = title[:-len(source) - 3]
+    return f"{title} {article.get('description') or ''}"
+
+
+def minhash_signatures(texts: List[str]) -> np.ndarray:
+    """
+    MinHash signatures of the word shingles of several texts, computed in one
+    batch: an (n, NUM_PERMUTATIONS) array, with rows of EMPTY for texts without words.
+    Word hashes use Python's per-process string hashing, so signatures can only be
+    compared within a process.
+    """
+    # Every text is followed by SHINGLE_SIZE - 1 padding tokens, so a shingle can
+    # start at each of its words without running into the next text
+    padding = [""] * (SHINGLE_SIZE - 1)
+    tokens = []
+    is_start = []
+    word_counts = []
+    for text in texts:
+        words = WORD_PATTERN.findall(text.lower())
+        tokens.extend(words)
+        tokens.extend(padding)
+        is_start.extend([True] * len(words))
+        is_start.extend([False] * len(padding))
+        word_counts.append(len(words))
+
+    signatures = np.full((len(texts), NUM_PERMUTATIONS), EMPTY, dtype=np.uint64)
+    if not any(word_counts):
+        return signatures
+
+    with np.errstate(over="ignore"):
+        token_hashes = np.array([hash(token) for token in tokens], dtype=np.int64).view(np.uint64)
+        starts = np.flatnonzero(is_start)
+        shingle_hashes = token_hashes[starts + SHINGLE_SIZE - 1]
+        for offset, multiplier in enumerate(_SHINGLE_MULTIPLIERS):
+            shingle_hashes = shingle_hashes + token_hashes[starts + offset] * multiplier
+        # One row per hash function, so the reduction below runs along contiguous memory
+        permuted = ((np.outer(_A, shingle_hashes) + _B[:, None]) >> np.uint64(32)).astype(np.uint32)
+
+    # Minimum over the shingles of each text (they are contiguous and in text order)
+    counts = np.array(word_counts)
+    has_words = counts > 0
+    offsets = (np.cumsum(counts) - counts)[has_words]
+    signatures[has_words] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return signatures
+
+
+def _find(parents: List[int], item: int) -> int:
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+def _cluster_key(article: Dict[str, Any]) -> str:
+    key = article.get("url") or article.get("title") or ""
+    return hashlib.blake2b(key.encode(), digest_size=6).hexdigest()
+
+
+def cluster_articles(articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Group near-duplicate articles (e.g. syndicated copies of one story) with
+    MinHash over title and description shingles and LSH banding, in time roughly
+    linear in the number of articles.
+
+    Returns copies of the articles in the same order with 'cluster_id',
+    'cluster_size' and 'is_representative' set. The representative of a cluster
+    is its earliest article (the longest description breaks ties), and the
+    cluster id is derived from its URL.
+    """
+    signatures = minhash_signatures([_article_text(article) for article in articles])
+    has_text = signatures[:, 0] != EMPTY
+    parents = list(range(len(articles)))
+
+    # Articles sharing any band are candidates; confirm them with the estimated similarity
+    for band in range(BANDS):
+        rows = np.ascontiguousarray(signatures[:, band * ROWS:(band + 1) * ROWS])
+        keys = rows.view(np.dtype((np.void, rows.dtype.itemsize * ROWS))).ravel()
+        _, bucket_of, bucket_sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        shared = np.flatnonzero((bucket_sizes[bucket_of] > 1) & has_text)
+        buckets = {}
+        for index in shared.tolist():
+            buckets.setdefault(bucket_of[index], []).append(index)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                root_first, root_other = _find(parents, first), _find(parents, other)
+                # Compare the clusters' roots too, so that a chain of pairwise matches
+                # can't merge different stories sharing boilerplate text
+                if root_first != root_other and (signatures[first] == signatures[other]).mean() >= SIMILARITY_THRESHOLD \
+                        and (signatures[root_first] == signatures[root_other]).mean() >= SIMILARITY_THRESHOLD:
+                    parents[root_other] = root_first
+
+    clusters = {}
+    for index in range(len(articles)):
+        clusters.setdefault(_find(parents, index), []).append(index)
+
+    clustered = [dict(article) for article in articles]
+    for members in clusters.values():
+        representative = min(
+            members,
+            key=lambda index: (articles[index].get("published_at") or "", -len(articles[index].get("description") or ""))
+        )
+        cluster_id = _cluster_key(articles[representative])
+        for index in members:
+            clustered[index]["cluster_id"] = cluster_id
+            clustered[index]["cluster_size"] = len(members)
+            clustered[index]["is_representative"] = index == representative
+
+    if len(clusters) < len(articles):
+        logger.info(f"Grouped {len(articles)} articles into {len(clusters)} clusters of near-duplicates")
+    return clustered
+
+
+def select_representatives(articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Keep one article per cluster, in the original order: the cluster's representative
+    if it is among the given articles, otherwise the first of its members.
+    Articles that haven't been clustered yet are clustered first.
+    """
+    clustered = articles
+    if any("cluster_id" not in article for article in articles):
+        clustered = cluster_articles(articles)
+
+    chosen = {}
+    for index, article in enumerate(clustered):
+        cluster_id = article["cluster_id"]
+        if cluster_id not in chosen or (article.get("is_representative") and not clustered[chosen[cluster_id]].get("is_representative")):
+            chosen[cluster_id] = index
+    return [articles[index] for index in sorted(chosen.values())]
@@ -0,0 +1,230 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Tuple
+from urllib.parse import quote
+import numpy as np
+from ..core.config import settings
+from .price_store import DB_PATH, get_price_store
+
+try:
+    import fcntl
+except ImportError:  # Windows: rebuilds are only serialized within a process
+    fcntl = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+HOT_CACHE_DIR = settings.PRICE_HOT_CACHE_DIR or os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "price_hot_cache")
+
+# One row per cached date (a day ordinal, as date.toordinal()), including dates without
+# data (NaN prices), with when it was written or, for dates only known from a checked
+# range, checked (seconds since the epoch, 0 if unknown) and where its JSON object ends
+# in the file's JSON section
+HOT_DTYPE = np.dtype([
+    ("day", "<i4"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+    ("volume", "<i8"), ("written", "<i8"), ("json_end", "<i8")
+])
+
+# File layout: header (magic, rows, JSON bytes, build time), the rows, then the JSON
+# objects of the rows as served by the prices endpoint, each followed by a comma
+_HEADER = struct.Struct("<8sqqd")
+_MAGIC = b"HOTPRC01"
+
+# Symbols kept mapped per process, least recently used first
+MAX_OPEN_SERIES = 256
+
+_open_series: "OrderedDict[str, HotSeries]" = OrderedDict()
+_open_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+class HotSeries:
+    """
+    A symbol's cached daily history, memory-mapped from its hot cache file.
+    The pages are shared with every other process mapping the same file.
+    """
+
+    def __init__(self, path: str, stat_key: Tuple):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rows, json_bytes, self.built_at = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a hot price cache file")
+        self.stat_key = stat_key
+        self.rows = np.frombuffer(self._mmap, dtype=HOT_DTYPE, count=rows, offset=_HEADER.size)
+        json_start = _HEADER.size + self.rows.nbytes
+        self._json = memoryview(self._mmap)[json_start:json_start + json_bytes]
+
+    def slice(self, start_day: int, end_day: int) -> Tuple[np.ndarray, bytes]:
+        """
+        The rows between two day ordinals (inclusive), found by binary search, and
+        their JSON array.
+        """
+        days = self.rows["day"]
+        lo = int(np.searchsorted(days, start_day, side="left"))
+        hi = int(np.searchsorted(days, end_day, side="right"))
+        if hi <= lo:
+            return self.rows[lo:lo], b"[]"
+        json_start = int(self.rows["json_end"][lo - 1]) if lo > 0 else 0
+        # Without the comma after the last object
+        json_end = int(self.rows["json_end"][hi - 1]) - 1
+        return self.rows[lo:hi], b"[" + self._json[json_start:json_end].tobytes() + b"]"
+
+
+def _path(symbol: str) -> str:
+    return os.path.join(HOT_CACHE_DIR, quote(symbol, safe="") + ".hot")
+
+
+def _stat_key(path: str) -> Optional[Tuple]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+@contextmanager
+def _file_lock(path: str):
+    """
+    Serialize rebuilds and invalidations of a symbol's file, across processes where
+    file locks are available.
+    """
+    if fcntl is None:
+        with _build_lock:
+            yield
+        return
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _json_number(value) -> str:
+    return "null" if value is None or value != value else repr(float(value))
+
+
+def _epoch_seconds(timestamp: Optional[str]) -> int:
+    if not timestamp:
+        return 0
+    return int((datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S") - datetime(1970, 1, 1)).total_seconds())
+
+
+def _build(symbol: str, path: str) -> None:
+    """
+    Write a symbol's hot cache file from the price store: every stored row, plus the
+    dates of checked ranges without a row as dates without data.
+    """
+    rows, checked_ranges = get_price_store().get_prices(symbol, "0001-01-01", "9999-12-31")
+    points = {}
+    for row in rows:
+        points[datetime.strptime(row["date"], "%Y-%m-%d").toordinal()] = (
+            row["open"], row["high"], row["low"], row["close"], row["volume"], _epoch_seconds(row["timestamp"])
+        )
+    for range_start, range_end, checked_at in checked_ranges:
+        checked = _epoch_seconds(checked_at)
+        for day in range(datetime.strptime(range_start, "%Y-%m-%d").toordinal(), datetime.strptime(range_end, "%Y-%m-%d").toordinal() + 1):
+            points.setdefault(day, (None, None, None, None, None, checked))
+
+    days = sorted(points)
+    array = np.zeros(len(days), dtype=HOT_DTYPE)
+    parts = []
+    json_end = 0
+    for i, day in enumerate(days):
+        open_, high, low, close, volume, written = points[day]
+        if close is None:
+            open_ = high = low = None
+            volume = 0
+        part = (
+            f'{{"timestamp":"{datetime.fromordinal(day).strftime("%Y-%m-%d")} 00:00:00",'
+            f'"open":{_json_number(open_)},"high":{_json_number(high)},"low":{_json_number(low)},'
+            f'"close":{_json_number(close)},"volume":{int(volume or 0)}}},'
+        ).encode()
+        parts.append(part)
+        json_end += len(part)
+        array[i] = (
+            day, np.nan if open_ is None else open_, np.nan if high is None else high, np.nan if low is None else low,
+            np.nan if close is None else close, int(volume or 0), written, json_end
+        )
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(days), json_end, time.time()))
+        f.write(array.tobytes())
+        f.write(b"".join(parts))
+    # Processes that mapped the previous file keep reading it until they notice the new one
+    os.replace(tmp_path, path)
+    logger.info(f"Built hot price cache of {symbol}: {len(days)} dates")
+
+
+def _open(symbol: str, path: str) -> Optional[HotSeries]:
+    stat_key = _stat_key(path)
+    with _open_lock:
+        series = _open_series.get(symbol)
+        if series is not None and series.stat_key == stat_key:
+            _open_series.move_to_end(symbol)
+            return series
+        _open_series.pop(symbol, None)
+    if stat_key is None:
+        return None
+    series = HotSeries(path, stat_key)
+    with _open_lock:
+        _open_series[symbol] = series
+        while len(_open_series) > MAX_OPEN_SERIES:
+            # Unmapped once no request is reading it anymore
+            _open_series.popitem(last=False)
+    return series
+
+
+def get_hot_series(symbol: str) -> Optional[HotSeries]:
+    """
+    The hot cache of a symbol's daily prices, built from the price store if it
+    doesn't exist or is older than PRICE_HOT_CACHE_MAX_AGE (the price store may be
+    shared with other instances, whose writes don't reach this cache). None if the
+    hot tier is disabled or unavailable, in which case the price store is read directly.
+    """
+    if not settings.PRICE_HOT_CACHE:
+        return None
+    path = _path(symbol)
+    try:
+        series = _open(symbol, path)
+        if series is None or time.time() - series.built_at > settings.PRICE_HOT_CACHE_MAX_AGE:
+            os.makedirs(HOT_CACHE_DIR, exist_ok=True)
+            with _file_lock(path):
+                # Another process may have rebuilt it while we waited for the lock
+                series = _open(symbol, path)
+                if series is None or time.time() - series.built_at > settings.PRICE_HOT_CACHE_MAX_AGE:
+                    _build(symbol, path)
+                    series = _open(symbol, path)
+        return series
+    except Exception as e:
+        logger.warning(f"Hot price cache of {symbol} unavailable: {str(e)}")
+        return None
+
+
+def invalidate_hot_series(symbol: str) -> None:
+    """
+    Drop a symbol's hot cache file after its prices changed; the next read rebuilds it.
+    Writers call this after committing, under the same lock as rebuilds, so a rebuild
+    that read the store before the commit can't outlive the invalidation.
+    """
+    if not settings.PRICE_HOT_CACHE:
+        return
+    path = _path(symbol)
+    if not os.path.isdir(HOT_CACHE_DIR):
+        return
+    try:
+        with _file_lock(path):
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Could not invalidate the hot price cache of {symbol}: {str(e)}")
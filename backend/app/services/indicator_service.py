@@ -0,0 +1,358 @@
+import logging
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+import numpy as np
+from fastapi import HTTPException
+from .price_series import PriceSeries
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Default parameters of each indicator, in the order they appear in a spec like 'macd:12-26-9'
+INDICATOR_PARAMS = {
+    "sma": {"window": 20},
+    "ema": {"window": 20},
+    "rsi": {"window": 14},
+    "macd": {"fast": 12, "slow": 26, "signal": 9},
+    "bollinger": {"window": 20, "num_std": 2.0},
+    "atr": {"window": 14},
+}
+
+# Maximum number of memoized (symbol, period, indicator, params) results
+MAX_MEMO_ENTRIES = 1024
+
+
+class IndicatorResult:
+    """
+    Computed values of one indicator over a price series, together with the
+    state needed to extend them when new bars arrive.
+    """
+    __slots__ = ("dates", "last_close", "values", "state")
+
+    def __init__(self, dates: List[str], last_close: float, values: Dict[str, np.ndarray], state: Dict):
+        self.dates = dates
+        self.last_close = last_close
+        self.values = values
+        self.state = state
+
+    @property
+    def last_date(self) -> str:
+        return self.dates[-1]
+
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+# Vectorized building blocks
+
+def _ema(values: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """
+    Exponential moving average y[t] = alpha * x[t] + (1 - alpha) * y[t-1], starting from y[-1] = seed.
+    Computed in closed form over blocks short enough that the decay factors can't overflow.
+    """
+    result = np.empty(len(values))
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        result[:] = values
+        return result
+    block = max(1, int(math.log(1e12) / -math.log(decay)))
+    previous = seed
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        # y[t] = decay^(t+1) * previous + alpha * sum_k decay^(t-k) * x[k]
+        weighted = np.cumsum(chunk / powers) * powers
+        result[start:start + len(chunk)] = powers * previous + alpha * weighted
+        previous = result[start + len(chunk) - 1]
+    return result
+
+
+def _seeded_ema(values: np.ndarray, window: int, alpha: float) -> Tuple[np.ndarray, float]:
+    """
+    EMA seeded with the simple average of the first `window` values (NaN before that).
+    Returns the series and its last value (NaN if the series is too short).
+    """
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result, float("nan")
+    result[window - 1] = values[:window].mean()
+    result[window:] = _ema(values[window:], alpha, result[window - 1])
+    return result, float(result[-1])
+
+
+def _rolling_window(values: np.ndarray, window: int) -> np.ndarray:
+    return np.lib.stride_tricks.sliding_window_view(values, window)
+
+
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray, previous_close: float) -> np.ndarray:
+    previous = np.concatenate(([previous_close], close[:-1]))
+    ranges = np.vstack((high - low, np.abs(high - previous), np.abs(low - previous)))
+    # The first bar of a series has no previous close
+    return np.nanmax(ranges, axis=0)
+
+
+# Full computations: return (values, state)
+
+def _compute_sma(bars: Dict[str, np.ndarray], window: int):
+    close = bars["close"]
+    values = np.full(len(close), np.nan)
+    if len(close) >= window:
+        values[window - 1:] = _rolling_window(close, window).mean(axis=1)
+    return {"sma": values}, {"tail": close[-(window - 1):] if window > 1 else close[:0]}
+
+
+def _compute_ema(bars: Dict[str, np.ndarray], window: int):
+    values, last = _seeded_ema(bars["close"], window, 2.0 / (window + 1))
+    return {"ema": values}, {"ema": last, "count": len(bars["close"])}
+
+
+def _compute_rsi(bars: Dict[str, np.ndarray], window: int):
+    close = bars["close"]
+    values = np.full(len(close), np.nan)
+    state = {"avg_gain": float("nan"), "avg_loss": float("nan"), "count": len(close), "last_close": float(close[-1])}
+    if len(close) <= window:
+        return {"rsi": values}, state
+    deltas = np.diff(close)
+    gains, losses = np.clip(deltas, 0, None), np.clip(-deltas, 0, None)
+    # Wilder's smoothing is an EMA with alpha = 1 / window
+    avg_gain, state["avg_gain"] = _seeded_ema(gains, window, 1.0 / window)
+    avg_loss, state["avg_loss"] = _seeded_ema(losses, window, 1.0 / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values[1:] = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    values[1:window] = np.nan
+    return {"rsi": values}, state
+
+
+def _compute_macd(bars: Dict[str, np.ndarray], fast: int, slow: int, signal: int):
+    close = bars["close"]
+    fast_ema, fast_last = _seeded_ema(close, fast, 2.0 / (fast + 1))
+    slow_ema, slow_last = _seeded_ema(close, slow, 2.0 / (slow + 1))
+    macd = fast_ema - slow_ema
+    signal_line = np.full(len(close), np.nan)
+    signal_last = float("nan")
+    if len(close) >= slow:
+        signal_line[slow - 1:], signal_last = _seeded_ema(macd[slow - 1:], signal, 2.0 / (signal + 1))
+    state = {"fast": fast_last, "slow": slow_last, "signal": signal_last, "count": len(close)}
+    return {"macd": macd, "signal": signal_line, "histogram": macd - signal_line}, state
+
+
+def _compute_bollinger(bars: Dict[str, np.ndarray], window: int, num_std: float):
+    close = bars["close"]
+    middle = np.full(len(close), np.nan)
+    deviation = np.full(len(close), np.nan)
+    if len(close) >= window:
+        windows = _rolling_window(close, window)
+        middle[window - 1:] = windows.mean(axis=1)
+        deviation[window - 1:] = windows.std(axis=1)
+    values = {"middle": middle, "upper": middle + num_std * deviation, "lower": middle - num_std * deviation}
+    return values, {"tail": close[-(window - 1):] if window > 1 else close[:0]}
+
+
+def _compute_atr(bars: Dict[str, np.ndarray], window: int):
+    true_range = _true_range(bars["high"], bars["low"], bars["close"], np.nan)
+    values, last = _seeded_ema(true_range, window, 1.0 / window)
+    return {"atr": values}, {"atr": last, "count": len(true_range), "last_close": float(bars["close"][-1])}
+
+
+# Incremental updates: extend the values with new bars from the saved state
+
+def _update_sma(state: Dict, bars: Dict[str, np.ndarray], window: int):
+    close = np.concatenate((state["tail"], bars["close"]))
+    values = np.full(len(bars["close"]), np.nan)
+    if len(close) >= window:
+        rolled = _rolling_window(close, window).mean(axis=1)
+        values[len(values) - len(rolled):] = rolled
+    return {"sma": values}, {"tail": close[-(window - 1):] if window > 1 else close[:0]}
+
+
+def _update_ema(state: Dict, bars: Dict[str, np.ndarray], window: int):
+    if state["count"] < window:
+        return None
+    values = _ema(bars["close"], 2.0 / (window + 1), state["ema"])
+    return {"ema": values}, {"ema": float(values[-1]), "count": state["count"] + len(values)}
+
+
+def _update_rsi(state: Dict, bars: Dict[str, np.ndarray], window: int):
+    if state["count"] <= window:
+        return None
+    deltas = np.diff(np.concatenate(([state["last_close"]], bars["close"])))
+    avg_gain = _ema(np.clip(deltas, 0, None), 1.0 / window, state["avg_gain"])
+    avg_loss = _ema(np.clip(-deltas, 0, None), 1.0 / window, state["avg_loss"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    return {"rsi": values}, {"avg_gain": float(avg_gain[-1]), "avg_loss": float(avg_loss[-1]),
+                             "count": state["count"] + len(values), "last_close": float(bars["close"][-1])}
+
+
+def _update_macd(state: Dict, bars: Dict[str, np.ndarray], fast: int, slow: int, signal: int):
+    # The signal line needs `signal` MACD values before it starts
+    if state["count"] < slow + signal - 1:
+        return None
+    close = bars["close"]
+    fast_ema = _ema(close, 2.0 / (fast + 1), state["fast"])
+    slow_ema = _ema(close, 2.0 / (slow + 1), state["slow"])
+    macd = fast_ema - slow_ema
+    signal_line = _ema(macd, 2.0 / (signal + 1), state["signal"])
+    new_state = {"fast": float(fast_ema[-1]), "slow": float(slow_ema[-1]), "signal": float(signal_line[-1]),
+                 "count": state["count"] + len(close)}
+    return {"macd": macd, "signal": signal_line, "histogram": macd - signal_line}, new_state
+
+
+def _update_bollinger(state: Dict, bars: Dict[str, np.ndarray], window: int, num_std: float):
+    close = np.concatenate((state["tail"], bars["close"]))
+    middle = np.full(len(bars["close"]), np.nan)
+    deviation = np.full(len(bars["close"]), np.nan)
+    if len(close) >= window:
+        windows = _rolling_window(close, window)
+        middle[len(middle) - len(windows):] = windows.mean(axis=1)
+        deviation[len(deviation) - len(windows):] = windows.std(axis=1)
+    values = {"middle": middle, "upper": middle + num_std * deviation, "lower": middle - num_std * deviation}
+    return values, {"tail": close[-(window - 1):] if window > 1 else close[:0]}
+
+
+def _update_atr(state: Dict, bars: Dict[str, np.ndarray], window: int):
+    if state["count"] < window:
+        return None
+    true_range = _true_range(bars["high"], bars["low"], bars["close"], state["last_close"])
+    values = _ema(true_range, 1.0 / window, state["atr"])
+    return {"atr": values}, {"atr": float(values[-1]), "count": state["count"] + len(values),
+                             "last_close": float(bars["close"][-1])}
+
+
+INDICATORS = {
+    "sma": (_compute_sma, _update_sma),
+    "ema": (_compute_ema, _update_ema),
+    "rsi": (_compute_rsi, _update_rsi),
+    "macd": (_compute_macd, _update_macd),
+    "bollinger": (_compute_bollinger, _update_bollinger),
+    "atr": (_compute_atr, _update_atr),
+}
+
+
+def compute_indicator_values(name: str, bars: Dict[str, np.ndarray], params: Tuple = None) -> Dict[str, np.ndarray]:
+    """
+    Compute one indicator over OHLC arrays without memoization, e.g.
+    compute_indicator_values("rsi", {"close": closes}, (14,))["rsi"].
+    """
+    compute, _ = INDICATORS[name]
+    values, _ = compute(bars, *(params if params is not None else INDICATOR_PARAMS[name].values()))
+    return values
+
+
+def parse_indicator_specs(spec: str) -> List[Tuple[str, Tuple]]:
+    """
+    Parse a spec like 'sma:50,rsi,macd:12-26-9' into (name, params) pairs, filling in
+    default parameters. Raises an HTTP 400 error for unknown indicators or bad parameters.
+    """
+    parsed = []
+    for item in [part.strip() for part in spec.split(",") if part.strip()]:
+        name, _, raw_params = item.partition(":")
+        name = name.lower()
+        if name not in INDICATOR_PARAMS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown indicator: {name}. Valid indicators are: {', '.join(INDICATOR_PARAMS.keys())}"
+            )
+        defaults = INDICATOR_PARAMS[name]
+        values = [value for value in raw_params.split("-") if value] if raw_params else []
+        if len(values) > len(defaults):
+            raise HTTPException(status_code=400, detail=f"Too many parameters for {name}: {raw_params}")
+        params = []
+        for (param_name, default), value in zip(defaults.items(), values + [None] * len(defaults)):
+            try:
+                param = type(default)(value) if value is not None else default
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {param_name} for {name}: {value}")
+            if param <= 0 or (isinstance(param, int) and param > 1000):
+                raise HTTPException(status_code=400, detail=f"Invalid {param_name} for {name}: {value}")
+            params.append(param)
+        parsed.append((name, tuple(params)))
+    return parsed
+
+
+def _price_arrays(prices: PriceSeries) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Convert a price series into a list of dates and OHLC arrays, skipping unavailable dates.
+    """
+    valid = prices.priced()
+    bars = {column: valid.filled(column) for column in ("open", "high", "low")}
+    bars["close"] = valid.close
+    return valid.dates(), bars
+
+
+def _slice_bars(bars: Dict[str, np.ndarray], start: int) -> Dict[str, np.ndarray]:
+    return {column: values[start:] for column, values in bars.items()}
+
+
+def _compute_indicator(key: Tuple, name: str, params: Tuple, dates: List[str], bars: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    compute, update = INDICATORS[name]
+    with _memo_lock:
+        memo = _memo.get(key)
+        if memo is not None:
+            _memo.move_to_end(key)
+
+    # Only a memo of the same series up to its last memoized bar is used: when the period
+    # window moved forward, values seeded on the older bars it no longer includes would
+    # differ from a cold computation, so they are computed again. This also keeps each
+    # memo no longer than the series it was computed for
+    position = len(memo.dates) if memo is not None else 0
+    if (memo is not None and memo.dates[0] == dates[0] and position <= len(dates)
+            and dates[position - 1] == memo.last_date and bars["close"][position - 1] == memo.last_close):
+        if position == len(dates):
+            return memo.values
+        # Extend incrementally with the bars that arrived after the memoized ones
+        updated = update(memo.state, _slice_bars(bars, position), *params)
+        if updated is not None:
+            new_values, state = updated
+            values = {column: np.concatenate((memo.values[column], new_values[column])) for column in memo.values}
+            logger.info(f"Incrementally updated {name}{params} for {key[0]} with {len(dates) - position} new bars")
+            _store_memo(key, IndicatorResult(dates, float(bars["close"][-1]), values, state))
+            return values
+
+    values, state = compute(bars, *params)
+    _store_memo(key, IndicatorResult(dates, float(bars["close"][-1]), values, state))
+    return values
+
+
+def _store_memo(key: Tuple, result: IndicatorResult) -> None:
+    with _memo_lock:
+        _memo[key] = result
+        _memo.move_to_end(key)
+        while len(_memo) > MAX_MEMO_ENTRIES:
+            _memo.popitem(last=False)
+
+
+def _to_json_values(values: np.ndarray) -> List:
+    rounded = np.round(values, 4)
+    result = rounded.tolist()
+    for index in np.flatnonzero(np.isnan(rounded)).tolist():
+        result[index] = None
+    return result
+
+
+def compute_indicators(symbol: str, period: str, prices: PriceSeries, specs: List[Tuple[str, Tuple]]) -> Dict:
+    """
+    Compute the requested indicators over a price series.
+    Results are memoized per (symbol, period, indicator, params) together with the dates
+    they cover, so a request is answered from the memo while the last date is unchanged.
+    When the series gains new bars but still starts on the same date, indicators are
+    extended from their saved state instead of being recomputed over the whole
+    history; either way the values only depend on the series.
+    """
+    dates, bars = _price_arrays(prices)
+    result = {"symbol": symbol, "period": period, "timestamps": [f"{date} 00:00:00" for date in dates], "indicators": {}}
+    if not dates:
+        return result
+
+    for name, params in specs:
+        values = _compute_indicator((symbol, period, name, params), name, params, dates, bars)
+        label = name if params == tuple(INDICATOR_PARAMS[name].values()) else f"{name}:{'-'.join(str(p) for p in params)}"
+        result["indicators"][label] = {
+            "name": name,
+            "params": dict(zip(INDICATOR_PARAMS[name].keys(), params)),
+            "series": {column: _to_json_values(column_values) for column, column_values in values.items()}
+        }
+    return result
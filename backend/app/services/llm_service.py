@@ -0,0 +1,293 @@
+import html
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+import requests
+from ..core.config import settings
+from ..core.metrics import track_stage, UPSTREAM_CALLS, UPSTREAM_RATE_LIMITS
+from .sentiment_service import score_texts
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class LLMError(Exception):
+    """
+    A completion failed; the message is safe to show to users.
+    """
+
+
+class LLMRateLimitError(LLMError):
+    pass
+
+
+class CompletionRequest:
+    """
+    One completion: the prompt for model backends, plus the structured context it was
+    built from (symbol, period, chosen articles best first, daily closes) for backends
+    that work on the data directly.
+    """
+
+    def __init__(self, prompt: str, context: Optional[Dict[str, Any]] = None, max_tokens: int = 1000,
+                 temperature: float = 0.7):
+        self.prompt = prompt
+        self.context = context or {}
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+
+class LLMBackend:
+    """
+    Base class of the summary backends. `generate` runs one completion and
+    `generate_batch` runs several in one pass; either way at most max_concurrency
+    completions of a backend run at once, across all requests of the process.
+    """
+
+    name = "base"
+
+    def __init__(self, max_concurrency: int = 1):
+        self.max_concurrency = max(1, max_concurrency)
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+
+    @property
+    def configuration_error(self) -> Optional[str]:
+        """
+        Why the backend can't be used (e.g. a missing API key), or None.
+        """
+        return None
+
+    def _generate(self, request: CompletionRequest) -> str:
+        raise NotImplementedError
+
+    def generate(self, request: CompletionRequest) -> str:
+        with self._slots:
+            return self._generate(request)
+
+    def generate_batch(self, batch: List[CompletionRequest]) -> List[Union[str, Exception]]:
+        """
+        Run the completions together, returning each one's text or exception in order.
+        """
+        if len(batch) <= 1 or self.max_concurrency == 1:
+            return [self._run(request) for request in batch]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batch)), thread_name_prefix=f"llm-{self.name}") as pool:
+            return list(pool.map(self._run, batch))
+
+    def _run(self, request: CompletionRequest) -> Union[str, Exception]:
+        try:
+            return self.generate(request)
+        except Exception as e:
+            return e
+
+
+class OpenAICompatibleBackend(LLMBackend):
+    """
+    Any chat completions API in the OpenAI format, such as Together AI or OpenAI.
+    """
+
+    def __init__(self, name: str, base_url: str, api_key: Optional[str], model: str, timeout: int,
+                 max_concurrency: int, extra_params: Optional[Dict[str, Any]] = None, api_key_setting: str = "API key"):
+        super().__init__(max_concurrency)
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.extra_params = extra_params or {}
+        self.api_key_setting = api_key_setting
+
+    @property
+    def configuration_error(self) -> Optional[str]:
+        if not self.api_key:
+            return f"{self.api_key_setting} environment variable is not properly configured"
+        return None
+
+    def _generate(self, request: CompletionRequest) -> str:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": self.model,
+            "messages": [
+                {"role": "user", "content": request.prompt}
+            ],
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            **self.extra_params
+        }
+
+        # Retry rate limits and connection errors with a growing delay
+        max_retries = 3
+        retry_delay = 2
+        for attempt in range(max_retries):
+            try:
+                UPSTREAM_CALLS.labels(provider=self.name).inc()
+                with track_stage(f"{self.name}_completion"):
+                    response = requests.post(self.base_url, headers=headers, json=data, timeout=self.timeout)
+
+                if response.status_code == 429:
+                    logger.warning(f"{self.name} API rate limit hit (attempt {attempt+1}/{max_retries})")
+                    UPSTREAM_RATE_LIMITS.labels(provider=self.name).inc()
+                    if attempt == max_retries - 1:
+                        raise LLMRateLimitError(f"{self.name.capitalize()} API rate limit reached. Please try again later.")
+                    sleep(retry_delay * (attempt + 1))
+                    continue
+
+                response.raise_for_status()
+                result = response.json()
+                break
+            except requests.exceptions.RequestException as e:
+                logger.error(f"{self.name} API request error (attempt {attempt+1}/{max_retries}): {str(e)}")
+                if attempt == max_retries - 1:
+                    raise LLMError(f"Failed to generate summary: {str(e)}")
+                sleep(retry_delay * (attempt + 1))
+
+        choices = result.get("choices") or []
+        if not choices:
+            logger.error(f"Unexpected API response format: {result}")
+            raise LLMError("Failed to generate summary: Unexpected API response format")
+        # Chat completions return 'message' with 'content', older completion APIs 'text'
+        if "message" in choices[0] and "content" in choices[0]["message"]:
+            return choices[0]["message"]["content"].strip()
+        if "text" in choices[0]:
+            return choices[0]["text"].strip()
+        logger.error(f"Unexpected API response format: {result}")
+        raise LLMError("Failed to generate summary: Could not find content in API response")
+
+
+def _indicator(value: Optional[float], threshold: float) -> str:
+    if value is None or abs(value) < threshold:
+        return "neutral"
+    return "positive" if value > 0 else "negative"
+
+
+class ExtractiveBackend(LLMBackend):
+    """
+    Local CPU backend that needs no model or API: it writes the four summary sections
+    from the structured context, picking the top-ranked articles, pairing news days
+    with the price move of the next trading day and reading the trend from recent
+    momentum and news sentiment. Its output is deterministic.
+    """
+
+    name = "local"
+
+    # Headlines in the news summary and news days in the price correlation section
+    MAX_NEWS_POINTS = 5
+    MAX_CORRELATION_POINTS = 3
+
+    def _generate(self, request: CompletionRequest) -> str:
+        context = request.context
+        symbol = html.escape(context.get("symbol", "").replace("^", ""))
+        articles = context.get("articles") or []
+        closes = context.get("closes") or []
+        dates = [date for date, _ in closes]
+        values = np.array([close for _, close in closes], dtype=np.float64)
+        changes = np.zeros(len(values))
+        if len(values) > 1:
+            changes[1:] = (values[1:] / values[:-1] - 1) * 100
+
+        # Articles scored by the news pipeline keep their score, others are scored here
+        unscored = [article for article in articles if article.get("sentiment") is None]
+        scores = dict(zip(map(id, unscored), score_texts([f"{a.get('title') or ''}. {a.get('description') or ''}" for a in unscored]).tolist()))
+        sentiments = [article.get("sentiment") if article.get("sentiment") is not None else scores[id(article)] for article in articles]
+
+        start, end = context.get("start_date", "N/A"), context.get("end_date", "N/A")
+        change_percent = context.get("price_change_percent")
+        sections = [
+            '<div class="analysis-period-section">',
+            "  <h2>Analysis Period</h2>",
+            f"  <p>{'Date: ' + start if start == end else 'From ' + start + ' to ' + end}</p>",
+            f"  <p>Stock: {symbol}</p>",
+            f"  <p>Price Change: {change_percent:.2f}% (${context.get('price_change', 0.0):.2f})</p>" if change_percent is not None else "  <p>Price Change: N/A</p>",
+            "</div>",
+            "",
+            '<div class="news-summary-section">',
+            "  <h2>News Summary</h2>",
+            "  <ul>",
+        ]
+        # Articles come best first
+        for index in range(min(len(articles), self.MAX_NEWS_POINTS)):
+            article = articles[index]
+            sections.append(
+                f'    <li><span class="sentiment-indicator {_indicator(sentiments[index], 0.05)}">●</span> '
+                f"{html.escape(article.get('title') or '')} ({html.escape(article.get('source') or 'unknown')}, {(article.get('published_at') or '')[:10]})</li>"
+            )
+        sections += ["  </ul>", "</div>", "", '<div class="price-correlation-section">', "  <h2>Price Correlation</h2>", "  <ul>"]
+
+        # The price move of the first trading day on or after each news day
+        correlation_points = 0
+        seen_days = set()
+        for index in range(len(articles)):
+            if correlation_points >= self.MAX_CORRELATION_POINTS or not dates:
+                break
+            position = int(np.searchsorted(np.array(dates), (articles[index].get("published_at") or "")[:10]))
+            if position >= len(dates) or position in seen_days:
+                continue
+            seen_days.add(position)
+            sentiment, move = sentiments[index], changes[position]
+            if abs(sentiment) < 0.05 or abs(move) < 0.1:
+                agreement = "neutral"
+            else:
+                agreement = "positive" if (sentiment > 0) == (move > 0) else "negative"
+            sections.append(
+                f'    <li><span class="correlation-indicator {agreement}">●</span> {dates[position]}: '
+                f"{html.escape(articles[index].get('title') or '')}; {symbol} moved {move:+.2f}% that session</li>"
+            )
+            correlation_points += 1
+        if not correlation_points:
+            sections.append('    <li><span class="correlation-indicator neutral">●</span> No news days overlap the price data of the period</li>')
+        sections += ["  </ul>", "</div>", "", '<div class="trend-prediction-section">', "  <h2>Trend Prediction</h2>", "  <ul>"]
+
+        recent = values[-6:]
+        momentum = (recent[-1] / recent[0] - 1) * 100 if len(recent) > 1 else None
+        mean_sentiment = float(np.mean(sentiments)) if sentiments else None
+        if momentum is not None:
+            sections.append(
+                f'    <li><span class="prediction-indicator {_indicator(momentum, 0.5)}">●</span> '
+                f"Momentum: {momentum:+.2f}% over the last {len(recent) - 1} sessions</li>"
+            )
+        if mean_sentiment is not None:
+            sections.append(
+                f'    <li><span class="prediction-indicator {_indicator(mean_sentiment, 0.05)}">●</span> '
+                f"News sentiment averages {mean_sentiment:+.2f} across {len(sentiments)} stories</li>"
+            )
+        sections += ["  </ul>", "</div>"]
+        return "\n".join(sections)
+
+
+_backends: Dict[str, LLMBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def _create_backend(name: str) -> LLMBackend:
+    if name == "together":
+        return OpenAICompatibleBackend(
+            "together", settings.TOGETHER_API_BASE_URL, settings.TOGETHER_API_KEY, settings.TOGETHER_API_MODEL,
+            settings.TOGETHER_API_TIMEOUT, settings.TOGETHER_MAX_CONCURRENCY,
+            extra_params={"top_p": 0.9, "top_k": 40, "repetition_penalty": 1.0, "stop": ["<|im_end|>", "<|endoftext|>"]},
+            api_key_setting="TOGETHER_API_KEY"
+        )
+    if name == "openai":
+        return OpenAICompatibleBackend(
+            "openai", settings.OPENAI_API_BASE_URL, settings.OPENAI_API_KEY, settings.OPENAI_API_MODEL,
+            settings.OPENAI_API_TIMEOUT, settings.OPENAI_MAX_CONCURRENCY,
+            extra_params={"top_p": 0.9}, api_key_setting="OPENAI_API_KEY"
+        )
+    if name == "local":
+        return ExtractiveBackend(settings.LOCAL_LLM_MAX_CONCURRENCY)
+    raise ValueError(f"Unknown LLM backend '{name}'. Must be one of: together, openai, local")
+
+
+def get_llm_backend(name: Optional[str] = None) -> LLMBackend:
+    """
+    The backend with the given name (LLM_BACKEND by default), created on first use
+    and shared so that its concurrency cap applies process-wide.
+    """
+    name = name or settings.LLM_BACKEND
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = _create_backend(name)
+        return _backends[name]
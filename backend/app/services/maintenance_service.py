@@ -0,0 +1,177 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy.orm import Session
+from ..core.config import settings
+from ..db.models import StockNews
+from .stock_values_db import compact_intraday_data, get_db_connection, get_intraday_tables, prune_null_placeholders
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Most free pages returned to the file system per run, to bound how long the database is locked
+INCREMENTAL_VACUUM_PAGES = 25000
+
+_scheduler: Optional[threading.Thread] = None
+
+
+def sqlite_report(conn) -> Dict[str, Any]:
+    """
+    Size of a SQLite database and its fragmentation: the share of pages that are
+    free (left by deleted rows) and could be returned to the file system.
+    """
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {
+        "size_bytes": page_size * page_count,
+        "free_bytes": page_size * free_pages,
+        "fragmentation": round(free_pages / page_count, 4) if page_count else 0.0,
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+    }
+
+
+def compact_sqlite(conn, full_vacuum: bool = False) -> None:
+    """
+    Return free pages to the file system and refresh the query planner statistics.
+    A database created without incremental auto-vacuum is switched to it, which
+    takes one full VACUUM; after that only up to INCREMENTAL_VACUUM_PAGES pages are
+    freed per run, unless full_vacuum is set.
+    """
+    if full_vacuum or conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        # The pragma frees one page per step; execute() steps once, executescript() to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES});")
+    conn.execute("ANALYZE")
+
+
+def _run_on_price_store(fn: Callable) -> Any:
+    # VACUUM can't run inside a transaction, so the connection is in autocommit mode
+    conn = get_db_connection()
+    conn.isolation_level = None
+    try:
+        return fn(conn)
+    finally:
+        conn.close()
+
+
+def run_maintenance(db: Session, news_retention_days: Optional[int] = None, full_vacuum: bool = False) -> Dict[str, Any]:
+    """
+    Maintain the price cache and the news database: prune the NULL placeholders of
+    non-trading days in favor of checked date ranges, roll expired intraday bars up
+    into daily rows, delete news published more than news_retention_days ago
+    (NEWS_RETENTION_DAYS by default, 0 keeps all news), then vacuum and analyze both
+    databases. Returns their size and fragmentation before and after, with what was removed.
+    """
+    if news_retention_days is None:
+        news_retention_days = settings.NEWS_RETENTION_DAYS
+    start = time.perf_counter()
+    engine = db.get_bind()
+    news_is_sqlite = engine.dialect.name == "sqlite"
+
+    def news_report() -> Optional[Dict[str, Any]]:
+        if not news_is_sqlite:
+            return None
+        with engine.connect() as connection:
+            return sqlite_report(connection.connection)
+
+    report = {
+        "prices": {"before": _run_on_price_store(sqlite_report)},
+        "news": {"before": news_report()}
+    }
+
+    report["prices"]["placeholders"] = prune_null_placeholders()
+    report["prices"]["intraday_bars_compacted"] = sum(
+        compact_intraday_data(symbol, interval) for symbol, interval in get_intraday_tables()
+    )
+
+    expired = 0
+    if news_retention_days > 0:
+        cutoff = datetime.utcnow() - timedelta(days=news_retention_days)
+        expired = db.query(StockNews).filter(StockNews.published_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+    report["news"]["expired_articles"] = expired
+
+    _run_on_price_store(lambda conn: compact_sqlite(conn, full_vacuum))
+    if news_is_sqlite:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            compact_sqlite(connection.connection, full_vacuum)
+    else:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("ANALYZE")
+
+    report["prices"]["after"] = _run_on_price_store(sqlite_report)
+    report["news"]["after"] = news_report()
+    report["seconds"] = round(time.perf_counter() - start, 2)
+    _record_run()
+    logger.info(
+        f"Maintenance done in {report['seconds']}s: pruned {report['prices']['placeholders']['rows']} placeholders, "
+        f"compacted {report['prices']['intraday_bars_compacted']} intraday bars, expired {expired} articles"
+    )
+    return report
+
+
+def _last_run_age() -> Optional[float]:
+    conn = get_db_connection()
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS maintenance_runs (finished_at TIMESTAMP)")
+        row = conn.execute("SELECT MAX(finished_at) FROM maintenance_runs").fetchone()
+    finally:
+        conn.close()
+    if not row or not row[0]:
+        return None
+    return (datetime.utcnow() - datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")).total_seconds()
+
+
+def _record_run() -> None:
+    conn = get_db_connection()
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS maintenance_runs (finished_at TIMESTAMP)")
+        conn.execute("INSERT INTO maintenance_runs (finished_at) VALUES (?)", (datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),))
+        conn.execute("DELETE FROM maintenance_runs WHERE finished_at < (SELECT MAX(finished_at) FROM maintenance_runs)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_scheduled_maintenance(session_factory: Callable[[], Session]) -> bool:
+    """
+    Run maintenance unless it ran less than MAINTENANCE_INTERVAL_HOURS ago, in this
+    process or another worker sharing the databases. Returns True if it ran.
+    """
+    age = _last_run_age()
+    if age is not None and age < settings.MAINTENANCE_INTERVAL_HOURS * 3600:
+        return False
+    db = session_factory()
+    try:
+        run_maintenance(db)
+    finally:
+        db.close()
+    return True
+
+
+def start_maintenance_scheduler(session_factory: Callable[[], Session]) -> None:
+    """
+    Start a daemon thread that runs maintenance every MAINTENANCE_INTERVAL_HOURS
+    (0 disables it), checking every few minutes whether a run is due.
+    """
+    global _scheduler
+    if _scheduler is not None or settings.MAINTENANCE_INTERVAL_HOURS <= 0:
+        return
+
+    def loop():
+        # Let the API start serving before the first run
+        time.sleep(60)
+        while True:
+            try:
+                run_scheduled_maintenance(session_factory)
+            except Exception as e:
+                logger.error(f"Scheduled maintenance failed: {str(e)}")
+            time.sleep(min(settings.MAINTENANCE_INTERVAL_HOURS * 3600, 600))
+
+    _scheduler = threading.Thread(target=loop, name="maintenance", daemon=True)
+    _scheduler.start()
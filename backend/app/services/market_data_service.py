@@ -0,0 +1,385 @@
+import glob
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import quote
+from ..core.config import settings
+from ..core.metrics import track_stage, UPSTREAM_CALLS, UPSTREAM_RATE_LIMITS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Calls whose outcome makes up a provider's success rate
+HEALTH_WINDOW = 50
+
+# Weight of the latest call in a provider's smoothed latency
+LATENCY_SMOOTHING = 0.2
+
+# Periods as yfinance spells them: a count of days, weeks, months or years
+_PERIOD_PATTERN = re.compile(r"(\d+)(d|wk|mo|y)")
+
+
+class MarketDataError(Exception):
+    """
+    No provider could answer a market data request.
+    """
+
+
+class MarketDataRateLimitError(MarketDataError):
+    """
+    No provider could answer, and at least one was rate-limited (HTTP 429).
+    """
+
+
+def is_rate_limit(error: Exception) -> bool:
+    error_str = str(error)
+    return "429" in error_str or "Too Many Requests" in error_str
+
+
+class MarketDataProvider:
+    """
+    Base class of the market data providers. Histories are pandas DataFrames shaped
+    like those of yfinance: a DatetimeIndex and 'Open', 'High', 'Low', 'Close' and
+    'Volume' columns. An empty history or info means the provider has no data for
+    the request, so the next one is asked.
+    """
+
+    name = "base"
+
+    @property
+    def configuration_error(self) -> Optional[str]:
+        return None
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        """
+        What the provider knows about a symbol; 'regularMarketPrice' if it is traded.
+        """
+        raise NotImplementedError
+
+    def history(self, symbol: str, period: Optional[str] = None, interval: str = "1d", start=None):
+        """
+        Bars of a symbol over a period ('1mo', '5y', 'max', ...), or since start
+        (seconds since the epoch or a datetime).
+        """
+        raise NotImplementedError
+
+
+class YahooProvider(MarketDataProvider):
+    name = "yahoo"
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        # Imported on first use: yfinance pulls in pandas, which dominates cold-start time
+        import yfinance as yf
+        return yf.Ticker(symbol).info
+
+    def history(self, symbol: str, period: Optional[str] = None, interval: str = "1d", start=None):
+        import yfinance as yf
+        ticker = yf.Ticker(symbol)
+        if start is not None:
+            return ticker.history(start=start, interval=interval)
+        return ticker.history(period=period, interval=interval)
+
+
+class FixtureProvider(MarketDataProvider):
+    """
+    Recorded histories read from a directory, for development, tests and benchmarks
+    without network access. Daily bars of a symbol are read from `<symbol>.csv` or
+    `<symbol>.parquet` (a 'Date' column and the price columns, in any case), or from
+    the prices of a snapshot export (`python -m app.tools.snapshot export`); bars of
+    an intraday interval from `<symbol>.<interval>.csv` or `.parquet` (a 'Datetime'
+    column). Periods count back from the newest bar, so a fixture answers the same
+    however old it gets.
+    """
+
+    name = "fixtures"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # Loaded files by path, with the modification time they were loaded at
+        self._frames: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def configuration_error(self) -> Optional[str]:
+        if not self.directory:
+            return "MARKET_DATA_FIXTURES_DIR is not set"
+        if not os.path.isdir(self.directory):
+            return f"MARKET_DATA_FIXTURES_DIR {self.directory} is not a directory"
+        return None
+
+    def _files(self, symbol: str, interval: str) -> List[str]:
+        name = quote(symbol, safe="") + ("" if interval == "1d" else f".{interval}")
+        for extension in ("parquet", "csv"):
+            path = os.path.join(self.directory, f"{name}.{extension}")
+            if os.path.isfile(path):
+                return [path]
+        if interval == "1d":
+            return sorted(glob.glob(os.path.join(self.directory, "prices", f"symbol={quote(symbol, safe='')}", "year=*", "*.parquet")))
+        return []
+
+    def _read(self, path: str, intraday: bool):
+        import pandas as pd
+
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._frames.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        frame = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+        frame = frame.rename(columns={column: column.capitalize() for column in frame.columns if column.capitalize() in PRICE_COLUMNS})
+        time_column = next(column for column in frame.columns if column.lower() in ("datetime", "date", "timestamp"))
+        if intraday:
+            # Each bar keeps the UTC offset it was recorded with (UTC if none), so bars show
+            # in exchange time like those of yfinance, across daylight saving changes too
+            stamps = [pd.Timestamp(value) for value in frame[time_column].astype(str)]
+            index = pd.Index([stamp.tz_localize("UTC") if stamp.tzinfo is None else stamp for stamp in stamps], name="Datetime")
+        else:
+            index = pd.DatetimeIndex(pd.to_datetime(frame[time_column].astype(str).str[:10]), name="Date")
+        frame = frame[PRICE_COLUMNS].set_axis(index)
+        # Snapshot exports keep the dates without trading, which histories leave out
+        frame = frame[frame["Close"].notna()].astype({"Volume": "int64"}, errors="ignore")
+        with self._lock:
+            self._frames[path] = (mtime, frame)
+        return frame
+
+    def _load(self, symbol: str, interval: str):
+        import pandas as pd
+
+        frames = [self._read(path, interval != "1d") for path in self._files(symbol, interval)]
+        if not frames:
+            return pd.DataFrame(columns=PRICE_COLUMNS, index=pd.DatetimeIndex([]))
+        frame = frames[0] if len(frames) == 1 else pd.concat(frames)
+        return frame[~frame.index.duplicated(keep="last")].sort_index()
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        frame = self._load(symbol, "1d")
+        if frame.empty:
+            return {}
+        return {"symbol": symbol, "regularMarketPrice": float(frame["Close"].iloc[-1])}
+
+    def history(self, symbol: str, period: Optional[str] = None, interval: str = "1d", start=None):
+        import pandas as pd
+
+        frame = self._load(symbol, interval)
+        if frame.empty:
+            return frame
+        if start is not None:
+            first = pd.Timestamp(start, unit="s", tz="UTC") if isinstance(start, (int, float)) else pd.Timestamp(start)
+            if interval == "1d":
+                first = first.tz_convert(None) if first.tzinfo is not None else first
+            elif first.tzinfo is None:
+                first = first.tz_localize("UTC")
+            return frame[frame.index >= first]
+        if not period or period == "max":
+            return frame
+        last = frame.index[-1].normalize()
+        if period == "ytd":
+            first = last.replace(month=1, day=1)
+        else:
+            match = _PERIOD_PATTERN.fullmatch(period)
+            if not match:
+                raise ValueError(f"Unsupported period: {period}")
+            count, unit = int(match.group(1)), match.group(2)
+            offset = {
+                "d": pd.DateOffset(days=count), "wk": pd.DateOffset(weeks=count),
+                "mo": pd.DateOffset(months=count), "y": pd.DateOffset(years=count)
+            }[unit]
+            # '1d' is the newest session, '5d' the sessions of the last five days
+            first = last - offset + pd.Timedelta(days=1)
+        return frame[frame.index >= first]
+
+
+class ProviderHealth:
+    """
+    How a provider's recent calls went: the share that succeeded, their smoothed
+    latency, and until when it is cooling down after a rate limit or a run of failures.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.rate_limits = 0
+        self.consecutive_failures = 0
+        self.latency: Optional[float] = None
+        self.cooldown_until = 0.0
+        self.last_error: Optional[str] = None
+        self._outcomes: deque = deque(maxlen=HEALTH_WINDOW)
+
+    @property
+    def success_rate(self) -> Optional[float]:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else None
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def _record(self, succeeded: bool, seconds: float) -> None:
+        self.calls += 1
+        self._outcomes.append(succeeded)
+        self.latency = seconds if self.latency is None else (1 - LATENCY_SMOOTHING) * self.latency + LATENCY_SMOOTHING * seconds
+
+    def record_success(self, seconds: float) -> None:
+        self._record(True, seconds)
+        self.consecutive_failures = 0
+
+    def record_failure(self, seconds: float, error: Exception, rate_limited: bool) -> None:
+        self._record(False, seconds)
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)[:200]
+        if rate_limited:
+            self.rate_limits += 1
+        if rate_limited or self.consecutive_failures >= settings.MARKET_DATA_FAILURE_THRESHOLD:
+            self.cooldown_until = time.monotonic() + settings.MARKET_DATA_COOLDOWN
+
+    def summary(self, now: float) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy(now),
+            "cooldown_seconds": round(max(self.cooldown_until - now, 0.0), 1),
+            "calls": self.calls,
+            "failures": self.failures,
+            "rate_limits": self.rate_limits,
+            "success_rate": round(self.success_rate, 3) if self.success_rate is not None else None,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "last_error": self.last_error
+        }
+
+    def expected_seconds(self) -> float:
+        """
+        Expected time to get an answer: the smoothed latency over the success rate.
+        Providers without calls yet come first, so that they get measured.
+        """
+        if self.latency is None:
+            return 0.0
+        return self.latency / max(self.success_rate, 0.05)
+
+
+class MarketDataRouter:
+    """
+    Answers market data requests from the first provider that has data, trying
+    healthy providers first (by priority, or by expected latency with
+    MARKET_DATA_ROUTING='fastest') and the ones cooling down last. The health of each
+    provider is tracked per process.
+    """
+
+    def __init__(self, providers: List[MarketDataProvider], routing: str = "priority"):
+        if routing not in ("priority", "fastest"):
+            raise ValueError(f"Unknown market data routing '{routing}'. Must be one of: priority, fastest")
+        self.providers = providers
+        self.routing = routing
+        self._health = {provider.name: ProviderHealth() for provider in providers}
+        self._lock = threading.Lock()
+
+    def route(self) -> List[MarketDataProvider]:
+        """
+        The providers in the order the next request tries them.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [provider for provider in self.providers if self._health[provider.name].healthy(now)]
+            if self.routing == "fastest":
+                # Stable, so priority breaks ties
+                healthy.sort(key=lambda provider: self._health[provider.name].expected_seconds())
+            cooling = [provider for provider in self.providers if provider not in healthy]
+        return healthy + cooling
+
+    def _call(self, stage: str, symbol: str, method: Callable, has_data: Callable):
+        answer = None
+        errors = []
+        for provider in self.route():
+            health = self._health[provider.name]
+            UPSTREAM_CALLS.labels(provider=provider.name).inc()
+            start = time.perf_counter()
+            try:
+                with track_stage(f"{provider.name}_{stage}"):
+                    result = method(provider)
+            except Exception as e:
+                rate_limited = is_rate_limit(e)
+                if rate_limited:
+                    UPSTREAM_RATE_LIMITS.labels(provider=provider.name).inc()
+                with self._lock:
+                    health.record_failure(time.perf_counter() - start, e, rate_limited)
+                logger.warning(f"Market data provider '{provider.name}' failed ({stage} of {symbol}): {str(e)}")
+                errors.append((provider.name, e, rate_limited))
+                continue
+            with self._lock:
+                health.record_success(time.perf_counter() - start)
+            if has_data(result):
+                if errors:
+                    logger.info(f"Served {stage} of {symbol} from '{provider.name}' after {', '.join(name for name, _, _ in errors)} failed")
+                return result
+            if answer is None:
+                answer = result
+
+        if errors:
+            # An empty answer isn't conclusive while a provider that may have data failed
+            message = "; ".join(f"{name}: {str(e)}" for name, e, _ in errors)
+            if any(rate_limited for _, _, rate_limited in errors):
+                raise MarketDataRateLimitError(message) from errors[-1][1]
+            raise MarketDataError(message) from errors[-1][1]
+        return answer
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        """
+        The first info that has a 'regularMarketPrice', or else the first answer (empty
+        if no provider knows the symbol).
+        """
+        return self._call("info", symbol, lambda provider: provider.info(symbol),
+                          lambda info: bool(info) and "regularMarketPrice" in info) or {}
+
+    def history(self, symbol: str, period: Optional[str] = None, interval: str = "1d", start=None, stage: str = "fetch"):
+        """
+        The first non-empty history, or else an empty one. The call of each provider
+        is timed as the '<provider>_<stage>' stage.
+        """
+        return self._call(stage, symbol, lambda provider: provider.history(symbol, period=period, interval=interval, start=start),
+                          lambda hist: hist is not None and not hist.empty)
+
+    def health(self) -> List[Dict[str, Any]]:
+        """
+        The providers in routing order, with the health of each.
+        """
+        now = time.monotonic()
+        route = self.route()
+        with self._lock:
+            return [{"name": provider.name, **self._health[provider.name].summary(now)} for provider in route]
+
+
+_router: Optional[MarketDataRouter] = None
+_router_lock = threading.Lock()
+
+
+def _create_provider(name: str) -> MarketDataProvider:
+    if name == "yahoo":
+        return YahooProvider()
+    if name == "fixtures":
+        return FixtureProvider(settings.MARKET_DATA_FIXTURES_DIR)
+    raise ValueError(f"Unknown market data provider '{name}'. Must be one of: yahoo, fixtures")
+
+
+def get_market_data() -> MarketDataRouter:
+    """
+    The router over the MARKET_DATA_PROVIDERS, created on first use and shared so that
+    provider health is tracked process-wide. Misconfigured providers are left out.
+    """
+    global _router
+    with _router_lock:
+        if _router is None:
+            providers = []
+            for name in [name.strip() for name in settings.MARKET_DATA_PROVIDERS.split(",") if name.strip()]:
+                provider = _create_provider(name)
+                if provider.configuration_error:
+                    logger.error(f"Market data provider '{name}' is not configured: {provider.configuration_error}")
+                    continue
+                providers.append(provider)
+            if not providers:
+                raise ValueError(f"No usable market data provider in MARKET_DATA_PROVIDERS: {settings.MARKET_DATA_PROVIDERS}")
+            _router = MarketDataRouter(providers, settings.MARKET_DATA_ROUTING)
+            logger.info(f"Market data providers: {', '.join(provider.name for provider in providers)} ({_router.routing} routing)")
+        return _router
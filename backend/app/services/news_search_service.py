@@ -0,0 +1,104 @@
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Relative weights of title and description matches in the BM25 ranking
+TITLE_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+SEARCH_SQL = """
+SELECT n.id, s.symbol, n.title, n.description, n.url, n.source, n.published_at,
+       bm25(stock_news_fts, :title_weight, :description_weight) AS rank,
+       snippet(stock_news_fts, 0, '<mark>', '</mark>', '…', 12) AS title_snippet,
+       snippet(stock_news_fts, 1, '<mark>', '</mark>', '…', 32) AS description_snippet
+FROM stock_news_fts
+JOIN stock_news n ON n.id = stock_news_fts.rowid
+JOIN stocks s ON s.id = n.stock_id
+WHERE stock_news_fts MATCH :query {filters}
+ORDER BY rank
+LIMIT :limit OFFSET :offset
+"""
+
+COUNT_SQL = """
+SELECT COUNT(*)
+FROM stock_news_fts
+JOIN stock_news n ON n.id = stock_news_fts.rowid
+JOIN stocks s ON s.id = n.stock_id
+WHERE stock_news_fts MATCH :query {filters}
+"""
+
+
+def quote_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 query matching all of its words, for queries that
+    aren't valid FTS5 syntax (e.g. unbalanced quotes or stray operators).
+    """
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_news(db: Session, query: str, symbol: Optional[str] = None, from_date: Optional[datetime] = None,
+                to_date: Optional[datetime] = None, limit: int = 20, offset: int = 0) -> Dict:
+    """
+    Search stored articles of all (or one) symbols with FTS5, best BM25 matches
+    first, with highlighted title and description snippets.
+    The query supports FTS5 syntax (phrases, OR, NOT, prefix*); if it isn't valid
+    FTS5 it is searched as plain words instead. `to_date` is inclusive.
+    """
+    filters = []
+    params = {
+        "title_weight": TITLE_WEIGHT,
+        "description_weight": DESCRIPTION_WEIGHT,
+        "limit": limit,
+        "offset": offset
+    }
+    if symbol:
+        filters.append("AND s.symbol = :symbol")
+        params["symbol"] = symbol
+    if from_date:
+        filters.append("AND n.published_at >= :from_date")
+        params["from_date"] = from_date.strftime("%Y-%m-%d %H:%M:%S")
+    if to_date:
+        filters.append("AND n.published_at < :to_date")
+        params["to_date"] = (to_date + timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    search_sql = text(SEARCH_SQL.format(filters=" ".join(filters)))
+    count_sql = text(COUNT_SQL.format(filters=" ".join(filters)))
+
+    def run(fts_query: str):
+        query_params = {**params, "query": fts_query}
+        rows = db.execute(search_sql, query_params).fetchall()
+        total = db.execute(count_sql, query_params).scalar()
+        return rows, total
+
+    try:
+        rows, total = run(query)
+    except OperationalError as e:
+        # Invalid FTS5 syntax: fall back to matching the plain words
+        db.rollback()
+        fallback = quote_query(query)
+        logger.info(f"News search query {query!r} is not valid FTS5 ({str(e.orig)}), searching for {fallback!r}")
+        if not fallback:
+            return {"total": 0, "data": []}
+        rows, total = run(fallback)
+
+    return {
+        "total": total,
+        "data": [{
+            "symbol": row.symbol,
+            "title": row.title,
+            "description": row.description,
+            "url": row.url,
+            "source": row.source,
+            "published_at": str(row.published_at)[:19],
+            "score": round(-row.rank, 4),
+            "title_snippet": row.title_snippet,
+            "description_snippet": row.description_snippet
+        } for row in rows]
+    }
@@ -1,13 +1,63 @@
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, Any
 from datetime import datetime, timedelta
 import requests
 from fastapi import HTTPException
 from ..core.config import settings
+from ..core.metrics import track_stage, UPSTREAM_CALLS, UPSTREAM_RATE_LIMITS
+from ..core.singleflight import single_flight
+from ..core.refresh import refresh_in_background
+from .dedup_service import cluster_articles
+from .sentiment_service import score_articles
 
 logger = logging.getLogger(__name__)
 
+# Successful News API results by (symbol, period, date), with the time they were fetched
+MAX_CACHED_QUERIES = 512
+_news_cache = OrderedDict()
+_news_cache_lock = threading.Lock()
+
+def _fetch_and_cache_news(symbol: str, period: str, date: str) -> Dict[str, Any]:
+    # Coalesce concurrent identical queries into a single set of News API requests
+    result = single_flight(("newsapi", symbol, period, date), lambda: _fetch_stock_news(symbol, period, date))
+    if result["status"] in ("success", "partial_success"):
+        with _news_cache_lock:
+            _news_cache[(symbol, period, date)] = (time.time(), result)
+            _news_cache.move_to_end((symbol, period, date))
+            while len(_news_cache) > MAX_CACHED_QUERIES:
+                _news_cache.popitem(last=False)
+    return result
+
 def get_stock_news(symbol: str, period: str = '7d', date: str = None) -> Dict[str, Any]:
+    """
+    Return news for a symbol, using stale-while-revalidate on previously fetched results:
+    results younger than NEWS_FRESH_TTL are served as is, and results within
+    NEWS_STALE_BUDGET are served immediately while a background refresh runs.
+    The 'freshness' key of the result tells which case applied.
+    """
+    key = (symbol, period, date)
+    with _news_cache_lock:
+        cached = _news_cache.get(key)
+    
+    if cached:
+        fetched_at, result = cached
+        age = time.time() - fetched_at
+        if age <= settings.NEWS_FRESH_TTL:
+            return {**result, "freshness": "fresh"}
+        if age <= settings.NEWS_STALE_BUDGET:
+            refresh_in_background(("news",) + key, "news", lambda: _fetch_and_cache_news(symbol, period, date))
+            return {
+                **result,
+                "freshness": "stale",
+                "as_of": datetime.utcfromtimestamp(fetched_at).strftime("%Y-%m-%d %H:%M:%S")
+            }
+    
+    return {**_fetch_and_cache_news(symbol, period, date), "freshness": "fresh"}
+
+def _fetch_stock_news(symbol: str, period: str = '7d', date: str = None) -> Dict[str, Any]:
     # Validate API key
     if not settings.NEWS_API_KEY:
         logger.error("NEWS_API_KEY not configured in settings")
@@ -72,11 +122,14 @@ def get_stock_news(symbol: str, period: str = '7d', date: str = None) -> Dict[st
     while True:
         try:
             logger.info(f"Making API request for page {page}")
-            response = requests.get(settings.NEWS_API_BASE_URL, params=params, timeout=settings.NEWS_API_TIMEOUT)
+            UPSTREAM_CALLS.labels(provider="newsapi").inc()
+            with track_stage("newsapi_page"):
+                response = requests.get(settings.NEWS_API_BASE_URL, params=params, timeout=settings.NEWS_API_TIMEOUT)
                 
             # Handle rate limiting and older data limitation
             if response.status_code == 429:
                 logger.warning("Rate limit hit")
+                UPSTREAM_RATE_LIMITS.labels(provider="newsapi").inc()
                 return {
                     'status': 'rate_limit',
                     'message': 'Daily news rate limit reached.'
@@ -86,7 +139,7 @@ def get_stock_news(symbol: str, period: str = '7d', date: str = None) -> Dict[st
                 if all_articles:
                     return {
                         'status': 'partial_success',
-                        'data': all_articles,
+                        'data': score_articles(cluster_articles(all_articles)),
                         'warning': 'Older data not available, feature will arrive in future!'
                     }
                 return {
@@ -139,6 +192,6 @@ def get_stock_news(symbol: str, period: str = '7d', date: str = None) -> Dict[st
     
     return {
         'status': 'success',
-        'data': all_articles,
+        'data': score_articles(cluster_articles(all_articles)),
         'warning': warning_message
     }
\ No newline at end of file
@@ -0,0 +1,186 @@
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+
+# A date as YYYY-MM-DD (optionally followed by a time), or a date or datetime
+DateLike = Union[str, date, datetime]
+
+_FLOAT_COLUMNS = ("open", "high", "low", "close")
+
+
+def to_epoch_day(value: DateLike) -> int:
+    """
+    A date as days since the Unix epoch.
+    """
+    if isinstance(value, str):
+        value = value[:10]
+    elif isinstance(value, datetime):
+        value = value.date()
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def epoch_days(dates: Sequence[str]) -> np.ndarray:
+    """
+    YYYY-MM-DD dates as days since the Unix epoch, parsed in one pass.
+    """
+    return np.array(dates, dtype="datetime64[D]").astype(np.int32)
+
+
+def date_strings(days: np.ndarray) -> List[str]:
+    """
+    Days since the Unix epoch as YYYY-MM-DD dates.
+    """
+    return np.datetime_as_string(np.asarray(days).astype("datetime64[D]")).tolist()
+
+
+def _json_numbers(values: np.ndarray) -> List[str]:
+    # Floats as json.dumps writes them, NaN as null
+    return ["null" if value != value else repr(value) for value in values.tolist()]
+
+
+class PriceSeries:
+    """
+    Daily prices as parallel NumPy columns: 'days' (days since the Unix epoch, in
+    ascending order), 'open', 'high', 'low' and 'close' (NaN on dates without data)
+    and 'volume'. Slicing, by position or by date with a binary search, returns views
+    of the columns, so narrowing a series copies no prices.
+    """
+
+    __slots__ = ("days", "open", "high", "low", "close", "volume")
+
+    def __init__(self, days: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.days = days
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def empty(cls) -> "PriceSeries":
+        return cls.placeholders(np.empty(0, dtype=np.int32))
+
+    @classmethod
+    def placeholders(cls, days: np.ndarray) -> "PriceSeries":
+        """
+        Dates without data (e.g. non-trading days), given as sorted epoch days.
+        """
+        return cls(
+            np.asarray(days, dtype=np.int32),
+            *(np.full(len(days), np.nan) for _ in _FLOAT_COLUMNS),
+            np.zeros(len(days), dtype=np.int64)
+        )
+
+    @classmethod
+    def _from_records(cls, records: Sequence[Dict], dates: List[str]) -> "PriceSeries":
+        count = len(records)
+        floats = [
+            np.fromiter((np.nan if record[column] is None else record[column] for record in records), dtype=np.float64, count=count)
+            for column in _FLOAT_COLUMNS
+        ]
+        volume = np.fromiter((record["volume"] or 0 for record in records), dtype=np.int64, count=count)
+        return cls(epoch_days(dates), *floats, volume)
+
+    @classmethod
+    def from_points(cls, points: Sequence[Dict]) -> "PriceSeries":
+        """
+        From price points as served by the API ('timestamp', 'open', 'high', 'low',
+        'close' and 'volume'), in date order.
+        """
+        return cls._from_records(points, [point["timestamp"][:10] for point in points])
+
+    @classmethod
+    def from_rows(cls, rows: Sequence) -> "PriceSeries":
+        """
+        From rows of the price store ('date', 'open', 'high', 'low', 'close' and
+        'volume'), in date order.
+        """
+        return cls._from_records(rows, [row["date"] for row in rows])
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List]) -> "PriceSeries":
+        """
+        From the lists written by to_columns.
+        """
+        return cls(
+            np.array(columns["days"], dtype=np.int32),
+            *(np.array(columns[column], dtype=np.float64) for column in _FLOAT_COLUMNS),
+            np.array(columns["volume"], dtype=np.int64)
+        )
+
+    def to_columns(self) -> Dict[str, List]:
+        """
+        The columns as JSON-serializable lists (NaN stays a float).
+        """
+        return {column: getattr(self, column).tolist() for column in self.__slots__}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __getitem__(self, index) -> "PriceSeries":
+        """
+        The rows selected by a slice (views of the columns) or a boolean mask (copies).
+        """
+        return PriceSeries(*(getattr(self, column)[index] for column in self.__slots__))
+
+    def between(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> "PriceSeries":
+        """
+        The rows from start to end (inclusive, either open-ended if None).
+        """
+        lo = int(np.searchsorted(self.days, to_epoch_day(start), side="left")) if start is not None else 0
+        hi = int(np.searchsorted(self.days, to_epoch_day(end), side="right")) if end is not None else len(self.days)
+        return self[lo:max(lo, hi)]
+
+    def priced(self) -> "PriceSeries":
+        """
+        The rows with a closing price, without the dates that had no trading.
+        """
+        mask = ~np.isnan(self.close)
+        return self if mask.all() else self[mask]
+
+    def merge(self, other: "PriceSeries") -> "PriceSeries":
+        """
+        The rows of both series in date order; on dates in both, the row of other.
+        """
+        if not len(other):
+            return self
+        keep = ~np.isin(self.days, other.days)
+        merged = PriceSeries(*(
+            np.concatenate((getattr(self, column)[keep], getattr(other, column))) for column in self.__slots__
+        ))
+        return merged[np.argsort(merged.days, kind="stable")]
+
+    def filled(self, column: str) -> np.ndarray:
+        """
+        The open, high or low prices, with the close where they are missing.
+        """
+        values = getattr(self, column)
+        return np.where(np.isnan(values), self.close, values)
+
+    def dates(self) -> List[str]:
+        return date_strings(self.days)
+
+    def timestamps(self) -> List[str]:
+        return [f"{day} 00:00:00" for day in self.dates()]
+
+    def to_points(self) -> List[Dict]:
+        """
+        The rows as the API serves them: 'timestamp', the prices (None if missing) and 'volume'.
+        """
+        floats = [[None if value != value else value for value in getattr(self, column).tolist()] for column in _FLOAT_COLUMNS]
+        return [
+            {"timestamp": timestamp, "open": open_, "high": high, "low": low, "close": close, "volume": volume}
+            for timestamp, open_, high, low, close, volume in zip(self.timestamps(), *floats, self.volume.tolist())
+        ]
+
+    def to_json(self) -> bytes:
+        """
+        to_points serialized as the API's JSON responses are, formatted straight from
+        the columns.
+        """
+        return ("[" + ",".join(
+            f'{{"timestamp":"{day} 00:00:00","open":{open_},"high":{high},"low":{low},"close":{close},"volume":{volume}}}'
+            for day, open_, high, low, close, volume in zip(
+                self.dates(), *(_json_numbers(getattr(self, column)) for column in _FLOAT_COLUMNS), self.volume.tolist()
+            )
+        ) + "]").encode()
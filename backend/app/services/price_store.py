@@ -0,0 +1,907 @@
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from ..core.config import settings
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Local SQLite database: the price store of the 'sqlite' backend, and the intraday cache
+# and maintenance bookkeeping of every instance
+DB_PATH = settings.STOCK_VALUES_DB_PATH or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "stock_values.db")
+
+# A stored daily price: (date as YYYY-MM-DD, open, high, low, close, volume)
+PriceRow = Tuple[str, Optional[float], Optional[float], Optional[float], Optional[float], Optional[int]]
+
+
+def get_db_connection():
+    """
+    Create a connection to the SQLite database and return the connection object.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row  # This enables column access by name
+    return conn
+
+
+def get_table_name(symbol: str) -> str:
+    """
+    Sanitize the symbol to create a valid table name.
+    """
+    return f"stock_{symbol.replace('-', '_').replace('.', '_').replace('^', '_')}"
+
+
+def _ordinal(date_str: str) -> int:
+    return datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+
+
+def _from_ordinal(day: int) -> str:
+    return datetime.fromordinal(day).strftime("%Y-%m-%d")
+
+
+def _price_row(point: Dict) -> PriceRow:
+    return (point["timestamp"].split()[0], point["open"], point["high"], point["low"], point["close"], point["volume"])
+
+
+def _snapshot_values(symbol: str, latest_rows: Sequence, high_52w: Optional[float], low_52w: Optional[float]) -> Tuple:
+    """
+    The market_snapshot columns of a symbol from its last two (date, close, volume)
+    rows, newest first, and its 52-week range.
+    """
+    now_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    last_date, last_close, volume = latest_rows[0][0], latest_rows[0][1], latest_rows[0][2]
+    previous_close = latest_rows[1][1] if len(latest_rows) > 1 else None
+    change = last_close - previous_close if previous_close else None
+    change_percent = (change / previous_close) * 100 if previous_close else None
+    return (symbol, last_date, last_close, previous_close, change, change_percent, high_52w, low_52w, volume, now_str, now_str)
+
+
+def _year_before(date_str: str) -> str:
+    return (datetime.strptime(date_str, "%Y-%m-%d") - timedelta(days=365)).strftime("%Y-%m-%d")
+
+
+class PriceStore:
+    """
+    Base class of the daily price stores. A store keeps each symbol's daily OHLCV
+    rows, the date ranges checked against Yahoo Finance in which dates without a row
+    had no trading, and a market snapshot row per symbol that every write keeps in sync.
+    Caching decisions (missing dates, freshness) are made by stock_values_db on top.
+    """
+
+    name = "base"
+
+    def get_prices(self, symbol: str, start_date: str, end_date: str) -> Tuple[List, List[Tuple[str, str, Optional[str]]]]:
+        """
+        Rows of a symbol between two dates (YYYY-MM-DD, inclusive) in date order, with
+        columns date, open, high, low, close, volume and timestamp (when the row was
+        written, UTC), and the checked date ranges overlapping them as (start, end,
+        checked_at), checked_at being when a date of the range was last checked (UTC,
+        None for ranges recorded before it was tracked).
+        """
+        raise NotImplementedError
+
+    def store_prices(self, symbol: str, data_points: List[Dict], not_available_dates: Optional[List[str]] = None) -> int:
+        """
+        Store data points ({"timestamp", "open", "high", "low", "close", "volume"}) of a
+        symbol in one transaction, replacing rows of the same dates, and record the
+        dates Yahoo Finance had no data for. Returns the number of points stored.
+        """
+        raise NotImplementedError
+
+    def bulk_store_prices(self, data: Dict[str, List[Dict]], not_available_dates: Optional[Dict[str, List[str]]] = None) -> int:
+        """
+        Store the data points of many symbols in one transaction, and the dates each
+        had no data for ({symbol: dates}, never replacing a stored price). Returns the
+        number of points stored, or 0 if the transaction failed.
+        """
+        raise NotImplementedError
+
+    def store_rollup(self, symbol: str, rows: List[PriceRow]) -> int:
+        """
+        Store daily rows rolled up from intraday bars, except on dates that already have
+        a price: those came from Yahoo Finance's daily history and take precedence.
+        Returns the number of rows stored; raises if the write failed.
+        """
+        raise NotImplementedError
+
+    def iter_prices(self, symbol: str, chunk_rows: int) -> Iterator[List[PriceRow]]:
+        """
+        All rows of a symbol in date order, in chunks of at most chunk_rows.
+        """
+        raise NotImplementedError
+
+    def get_close_history(self, symbols: List[str], start_date: Optional[str] = None) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        The (date, close) rows of several symbols since start_date, in date order.
+        Symbols without any price are left out.
+        """
+        raise NotImplementedError
+
+    def get_market_snapshot(self) -> Dict[str, Dict]:
+        """
+        The snapshot rows of all symbols, keyed by symbol.
+        """
+        raise NotImplementedError
+
+    def get_price_coverage(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        First and last date and number of prices of each symbol that has any.
+        """
+        raise NotImplementedError
+
+    def prune_null_placeholders(self) -> Dict[str, int]:
+        """
+        Replace rows recording that a date had no data with checked date ranges.
+        """
+        return {"tables": 0, "rows": 0}
+
+
+class SQLitePriceStore(PriceStore):
+    """
+    Daily prices in the local SQLite database, one table per symbol keyed by date.
+    Dates without data are stored as rows with NULL prices until maintenance prunes
+    them into checked ranges.
+    """
+
+    name = "sqlite"
+
+    def __init__(self):
+        self._ensure_snapshot_table_exists()
+        self._ensure_checked_ranges_table_exists()
+
+    def _ensure_snapshot_table_exists(self) -> None:
+        """
+        Create the market snapshot table if it doesn't exist.
+        It holds one row per symbol with the latest quote statistics, kept up to date
+        by every write so the dashboard doesn't need the full price series.
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS market_snapshot (
+            symbol TEXT PRIMARY KEY,
+            last_date TEXT,
+            last_close REAL,
+            previous_close REAL,
+            change REAL,
+            change_percent REAL,
+            high_52w REAL,
+            low_52w REAL,
+            volume INTEGER,
+            updated_at TIMESTAMP,
+            checked_at TIMESTAMP
+        )
+        """)
+
+        conn.commit()
+        conn.close()
+
+    def _ensure_checked_ranges_table_exists(self) -> None:
+        """
+        Create the table of date ranges of each price table that were fully checked
+        against Yahoo Finance: dates in them without a row had no trading. Maintenance
+        replaces the NULL placeholder rows of such dates with these ranges, keeping when
+        they were written as the time the range was checked.
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS price_checked_ranges (
+            table_name TEXT,
+            start_date TEXT,
+            end_date TEXT,
+            checked_at TIMESTAMP,
+            PRIMARY KEY (table_name, start_date)
+        )
+        """)
+        # Databases created before the check time was tracked
+        cursor.execute("PRAGMA table_info(price_checked_ranges)")
+        if "checked_at" not in {row['name'] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE price_checked_ranges ADD COLUMN checked_at TIMESTAMP")
+
+        conn.commit()
+        conn.close()
+
+    def ensure_stock_table_exists(self, symbol: str) -> str:
+        """
+        Create a table for the given stock symbol if it doesn't exist.
+        Each stock has its own table with date and closing price.
+        """
+        table_name = get_table_name(symbol)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        # Create table if it doesn't exist
+        cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            date TEXT PRIMARY KEY,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume INTEGER,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+
+        conn.commit()
+        conn.close()
+
+        return table_name
+
+    def _existing_tables(self, cursor: sqlite3.Cursor) -> set:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'stock_%'")
+        return {row['name'] for row in cursor.fetchall()}
+
+    def get_prices(self, symbol: str, start_date: str, end_date: str) -> Tuple[List, List[Tuple[str, str, Optional[str]]]]:
+        table_name = self.ensure_stock_table_exists(symbol)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            # Get all dates in the range, including NULL entries
+            # This helps us identify which dates we've already tried to fetch but were unavailable
+            cursor.execute(f"""
+            SELECT date, open, high, low, close, volume, timestamp
+            FROM {table_name}
+            WHERE date BETWEEN ? AND ?
+            ORDER BY date
+            """, (start_date, end_date))
+            rows = cursor.fetchall()
+
+            cursor.execute("""
+            SELECT start_date, end_date, checked_at
+            FROM price_checked_ranges
+            WHERE table_name = ? AND end_date >= ? AND start_date <= ?
+            """, (table_name, start_date, end_date))
+            checked_ranges = [(row['start_date'], row['end_date'], row['checked_at']) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        return rows, checked_ranges
+
+    def store_prices(self, symbol: str, data_points: List[Dict], not_available_dates: Optional[List[str]] = None) -> int:
+        table_name = self.ensure_stock_table_exists(symbol)
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        # Track successful inserts for logging
+        inserted_count = 0
+        unavailable_inserted = 0
+
+        try:
+            # Begin transaction
+            conn.execute('BEGIN TRANSACTION')
+
+            # Store data points
+            for point in data_points:
+                row = _price_row(point)
+                try:
+                    cursor.execute(f"""
+                    INSERT OR REPLACE INTO {table_name} (date, open, high, low, close, volume)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """, row)
+                    inserted_count += 1
+                except sqlite3.Error as e:
+                    logger.error(f"Database error when storing data for {symbol} on {row[0]}: {str(e)}")
+
+            # Store NULL values for dates where data is not available
+            if not_available_dates:
+                for date_str in not_available_dates:
+                    try:
+                        cursor.execute(f"""
+                        INSERT OR REPLACE INTO {table_name} (date, open, high, low, close, volume)
+                        VALUES (?, NULL, NULL, NULL, NULL, NULL)
+                        """, (date_str,))
+                        unavailable_inserted += 1
+                    except sqlite3.Error as e:
+                        logger.error(f"Database error when marking unavailable date for {symbol} on {date_str}: {str(e)}")
+
+            # Keep the market snapshot in sync within the same transaction
+            self._update_snapshot(cursor, symbol, table_name, recompute=inserted_count > 0)
+
+            # Commit transaction
+            conn.commit()
+
+            logger.info(f"Successfully stored {inserted_count}/{len(data_points)} data points and {unavailable_inserted}/{len(not_available_dates) if not_available_dates else 0} unavailable dates for {symbol}")
+            if inserted_count > 0 or unavailable_inserted > 0:
+                logger.info(f"Cache updated for {symbol} - future requests will use cached data")
+
+        except sqlite3.Error as e:
+            # Rollback transaction on error
+            conn.rollback()
+            logger.error(f"Transaction failed when storing data for {symbol}: {str(e)}")
+            inserted_count = 0
+        finally:
+            # Always close the connection
+            conn.close()
+
+        return inserted_count
+
+    def bulk_store_prices(self, data: Dict[str, List[Dict]], not_available_dates: Optional[Dict[str, List[str]]] = None) -> int:
+        tables = {symbol: self.ensure_stock_table_exists(symbol) for symbol, points in data.items() if points}
+        not_available_dates = not_available_dates or {}
+        inserted_count = 0
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            conn.execute('BEGIN TRANSACTION')
+            for symbol, table_name in tables.items():
+                cursor.executemany(f"""
+                INSERT OR REPLACE INTO {table_name} (date, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """, [_price_row(point) for point in data[symbol]])
+                inserted_count += len(data[symbol])
+                cursor.executemany(f"""
+                INSERT OR IGNORE INTO {table_name} (date, open, high, low, close, volume)
+                VALUES (?, NULL, NULL, NULL, NULL, NULL)
+                """, [(date_str,) for date_str in not_available_dates.get(symbol, [])])
+                self._update_snapshot(cursor, symbol, table_name)
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Bulk load of {len(tables)} symbols failed: {str(e)}")
+            return 0
+        finally:
+            conn.close()
+        return inserted_count
+
+    def store_rollup(self, symbol: str, rows: List[PriceRow]) -> int:
+        if not rows:
+            return 0
+        table_name = self.ensure_stock_table_exists(symbol)
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            conn.execute('BEGIN TRANSACTION')
+            cursor.execute(
+                f"SELECT date FROM {table_name} WHERE date BETWEEN ? AND ? AND close IS NOT NULL",
+                (min(row[0] for row in rows), max(row[0] for row in rows))
+            )
+            existing = {row["date"] for row in cursor.fetchall()}
+            new_rows = [row for row in rows if row[0] not in existing]
+            if new_rows:
+                cursor.executemany(f"""
+                INSERT OR REPLACE INTO {table_name} (date, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """, new_rows)
+                self._update_snapshot(cursor, symbol, table_name)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return len(new_rows)
+
+    def iter_prices(self, symbol: str, chunk_rows: int) -> Iterator[List[PriceRow]]:
+        conn = get_db_connection()
+        try:
+            if get_table_name(symbol) not in self._existing_tables(conn.cursor()):
+                return
+            cursor = conn.execute(f"SELECT date, open, high, low, close, volume FROM {get_table_name(symbol)} ORDER BY date")
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            conn.close()
+
+    def _update_snapshot(self, cursor: sqlite3.Cursor, symbol: str, table_name: str, recompute: bool = True) -> None:
+        """
+        Update the snapshot row of a symbol from its price table.
+        Only reads the last two trading days and the last 52 weeks through the date
+        primary key, so it is cheap enough to run on every write. With recompute=False
+        only the time the symbol was last checked against Yahoo Finance is updated.
+        """
+        if not recompute:
+            cursor.execute("UPDATE market_snapshot SET checked_at = ? WHERE symbol = ?", (datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), symbol))
+            return
+
+        cursor.execute(f"""
+        SELECT date, close, volume
+        FROM {table_name}
+        WHERE close IS NOT NULL
+        ORDER BY date DESC
+        LIMIT 2
+        """)
+        latest_rows = cursor.fetchall()
+        if not latest_rows:
+            return
+
+        cursor.execute(f"""
+        SELECT MAX(high), MIN(low)
+        FROM {table_name}
+        WHERE date > ? AND close IS NOT NULL
+        """, (_year_before(latest_rows[0]['date']),))
+        high_52w, low_52w = cursor.fetchone()
+
+        cursor.execute("""
+        INSERT OR REPLACE INTO market_snapshot
+        (symbol, last_date, last_close, previous_close, change, change_percent, high_52w, low_52w, volume, updated_at, checked_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, _snapshot_values(symbol, latest_rows, high_52w, low_52w))
+
+    def get_close_history(self, symbols: List[str], start_date: Optional[str] = None) -> Dict[str, List[Tuple[str, float]]]:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        history = {}
+        try:
+            existing_tables = self._existing_tables(cursor)
+            for symbol in symbols:
+                table_name = get_table_name(symbol)
+                if table_name not in existing_tables:
+                    continue
+                cursor.execute(f"""
+                SELECT date, close
+                FROM {table_name}
+                WHERE date >= ? AND close IS NOT NULL
+                ORDER BY date
+                """, (start_date or "0000-00-00",))
+                rows = cursor.fetchall()
+                if rows:
+                    history[symbol] = [(row['date'], row['close']) for row in rows]
+        finally:
+            conn.close()
+        return history
+
+    def get_market_snapshot(self) -> Dict[str, Dict]:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM market_snapshot")
+        rows = cursor.fetchall()
+        conn.close()
+        return {row['symbol']: dict(row) for row in rows}
+
+    def get_price_coverage(self, symbols: List[str]) -> Dict[str, Dict]:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        coverage = {}
+        try:
+            existing_tables = self._existing_tables(cursor)
+            for symbol in symbols:
+                table_name = get_table_name(symbol)
+                if table_name not in existing_tables:
+                    continue
+                cursor.execute(f"SELECT MIN(date), MAX(date), COUNT(*) FROM {table_name} WHERE close IS NOT NULL")
+                first_date, last_date, rows = cursor.fetchone()
+                if rows:
+                    coverage[symbol] = {"first_date": first_date, "last_date": last_date, "rows": rows}
+        finally:
+            conn.close()
+        return coverage
+
+    def prune_null_placeholders(self) -> Dict[str, int]:
+        """
+        Replace the NULL placeholder rows of every price table with checked date ranges:
+        the runs of consecutive dates that have a row or were already in a checked range
+        (keeping the runs with a placeholder or an earlier range), checked when their
+        latest placeholder or range was, after which all placeholders are deleted. Each
+        table is pruned in its own transaction.
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        tables = sorted(self._existing_tables(cursor))
+
+        pruned_rows = 0
+        pruned_tables = 0
+        try:
+            for table_name in tables:
+                cursor.execute(f"SELECT date, close IS NULL AS placeholder, timestamp FROM {table_name} ORDER BY date")
+                rows = cursor.fetchall()
+                placeholders = {_ordinal(row['date']) for row in rows if row['placeholder']}
+                if not placeholders:
+                    continue
+
+                # Dates checked before, from rows and earlier ranges, as day ordinals, and
+                # when the dates without a row were checked
+                checked = {_ordinal(row['date']) for row in rows} | placeholders
+                checked_times = {_ordinal(row['date']): row['timestamp'] for row in rows if row['placeholder']}
+                cursor.execute("SELECT start_date, end_date, checked_at FROM price_checked_ranges WHERE table_name = ?", (table_name,))
+                for checked_range in cursor.fetchall():
+                    days = range(_ordinal(checked_range['start_date']), _ordinal(checked_range['end_date']) + 1)
+                    checked.update(days)
+                    for day in days:
+                        checked_times.setdefault(day, checked_range['checked_at'])
+                keep = placeholders | (checked - {_ordinal(row['date']) for row in rows})
+
+                runs = []
+                for day in sorted(checked):
+                    if runs and day == runs[-1][1] + 1:
+                        runs[-1][1] = day
+                        runs[-1][2] = runs[-1][2] or day in keep
+                    else:
+                        runs.append([day, day, day in keep, None])
+                    checked_at = checked_times.get(day)
+                    if checked_at and (runs[-1][3] is None or checked_at > runs[-1][3]):
+                        runs[-1][3] = checked_at
+
+                conn.execute('BEGIN TRANSACTION')
+                cursor.execute("DELETE FROM price_checked_ranges WHERE table_name = ?", (table_name,))
+                cursor.executemany("INSERT INTO price_checked_ranges (table_name, start_date, end_date, checked_at) VALUES (?, ?, ?, ?)", [
+                    (table_name, _from_ordinal(start), _from_ordinal(end), checked_at) for start, end, kept, checked_at in runs if kept
+                ])
+                cursor.execute(f"DELETE FROM {table_name} WHERE close IS NULL")
+                conn.commit()
+                pruned_rows += len(placeholders)
+                pruned_tables += 1
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Pruning NULL placeholders failed: {str(e)}")
+        finally:
+            conn.close()
+
+        logger.info(f"Pruned {pruned_rows} NULL placeholders from {pruned_tables} price tables")
+        return {"tables": pruned_tables, "rows": pruned_rows}
+
+
+class PostgresPriceStore(PriceStore):
+    """
+    Daily prices in PostgreSQL, shared by all API instances: a single price_bars
+    table keyed by (symbol, date) and hash-partitioned by symbol, so a symbol's reads
+    touch one partition (not stock_prices, the ORM's table, which is in the same
+    database when PRICE_STORE_URL is left to default to DATABASE_URL). Writes are bulk-loaded with COPY into a staging table and
+    merged with one INSERT ... ON CONFLICT. Dates without data are stored as checked
+    ranges directly, so there are no placeholder rows to prune.
+    """
+
+    name = "postgres"
+
+    def __init__(self, url: str, partitions: int, pool_size: int, max_overflow: int):
+        from sqlalchemy import create_engine
+        if url.startswith("postgres://"):
+            url = "postgresql://" + url[len("postgres://"):]
+        self.partitions = max(1, partitions)
+        self.engine = create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True)
+        self._create_schema()
+
+    @contextmanager
+    def _cursor(self, name: Optional[str] = None):
+        """
+        A cursor on a pooled connection, in a transaction that is committed when the
+        block ends (or rolled back if it raises); a name makes it a server-side cursor.
+        """
+        conn = self.engine.raw_connection()
+        try:
+            cursor = conn.cursor(name) if name else conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _create_schema(self) -> None:
+        with self._cursor() as cursor:
+            # Instances starting together would race to create the same tables
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('price_bars schema'))")
+            # Stores created before the rename kept their prices in a partitioned stock_prices
+            cursor.execute("""
+            SELECT to_regclass('price_bars') IS NULL
+                AND EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('stock_prices'))
+            """)
+            if cursor.fetchone()[0]:
+                cursor.execute("ALTER TABLE stock_prices RENAME TO price_bars")
+                # Its partitions and indexes too, whose names the ORM's table would clash with
+                cursor.execute("""
+                SELECT relname FROM pg_class WHERE oid IN (
+                    SELECT inhrelid FROM pg_inherits WHERE inhparent = 'price_bars'::regclass
+                    UNION SELECT indexrelid FROM pg_index WHERE indrelid = 'price_bars'::regclass
+                        OR indrelid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = 'price_bars'::regclass)
+                )
+                """)
+                for (relation,) in cursor.fetchall():
+                    if relation.startswith("stock_prices"):
+                        cursor.execute(f"ALTER TABLE {relation} RENAME TO price_bars{relation[len('stock_prices'):]}")
+                logger.info("Renamed the price store's stock_prices table to price_bars")
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_bars (
+                symbol TEXT NOT NULL,
+                date DATE NOT NULL,
+                open DOUBLE PRECISION,
+                high DOUBLE PRECISION,
+                low DOUBLE PRECISION,
+                close DOUBLE PRECISION,
+                volume BIGINT,
+                updated_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+                PRIMARY KEY (symbol, date)
+            ) PARTITION BY HASH (symbol)
+            """)
+            # An existing table keeps the partitions it was created with
+            cursor.execute("SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'price_bars'::regclass")
+            if cursor.fetchone()[0] == 0:
+                for remainder in range(self.partitions):
+                    cursor.execute(f"""
+                    CREATE TABLE price_bars_p{remainder} PARTITION OF price_bars
+                    FOR VALUES WITH (MODULUS {self.partitions}, REMAINDER {remainder})
+                    """)
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS price_checked_ranges (
+                symbol TEXT NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL,
+                checked_at TIMESTAMP,
+                PRIMARY KEY (symbol, start_date)
+            )
+            """)
+            # Databases created before the check time was tracked
+            cursor.execute("ALTER TABLE price_checked_ranges ADD COLUMN IF NOT EXISTS checked_at TIMESTAMP")
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS market_snapshot (
+                symbol TEXT PRIMARY KEY,
+                last_date DATE,
+                last_close DOUBLE PRECISION,
+                previous_close DOUBLE PRECISION,
+                change DOUBLE PRECISION,
+                change_percent DOUBLE PRECISION,
+                high_52w DOUBLE PRECISION,
+                low_52w DOUBLE PRECISION,
+                volume BIGINT,
+                updated_at TIMESTAMP,
+                checked_at TIMESTAMP
+            )
+            """)
+
+    def get_prices(self, symbol: str, start_date: str, end_date: str) -> Tuple[List, List[Tuple[str, str, Optional[str]]]]:
+        with self._cursor() as cursor:
+            cursor.execute("""
+            SELECT date, open, high, low, close, volume, updated_at
+            FROM price_bars
+            WHERE symbol = %s AND date BETWEEN %s AND %s
+            ORDER BY date
+            """, (symbol, start_date, end_date))
+            rows = [{
+                "date": row[0].isoformat(), "open": row[1], "high": row[2], "low": row[3], "close": row[4],
+                "volume": row[5], "timestamp": row[6].strftime("%Y-%m-%d %H:%M:%S")
+            } for row in cursor.fetchall()]
+            cursor.execute("""
+            SELECT start_date, end_date, checked_at
+            FROM price_checked_ranges
+            WHERE symbol = %s AND end_date >= %s AND start_date <= %s
+            """, (symbol, start_date, end_date))
+            checked_ranges = [
+                (start.isoformat(), end.isoformat(), checked_at.strftime("%Y-%m-%d %H:%M:%S") if checked_at else None)
+                for start, end, checked_at in cursor.fetchall()
+            ]
+        return rows, checked_ranges
+
+    def _copy_prices(self, cursor, rows: List[Tuple], on_conflict: str) -> int:
+        """
+        COPY (symbol, date, open, high, low, close, volume) rows into a staging table and
+        merge them into price_bars; on_conflict is 'update' to replace rows of the same
+        dates (the last one in rows wins) or 'nothing' to keep them.
+        """
+        cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS price_staging (
+            seq BIGSERIAL,
+            symbol TEXT,
+            date DATE,
+            open DOUBLE PRECISION,
+            high DOUBLE PRECISION,
+            low DOUBLE PRECISION,
+            close DOUBLE PRECISION,
+            volume BIGINT
+        ) ON COMMIT DELETE ROWS
+        """)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor.copy_expert("COPY price_staging (symbol, date, open, high, low, close, volume) FROM STDIN WITH (FORMAT csv)", buffer)
+
+        if on_conflict == "update":
+            conflict = """DO UPDATE SET open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low,
+                close = EXCLUDED.close, volume = EXCLUDED.volume, updated_at = EXCLUDED.updated_at"""
+        else:
+            conflict = "DO NOTHING"
+        cursor.execute(f"""
+        INSERT INTO price_bars (symbol, date, open, high, low, close, volume, updated_at)
+        SELECT DISTINCT ON (symbol, date) symbol, date, open, high, low, close, volume, now() AT TIME ZONE 'utc'
+        FROM price_staging
+        ORDER BY symbol, date, seq DESC
+        ON CONFLICT (symbol, date) {conflict}
+        """)
+        return cursor.rowcount
+
+    def _add_checked_dates(self, cursor, symbol: str, dates: List[str]) -> None:
+        """
+        Merge dates without data, checked now, into the symbol's checked ranges.
+        A merged range was checked when the latest of its parts was.
+        """
+        # The database's clock, like the write times of the price rows
+        cursor.execute("SELECT now() AT TIME ZONE 'utc'")
+        now = cursor.fetchone()[0]
+        cursor.execute("SELECT start_date, end_date, checked_at FROM price_checked_ranges WHERE symbol = %s", (symbol,))
+        spans = sorted(
+            [(start.toordinal(), end.toordinal(), checked_at) for start, end, checked_at in cursor.fetchall()]
+            + [(_ordinal(date_str), _ordinal(date_str), now) for date_str in dates],
+            key=lambda span: span[:2]
+        )
+        merged = []
+        for start, end, checked_at in spans:
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+                if checked_at and (merged[-1][2] is None or checked_at > merged[-1][2]):
+                    merged[-1][2] = checked_at
+            else:
+                merged.append([start, end, checked_at])
+        cursor.execute("DELETE FROM price_checked_ranges WHERE symbol = %s", (symbol,))
+        cursor.executemany("INSERT INTO price_checked_ranges (symbol, start_date, end_date, checked_at) VALUES (%s, %s, %s, %s)", [
+            (symbol, _from_ordinal(start), _from_ordinal(end), checked_at) for start, end, checked_at in merged
+        ])
+
+    def _write(self, cursor, data: Dict[str, Tuple[List[Dict], List[str]]]) -> int:
+        """
+        Store {symbol: (data points, dates without data)}; points without a close count
+        as dates without data. Keeps the snapshots in sync. Returns the points stored.
+        """
+        rows = []
+        for symbol, (points, not_available_dates) in data.items():
+            unavailable = list(not_available_dates)
+            for point in points:
+                if point["close"] is None:
+                    unavailable.append(point["timestamp"].split()[0])
+                else:
+                    rows.append((symbol, *_price_row(point)))
+            if unavailable:
+                self._add_checked_dates(cursor, symbol, unavailable)
+        stored = self._copy_prices(cursor, rows, "update") if rows else 0
+        priced = {row[0] for row in rows}
+        for symbol in data:
+            self._update_snapshot(cursor, symbol, recompute=symbol in priced)
+        return stored
+
+    def store_prices(self, symbol: str, data_points: List[Dict], not_available_dates: Optional[List[str]] = None) -> int:
+        try:
+            with self._cursor() as cursor:
+                inserted_count = self._write(cursor, {symbol: (data_points, not_available_dates or [])})
+        except Exception as e:
+            logger.error(f"Transaction failed when storing data for {symbol}: {str(e)}")
+            return 0
+        logger.info(f"Successfully stored {inserted_count}/{len(data_points)} data points and {len(not_available_dates) if not_available_dates else 0} unavailable dates for {symbol}")
+        return inserted_count
+
+    def bulk_store_prices(self, data: Dict[str, List[Dict]], not_available_dates: Optional[Dict[str, List[str]]] = None) -> int:
+        not_available_dates = not_available_dates or {}
+        try:
+            with self._cursor() as cursor:
+                return self._write(cursor, {
+                    symbol: (points, not_available_dates.get(symbol, [])) for symbol, points in data.items() if points
+                })
+        except Exception as e:
+            logger.error(f"Bulk load of {len(data)} symbols failed: {str(e)}")
+            return 0
+
+    def store_rollup(self, symbol: str, rows: List[PriceRow]) -> int:
+        if not rows:
+            return 0
+        with self._cursor() as cursor:
+            stored = self._copy_prices(cursor, [(symbol, *row) for row in rows], "nothing")
+            if stored:
+                self._update_snapshot(cursor, symbol)
+        return stored
+
+    def iter_prices(self, symbol: str, chunk_rows: int) -> Iterator[List[PriceRow]]:
+        with self._cursor(name="iter_prices") as cursor:
+            cursor.itersize = chunk_rows
+            cursor.execute("SELECT date, open, high, low, close, volume FROM price_bars WHERE symbol = %s ORDER BY date", (symbol,))
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield [(row[0].isoformat(), *row[1:]) for row in rows]
+
+    def _update_snapshot(self, cursor, symbol: str, recompute: bool = True) -> None:
+        if not recompute:
+            cursor.execute("UPDATE market_snapshot SET checked_at = now() AT TIME ZONE 'utc' WHERE symbol = %s", (symbol,))
+            return
+        cursor.execute("""
+        SELECT date, close, volume
+        FROM price_bars
+        WHERE symbol = %s AND close IS NOT NULL
+        ORDER BY date DESC
+        LIMIT 2
+        """, (symbol,))
+        latest_rows = [(row[0].isoformat(), row[1], row[2]) for row in cursor.fetchall()]
+        if not latest_rows:
+            return
+        cursor.execute("""
+        SELECT MAX(high), MIN(low)
+        FROM price_bars
+        WHERE symbol = %s AND date > %s AND close IS NOT NULL
+        """, (symbol, _year_before(latest_rows[0][0])))
+        high_52w, low_52w = cursor.fetchone()
+        cursor.execute("""
+        INSERT INTO market_snapshot
+        (symbol, last_date, last_close, previous_close, change, change_percent, high_52w, low_52w, volume, updated_at, checked_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (symbol) DO UPDATE SET
+            last_date = EXCLUDED.last_date, last_close = EXCLUDED.last_close, previous_close = EXCLUDED.previous_close,
+            change = EXCLUDED.change, change_percent = EXCLUDED.change_percent, high_52w = EXCLUDED.high_52w,
+            low_52w = EXCLUDED.low_52w, volume = EXCLUDED.volume, updated_at = EXCLUDED.updated_at,
+            checked_at = EXCLUDED.checked_at
+        """, _snapshot_values(symbol, latest_rows, high_52w, low_52w))
+
+    def get_close_history(self, symbols: List[str], start_date: Optional[str] = None) -> Dict[str, List[Tuple[str, float]]]:
+        history = {}
+        with self._cursor() as cursor:
+            cursor.execute("""
+            SELECT symbol, date, close
+            FROM price_bars
+            WHERE symbol = ANY(%s) AND date >= %s AND close IS NOT NULL
+            ORDER BY symbol, date
+            """, (list(symbols), start_date or "0001-01-01"))
+            for symbol, date, close in cursor.fetchall():
+                history.setdefault(symbol, []).append((date.isoformat(), close))
+        return history
+
+    def get_market_snapshot(self) -> Dict[str, Dict]:
+        with self._cursor() as cursor:
+            cursor.execute("SELECT * FROM market_snapshot")
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        snapshot = {}
+        for row in rows:
+            values = dict(zip(columns, row))
+            # Same formats as the SQLite store
+            if values["last_date"] is not None:
+                values["last_date"] = values["last_date"].isoformat()
+            for column in ("updated_at", "checked_at"):
+                if values[column] is not None:
+                    values[column] = values[column].strftime("%Y-%m-%d %H:%M:%S")
+            snapshot[values["symbol"]] = values
+        return snapshot
+
+    def get_price_coverage(self, symbols: List[str]) -> Dict[str, Dict]:
+        with self._cursor() as cursor:
+            cursor.execute("""
+            SELECT symbol, MIN(date), MAX(date), COUNT(*)
+            FROM price_bars
+            WHERE symbol = ANY(%s) AND close IS NOT NULL
+            GROUP BY symbol
+            """, (list(symbols),))
+            return {
+                symbol: {"first_date": first_date.isoformat(), "last_date": last_date.isoformat(), "rows": rows}
+                for symbol, first_date, last_date, rows in cursor.fetchall()
+            }
+
+
+_store: Optional[PriceStore] = None
+_store_lock = threading.Lock()
+
+
+def _create_store(name: str) -> PriceStore:
+    if name == "sqlite":
+        return SQLitePriceStore()
+    if name == "postgres":
+        url = settings.PRICE_STORE_URL or settings.DATABASE_URL
+        if not url.startswith("postgres"):
+            raise ValueError("The postgres price store needs PRICE_STORE_URL or DATABASE_URL to point at a PostgreSQL database")
+        return PostgresPriceStore(url, settings.PRICE_STORE_PARTITIONS, settings.PRICE_STORE_POOL_SIZE, settings.PRICE_STORE_MAX_OVERFLOW)
+    raise ValueError(f"Unknown price store '{name}'. Must be one of: sqlite, postgres")
+
+
+def get_price_store() -> PriceStore:
+    """
+    The price store selected by PRICE_STORE_BACKEND, created on first use so that
+    the Postgres connection pool isn't opened at import time.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = _create_store(settings.PRICE_STORE_BACKEND)
+            logger.info(f"Using the {_store.name} price store")
+        return _store
@@ -0,0 +1,199 @@
+import logging
+import math
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from .dedup_service import select_representatives
+from .price_series import PriceSeries
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d+|[^\w\s]|_")
+
+# Relevance of an article by where the stock is mentioned; it is multiplied by a
+# recency weight halving every RECENCY_HALF_LIFE_HOURS before the newest article
+TITLE_MENTION_RELEVANCE = 1.0
+DESCRIPTION_MENTION_RELEVANCE = 0.6
+NO_MENTION_RELEVANCE = 0.3
+RECENCY_HALF_LIFE_HOURS = 48.0
+
+# Stories covered by more outlets (larger clusters of near-duplicates) rank higher
+COVERAGE_WEIGHT = 0.25
+
+# Periods with at most this many trading days list every daily close; longer ones
+# list the days with news, the largest moves and the last few days
+MAX_DAILY_ROWS = 25
+LAST_DAYS = 5
+LARGEST_MOVES = 5
+
+# Words left out when matching a company name, e.g. 'Apple Inc.' -> 'apple'
+COMPANY_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited", "plc", "ag", "sa",
+    "nv", "se", "holdings", "holding", "group", "the", "class", "a", "b", "c", "com",
+}
+
+
+def _piece_tokens(piece: str) -> int:
+    if piece[0].isdigit():
+        return (len(piece) + 2) // 3
+    if piece[0].isalpha():
+        return (len(piece) + 5) // 6
+    return 1
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of a text for BPE tokenizers such as Llama 3's, without
+    loading one: about one token per 6 letters of a word (most common words are a
+    single token), one per 3 digits and one per punctuation mark. It errs on the high side.
+    """
+    return sum(_piece_tokens(piece) for piece in TOKEN_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text after the last whole word that fits in max_tokens (estimated).
+    """
+    count = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        count += _piece_tokens(match.group())
+        if count > max_tokens:
+            return text[:match.start()].rstrip(" ,;:-") + "…"
+    return text
+
+
+def _name_terms(symbol: str, company_name: Optional[str]) -> List[str]:
+    # The bare symbol (e.g. 'AAPL' for 'AAPL', 'GSPC' for '^GSPC', 'EURUSD' for 'EURUSD=X')
+    terms = [re.split(r"[=.]", symbol.replace("^", ""))[0]]
+    if company_name:
+        words = [word for word in re.findall(r"[\w&']+", company_name.lower()) if word not in COMPANY_SUFFIXES]
+        if words:
+            terms.append(" ".join(words))
+            # The first word alone is usually how the press names the company ('Microsoft')
+            if len(words[0]) > 3:
+                terms.append(words[0])
+    return [term for term in terms if term]
+
+
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value[:19].replace("T", " "), "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+
+
+def rank_articles(symbol: str, articles: List[Dict[str, Any]], company_name: Optional[str] = None) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    Keep one article per story and rank them by relevance to the stock (where it
+    is mentioned), recency and how many outlets covered the story, best first.
+    """
+    articles = select_representatives(articles)
+    if not articles:
+        return []
+    mention = re.compile(r"\b(?:" + "|".join(re.escape(term) for term in _name_terms(symbol, company_name)) + r")\b", re.IGNORECASE)
+
+    published = [_parse_timestamp(article.get("published_at") or "") for article in articles]
+    newest = max((timestamp for timestamp in published if timestamp), default=None)
+    ranked = []
+    for article, timestamp in zip(articles, published):
+        if mention.search(article.get("title") or ""):
+            relevance = TITLE_MENTION_RELEVANCE
+        elif mention.search(article.get("description") or ""):
+            relevance = DESCRIPTION_MENTION_RELEVANCE
+        else:
+            relevance = NO_MENTION_RELEVANCE
+        age_hours = (newest - timestamp).total_seconds() / 3600 if newest and timestamp else RECENCY_HALF_LIFE_HOURS
+        recency = 0.5 ** (age_hours / RECENCY_HALF_LIFE_HOURS)
+        coverage = 1 + COVERAGE_WEIGHT * math.log(article.get("cluster_size") or 1)
+        ranked.append((relevance * recency * coverage, article))
+    ranked.sort(key=lambda item: -item[0])
+    return ranked
+
+
+def format_article(article: Dict[str, Any], max_description_tokens: int) -> str:
+    """
+    One compact line per article: date, source, title and the (truncated) description,
+    without the title repeated at its start as many feeds do.
+    """
+    title = (article.get("title") or "").strip()
+    description = (article.get("description") or "").strip()
+    if title and description.startswith(title):
+        description = description[len(title):].lstrip(" .:-")
+    description = truncate_to_tokens(description, max_description_tokens)
+    published = (article.get("published_at") or "")[:10]
+    line = f"- [{published}, {article.get('source') or 'unknown'}] {title}"
+    return f"{line}: {description}" if description else line
+
+
+def select_articles(symbol: str, articles: List[Dict[str, Any]], token_budget: int, max_description_tokens: int,
+                    company_name: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]], int]:
+    """
+    Fit the best-ranked articles into token_budget (estimated), skipping ones that
+    don't fit while smaller ones still might. Returns the text, which lists the
+    chosen articles in chronological order, the chosen articles best first and the
+    number of distinct stories available.
+    """
+    ranked = rank_articles(symbol, articles, company_name)
+    chosen = []
+    lines = []
+    remaining = token_budget
+    for _, article in ranked:
+        line = format_article(article, max_description_tokens)
+        tokens = estimate_tokens(line) + 1
+        if tokens <= remaining:
+            chosen.append(article)
+            lines.append((article.get("published_at") or "", line))
+            remaining -= tokens
+        elif remaining < 20:
+            break
+    lines.sort(key=lambda item: item[0])
+    return "\n".join(line for _, line in lines), chosen, len(ranked)
+
+
+def format_price_statistics(prices: PriceSeries, news_dates: Optional[List[str]] = None) -> str:
+    """
+    Compact daily price statistics of the period: first and last close, range,
+    average and largest daily moves, and a table of daily closes and changes
+    (for long periods only the days with news, the largest moves and the last days).
+    """
+    prices = prices.priced()
+    if not len(prices):
+        return ""
+    dates = prices.dates()
+    closes = prices.close
+    highs = prices.filled("high")
+    lows = prices.filled("low")
+    changes = np.zeros(len(closes))
+    changes[1:] = (closes[1:] / closes[:-1] - 1) * 100
+
+    high_index = int(np.argmax(highs))
+    low_index = int(np.argmin(lows))
+    lines = [
+        f"Close {dates[0]} {closes[0]:.2f} -> {dates[-1]} {closes[-1]:.2f} ({(closes[-1] / closes[0] - 1) * 100:+.2f}%), "
+        f"high {highs[high_index]:.2f} on {dates[high_index]}, low {lows[low_index]:.2f} on {dates[low_index]}."
+    ]
+    if len(closes) > 1:
+        up, down = int(np.argmax(changes[1:])) + 1, int(np.argmin(changes[1:])) + 1
+        moves = [f"Average daily move {np.abs(changes[1:]).mean():.2f}%"]
+        if changes[up] > 0:
+            moves.append(f"largest rise {changes[up]:+.2f}% on {dates[up]}")
+        if changes[down] < 0:
+            moves.append(f"largest fall {changes[down]:+.2f}% on {dates[down]}")
+        lines.append(", ".join(moves) + ".")
+
+    if len(closes) <= MAX_DAILY_ROWS:
+        rows = range(len(closes))
+    else:
+        selected = set(range(len(closes) - LAST_DAYS, len(closes)))
+        selected.update(np.argsort(-np.abs(changes))[:LARGEST_MOVES].tolist())
+        if news_dates:
+            # The trading day each article's news could first move the price on
+            selected.update(np.searchsorted(np.array(dates), sorted({date for date in news_dates if date})).tolist())
+        rows = sorted(index for index in selected if index < len(closes))
+    lines.append("Daily closes: " + "; ".join(
+        f"{dates[index]} {closes[index]:.2f}" + (f" ({changes[index]:+.1f}%)" if index else "")
+        for index in rows
+    ))
+    return "\n".join(lines)
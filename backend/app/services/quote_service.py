@@ -0,0 +1,311 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Set
+from ..core.config import settings
+from .market_data_service import get_market_data
+from .stock_values_db import get_market_snapshot
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Updates buffered per WebSocket connection; a client that falls further behind loses the oldest ones
+CONNECTION_QUEUE_SIZE = 100
+
+# Polling slows down up to this factor while the market data providers rate-limit or fail
+MAX_BACKOFF = 8
+
+# Redis channel prefix of quote updates, and key prefix of the per-symbol poller leases
+CHANNEL_PREFIX = "quotes:"
+LEASE_PREFIX = "quotes:poller:"
+
+# Lua script that extends the lease only if it is still held by the caller
+RENEW_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Lua script that deletes the lease only if it is still held by the caller
+RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Seconds the Redis listener waits for a message before applying pending (un)subscriptions
+LISTENER_POLL_TIMEOUT = 0.5
+
+# Quote fetches block on the market data providers, so they run on their own small pool
+_executor = ThreadPoolExecutor(max_workers=settings.QUOTE_POLL_WORKERS, thread_name_prefix="quotes")
+
+
+def fetch_quote(symbol: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the latest intraday quote of a symbol from the market data providers
+    (1-minute bars of the current session). Returns None if there is no data or the
+    call failed.
+    """
+    try:
+        hist = get_market_data().history(symbol, period="1d", interval="1m", stage="quote")
+    except Exception as e:
+        logger.warning(f"Error fetching quote for {symbol}: {str(e)}")
+        return None
+    if hist is None or hist.empty:
+        return None
+
+    return {
+        "symbol": symbol,
+        "price": round(float(hist["Close"].iloc[-1]), 4),
+        "open": round(float(hist["Open"].iloc[0]), 4),
+        "high": round(float(hist["High"].max()), 4),
+        "low": round(float(hist["Low"].min()), 4),
+        "volume": int(hist["Volume"].sum()),
+        "time": hist.index[-1].strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+
+def _add_change(quote: Dict[str, Any], previous_close: Optional[float]) -> Dict[str, Any]:
+    quote["previous_close"] = previous_close
+    quote["change"] = round(quote["price"] - previous_close, 4) if previous_close else None
+    quote["change_percent"] = round((quote["price"] / previous_close - 1) * 100, 4) if previous_close else None
+    return quote
+
+
+def _previous_close(symbol: str, session_date: str) -> Optional[float]:
+    """
+    The last cached daily close before the given session, from the market snapshot.
+    """
+    entry = get_market_snapshot().get(symbol)
+    if not entry:
+        return None
+    if entry["last_date"] and entry["last_date"] < session_date:
+        return entry["last_close"]
+    return entry["previous_close"]
+
+
+class QuoteHub:
+    """
+    Fans quote updates out to WebSocket connections. Each subscribed symbol has a
+    single poller, however many connections subscribe to it, so upstream calls grow
+    with the number of distinct symbols rather than viewers.
+
+    With QUOTE_PUBSUB_BACKEND='redis', pollers publish to Redis pub/sub and every
+    worker forwards the updates to its own connections; a lease in Redis makes only
+    one worker poll each symbol.
+    """
+
+    def __init__(self, backend: str = "local"):
+        self.backend = backend
+        self.worker_id = uuid.uuid4().hex
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._latest: Dict[str, Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[threading.Thread] = None
+        # Channel (un)subscriptions for the listener thread, which owns the PubSub object
+        self._pubsub_requests: deque = deque()
+        # Serializes lease updates, so that a stopped poller's lease is released after
+        # any renewal still in flight
+        self._lease_lock = threading.Lock()
+
+    def subscriber_count(self, symbol: str) -> int:
+        return len(self._subscribers.get(symbol, ()))
+
+    def latest(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return self._latest.get(symbol)
+
+    def subscribe(self, symbol: str, queue: asyncio.Queue) -> None:
+        """
+        Add a connection's queue to a symbol's subscribers, sending it the latest
+        quote right away, and start the symbol's poller if it is the first one.
+        """
+        self._loop = asyncio.get_event_loop()
+        subscribers = self._subscribers.setdefault(symbol, set())
+        subscribers.add(queue)
+        if symbol in self._latest:
+            _offer(queue, self._latest[symbol])
+        if symbol not in self._pollers:
+            subscribed = None
+            if self.backend == "redis":
+                self._ensure_listener()
+                subscribed = self._loop.create_future()
+                self._pubsub_requests.append(("subscribe", CHANNEL_PREFIX + symbol, subscribed))
+            self._pollers[symbol] = asyncio.ensure_future(self._poll(symbol, subscribed))
+            logger.info(f"Started quote poller for {symbol}")
+
+    def unsubscribe(self, symbol: str, queue: asyncio.Queue) -> None:
+        """
+        Remove a connection's queue, stopping the symbol's poller after its last subscriber.
+        """
+        subscribers = self._subscribers.get(symbol)
+        if not subscribers:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[symbol]
+            self._latest.pop(symbol, None)
+            poller = self._pollers.pop(symbol, None)
+            if poller:
+                poller.cancel()
+            if self.backend == "redis" and self._pubsub is not None:
+                self._pubsub_requests.append(("unsubscribe", CHANNEL_PREFIX + symbol, None))
+                # Let another worker take over right away if one still has subscribers
+                _executor.submit(self._release_lease, symbol)
+            logger.info(f"Stopped quote poller for {symbol}")
+
+    def publish_local(self, quote: Dict[str, Any]) -> None:
+        """
+        Deliver a quote to this worker's subscribers of its symbol.
+        """
+        symbol = quote["symbol"]
+        if symbol not in self._subscribers:
+            return
+        self._latest[symbol] = quote
+        for queue in self._subscribers[symbol]:
+            _offer(queue, quote)
+
+    async def _poll(self, symbol: str, subscribed: Optional[asyncio.Future] = None) -> None:
+        loop = asyncio.get_event_loop()
+        backoff = 1
+        last = None
+        reference = (None, None)  # (session date, previous close)
+        try:
+            if subscribed is not None:
+                # Only changes are sent out, so the first quote mustn't be published before
+                # this worker listens to the symbol's channel
+                await subscribed
+            while True:
+                if await self._is_poller(symbol):
+                    quote = await loop.run_in_executor(_executor, fetch_quote, symbol)
+                    if quote is None:
+                        backoff = min(backoff * 2, MAX_BACKOFF)
+                    else:
+                        backoff = 1
+                        session_date = quote["time"][:10]
+                        if reference[0] != session_date:
+                            reference = (session_date, await loop.run_in_executor(_executor, _previous_close, symbol, session_date))
+                        _add_change(quote, reference[1])
+                        # Only changes are sent out
+                        key = (quote["price"], quote["volume"], quote["time"])
+                        if key != last:
+                            last = key
+                            await self._publish(quote)
+                await asyncio.sleep(settings.QUOTE_POLL_INTERVAL * backoff)
+        except asyncio.CancelledError:
+            pass
+
+    async def _publish(self, quote: Dict[str, Any]) -> None:
+        message = {"type": "quote", **quote}
+        if self.backend == "redis":
+            # Every worker, this one included, receives it through the Redis listener
+            await asyncio.get_event_loop().run_in_executor(
+                _executor, self._redis.publish, CHANNEL_PREFIX + quote["symbol"], json.dumps(message)
+            )
+        else:
+            self.publish_local(message)
+
+    async def _is_poller(self, symbol: str) -> bool:
+        """
+        Whether this worker should poll the symbol: always locally, and with Redis
+        only while it holds the symbol's lease (taken over when a poller stops renewing it).
+        """
+        if self.backend != "redis":
+            return True
+        lease_ms = int(settings.QUOTE_POLL_INTERVAL * MAX_BACKOFF * 2 * 1000)
+        poller = asyncio.current_task()
+
+        def acquire() -> bool:
+            key = LEASE_PREFIX + symbol
+            with self._lease_lock:
+                # The poller may have been stopped while this waited for the pool
+                if self._pollers.get(symbol) is not poller:
+                    return False
+                if self._redis.set(key, self.worker_id, nx=True, px=lease_ms):
+                    return True
+                return bool(self._redis.eval(RENEW_LEASE_SCRIPT, 1, key, self.worker_id, lease_ms))
+
+        try:
+            return await asyncio.get_event_loop().run_in_executor(_executor, acquire)
+        except Exception as e:
+            logger.warning(f"Could not check the quote poller lease of {symbol}: {str(e)}")
+            return False
+
+    def _release_lease(self, symbol: str) -> None:
+        with self._lease_lock:
+            # Unless the symbol was subscribed to again meanwhile
+            if symbol in self._pollers:
+                return
+            try:
+                self._redis.eval(RELEASE_LEASE_SCRIPT, 1, LEASE_PREFIX + symbol, self.worker_id)
+            except Exception as e:
+                logger.warning(f"Could not release the quote poller lease of {symbol}: {str(e)}")
+
+    def _ensure_listener(self) -> None:
+        if self._listener is not None:
+            return
+        import redis
+        self._redis = redis.Redis.from_url(settings.REDIS_URL)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        # Reading needs the connection opened by a first subscription, so the listener keeps one
+        # of its own; it is made before the listener thread starts, which then owns the PubSub
+        self._pubsub.subscribe(CHANNEL_PREFIX + "control")
+        self._listener = threading.Thread(target=self._listen, name="quotes-redis", daemon=True)
+        self._listener.start()
+
+    def _listen(self) -> None:
+        # A PubSub object isn't thread-safe, so channels are (un)subscribed here, between reads
+        while True:
+            try:
+                while self._pubsub_requests:
+                    action, channel, done = self._pubsub_requests[0]
+                    getattr(self._pubsub, action)(channel)
+                    self._pubsub_requests.popleft()
+                    if done is not None:
+                        self._loop.call_soon_threadsafe(_set_done, done)
+                message = self._pubsub.get_message(timeout=LISTENER_POLL_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Error reading quote updates from Redis: {str(e)}")
+                time.sleep(LISTENER_POLL_TIMEOUT)
+                continue
+            if message is None:
+                continue
+            try:
+                quote = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            self._loop.call_soon_threadsafe(self.publish_local, quote)
+
+
+def _set_done(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def _offer(queue: asyncio.Queue, message: Dict[str, Any]) -> None:
+    # Drop the oldest update rather than block the fan-out on a slow client
+    if queue.full():
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+    queue.put_nowait(message)
+
+
+_hub: Optional[QuoteHub] = None
+
+
+def get_quote_hub() -> QuoteHub:
+    global _hub
+    if _hub is None:
+        _hub = QuoteHub(settings.QUOTE_PUBSUB_BACKEND)
+    return _hub
@@ -0,0 +1,364 @@
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import numpy as np
+from .stock_values_db import get_close_history, register_store_listener
+from .indicator_service import compute_indicator_values
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Text columns, taken from the Stock table
+TEXT_FIELDS = ["symbol", "name", "category", "region"]
+
+# Numeric columns, computed from the cached daily closes of each symbol
+NUMERIC_FIELDS = [
+    "last_close",
+    "change_percent",
+    "pct_change_1w",
+    "pct_change_1m",
+    "pct_change_3m",
+    "pct_change_1y",
+    "high_52w",
+    "low_52w",
+    "pct_from_high_52w",
+    "rsi14",
+    "sma50",
+    "sma200",
+    "volatility_1y",
+]
+
+# Calendar days looked back for each percent change
+CHANGE_LOOKBACKS = {"pct_change_1w": 7, "pct_change_1m": 30, "pct_change_3m": 91, "pct_change_1y": 365}
+
+# Enough history for the 1y change and the 200-day average
+HISTORY_DAYS = 400
+
+
+class ScreenerQueryError(ValueError):
+    """
+    Raised for a screener query that can't be parsed.
+    """
+
+
+def compute_symbol_metrics(rows: List[Tuple[str, float]]) -> Dict[str, float]:
+    """
+    Compute the numeric screener columns of one symbol from its (date, close) rows in date order.
+    Metrics that need more history than is cached are NaN.
+    """
+    metrics = {field: np.nan for field in NUMERIC_FIELDS}
+    if not rows:
+        return metrics
+
+    dates = np.array([date for date, _ in rows], dtype="datetime64[D]")
+    closes = np.array([close for _, close in rows], dtype=np.float64)
+    last_close = closes[-1]
+    metrics["last_close"] = last_close
+    if len(closes) > 1:
+        metrics["change_percent"] = (last_close / closes[-2] - 1.0) * 100
+
+    # Percent change against the last close on or before the lookback date
+    for field, days in CHANGE_LOOKBACKS.items():
+        position = np.searchsorted(dates, dates[-1] - np.timedelta64(days, "D"), side="right") - 1
+        if position >= 0:
+            metrics[field] = (last_close / closes[position] - 1.0) * 100
+
+    year = closes[np.searchsorted(dates, dates[-1] - np.timedelta64(365, "D"), side="right"):]
+    metrics["high_52w"] = year.max()
+    metrics["low_52w"] = year.min()
+    metrics["pct_from_high_52w"] = (last_close / metrics["high_52w"] - 1.0) * 100
+    if len(year) > 2:
+        metrics["volatility_1y"] = np.diff(np.log(year)).std(ddof=1) * np.sqrt(252)
+
+    bars = {"close": closes}
+    metrics["rsi14"] = compute_indicator_values("rsi", bars, (14,))["rsi"][-1]
+    metrics["sma50"] = compute_indicator_values("sma", bars, (50,))["sma"][-1]
+    metrics["sma200"] = compute_indicator_values("sma", bars, (200,))["sma"][-1]
+    return metrics
+
+
+class MetricTable:
+    """
+    In-memory columnar table with one row per stock: text columns as object arrays
+    and numeric columns as float64 arrays, so a screen is a few vectorized
+    comparisons over whole columns. Rows are updated in place as new prices arrive.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index: Dict[str, int] = {}
+        self.size = 0
+        self.columns: Dict[str, np.ndarray] = {}
+        self._allocate(64)
+
+    def _allocate(self, capacity: int) -> None:
+        columns = {field: np.full(capacity, "", dtype=object) for field in TEXT_FIELDS}
+        columns.update({field: np.full(capacity, np.nan) for field in NUMERIC_FIELDS})
+        for field, values in self.columns.items():
+            columns[field][:self.size] = values[:self.size]
+        self.columns = columns
+
+    def upsert(self, symbol: str, values: Dict) -> None:
+        """
+        Set the given columns of a symbol's row, adding the row if needed.
+        """
+        with self.lock:
+            row = self.index.get(symbol)
+            if row is None:
+                if self.size == len(self.columns["symbol"]):
+                    self._allocate(self.size * 2)
+                row = self.size
+                self.index[symbol] = row
+                self.size += 1
+                self.columns["symbol"][row] = symbol
+            for field, value in values.items():
+                self.columns[field][row] = value
+
+    def view(self) -> Dict[str, np.ndarray]:
+        """
+        Return copies of the filled part of each column, consistent with each other.
+        """
+        with self.lock:
+            return {field: values[:self.size].copy() for field, values in self.columns.items()}
+
+
+# Query parsing
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<string>'[^']*'|"[^"]*")
+      | (?P<operator><=|>=|!=|<>|==|=|<|>)
+      | (?P<paren>[()])
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+KEYWORDS = {"AND", "OR", "NOT"}
+
+
+def _tokenize(query: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if not match or match.end() == position:
+            raise ScreenerQueryError(f"Unexpected character at position {position}: {query[position:position + 10]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "name" and value.upper() in KEYWORDS:
+            kind, value = "keyword", value.upper()
+        elif kind == "string":
+            value = value[1:-1]
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser producing a tree of tuples:
+    ('or', left, right), ('and', left, right), ('not', operand) and
+    ('compare', field, operator, value, value_is_field).
+    """
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Tuple[str, str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ("end", "")
+
+    def take(self) -> Tuple[str, str]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.peek()[0] != "end":
+            raise ScreenerQueryError(f"Unexpected {self.peek()[1]!r}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ("keyword", "OR"):
+            self.take()
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ("keyword", "AND"):
+            self.take()
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == ("keyword", "NOT"):
+            self.take()
+            return ("not", self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, value = self.take()
+        if (kind, value) == ("paren", "("):
+            node = self.parse_or()
+            if self.take() != ("paren", ")"):
+                raise ScreenerQueryError("Missing closing parenthesis")
+            return node
+        if kind != "name":
+            raise ScreenerQueryError(f"Expected a field name, got {value!r}" if value else "Unexpected end of query")
+        field = _check_field(value)
+
+        operator_kind, operator = self.take()
+        if operator_kind != "operator":
+            raise ScreenerQueryError(f"Expected a comparison operator after {field}")
+        operator = {"=": "==", "<>": "!="}.get(operator, operator)
+
+        value_kind, operand = self.take()
+        if value_kind == "number":
+            return ("compare", field, operator, float(operand), False)
+        if value_kind == "string":
+            return ("compare", field, operator, operand, False)
+        if value_kind == "name":
+            return ("compare", field, operator, _check_field(operand), True)
+        raise ScreenerQueryError(f"Expected a value after {field} {operator}")
+
+
+def _check_field(name: str) -> str:
+    field = name.lower()
+    if field not in TEXT_FIELDS and field not in NUMERIC_FIELDS:
+        raise ScreenerQueryError(f"Unknown field: {name}. Valid fields are: {', '.join(TEXT_FIELDS + NUMERIC_FIELDS)}")
+    return field
+
+
+def parse_query(query: str):
+    """
+    Parse a screener query such as "pct_change_1m > 5 AND region = 'US' AND rsi14 < 30".
+    Supports AND, OR, NOT, parentheses and the comparisons = != < <= > >= against a
+    number, a quoted string or another field. Raises ScreenerQueryError if invalid.
+    """
+    tokens = _tokenize(query)
+    if not tokens:
+        raise ScreenerQueryError("Empty query")
+    return _Parser(tokens).parse()
+
+
+OPERATORS = {
+    "==": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+def _evaluate(node, columns: Dict[str, np.ndarray], negate: bool = False) -> np.ndarray:
+    """
+    The rows matching a query node, or with negate its negation, which is pushed down
+    to the comparisons (NOT (a OR b) is NOT a AND NOT b) so that a comparison with a
+    missing metric doesn't match under NOT either.
+    """
+    kind = node[0]
+    if kind in ("or", "and"):
+        left, right = _evaluate(node[1], columns, negate), _evaluate(node[2], columns, negate)
+        return left | right if (kind == "or") != negate else left & right
+    if kind == "not":
+        return _evaluate(node[1], columns, not negate)
+
+    _, field, operator, value, value_is_field = node
+    left = columns[field]
+    right = columns[value] if value_is_field else value
+    is_text = field in TEXT_FIELDS
+    if is_text != ((value in TEXT_FIELDS) if value_is_field else isinstance(value, str)):
+        raise ScreenerQueryError(f"Can't compare {field} with {value!r}")
+    if is_text:
+        # Text comparisons are case-insensitive
+        left = np.char.lower(left.astype(str))
+        right = np.char.lower(right.astype(str)) if value_is_field else value.lower()
+        matches = OPERATORS[operator](left, right)
+        return ~matches if negate else matches
+    # Missing metrics (NaN) never match, not even with != or under NOT
+    known = ~np.isnan(left) & (~np.isnan(right) if value_is_field else True)
+    with np.errstate(invalid="ignore"):
+        matches = OPERATORS[operator](left, right)
+    return known & (~matches if negate else matches)
+
+
+_table = MetricTable()
+_load_lock = threading.Lock()
+
+
+def _refresh_symbol(symbol: str) -> None:
+    """
+    Store listener: recompute the metrics of a symbol after new prices arrived for it.
+    """
+    if symbol not in _table.index:
+        return
+    start_date = (datetime.utcnow() - timedelta(days=HISTORY_DAYS)).strftime("%Y-%m-%d")
+    rows = get_close_history([symbol], start_date).get(symbol, [])
+    _table.upsert(symbol, compute_symbol_metrics(rows))
+    logger.info(f"Updated screener metrics for {symbol}")
+
+
+register_store_listener(_refresh_symbol)
+
+
+def ensure_screener_table(stocks: List[Dict]) -> None:
+    """
+    Make sure every stock (dicts with symbol, name, category and region) has a row.
+    Missing rows are loaded from the price cache in one pass; afterwards they are
+    kept up to date by the store listener.
+    """
+    if all(stock["symbol"] in _table.index for stock in stocks):
+        return
+    with _load_lock:
+        missing = [stock for stock in stocks if stock["symbol"] not in _table.index]
+        if not missing:
+            return
+        start_date = (datetime.utcnow() - timedelta(days=HISTORY_DAYS)).strftime("%Y-%m-%d")
+        history = get_close_history([stock["symbol"] for stock in missing], start_date)
+        for stock in missing:
+            values = {field: stock.get(field) or "" for field in TEXT_FIELDS}
+            values.update(compute_symbol_metrics(history.get(stock["symbol"], [])))
+            _table.upsert(stock["symbol"], values)
+        logger.info(f"Loaded screener metrics for {len(missing)} stocks")
+
+
+def run_screen(query: str, sort: str = None, descending: bool = True, limit: int = 100) -> Dict:
+    """
+    Evaluate a screener query over the metric table and return the matching rows,
+    optionally sorted by a field (missing values last) and limited.
+    """
+    node = parse_query(query) if query and query.strip() else None
+    if sort is not None:
+        sort = _check_field(sort)
+
+    columns = _table.view()
+    matches = _evaluate(node, columns) if node is not None else np.ones(len(columns["symbol"]), dtype=bool)
+    rows = np.flatnonzero(matches)
+
+    if sort is not None:
+        values = columns[sort][rows]
+        if sort in NUMERIC_FIELDS:
+            # NaN sorts last in either direction
+            order = np.argsort(-values if descending else values, kind="stable")
+        else:
+            order = np.argsort(np.char.lower(values.astype(str)), kind="stable")
+            if descending:
+                order = order[::-1]
+        rows = rows[order]
+
+    data = []
+    for row in rows[:limit].tolist():
+        entry = {field: columns[field][row] for field in TEXT_FIELDS}
+        entry.update({
+            field: None if np.isnan(columns[field][row]) else round(float(columns[field][row]), 4)
+            for field in NUMERIC_FIELDS
+        })
+        data.append(entry)
+    return {"count": len(rows), "total": len(columns["symbol"]), "data": data}
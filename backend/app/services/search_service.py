@@ -0,0 +1,226 @@
+import logging
+import math
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Number of best documents kept at each trie node; prefix lookups never look further
+TOP_K_PER_NODE = 20
+
+# Trie depth limit; longer prefixes are checked against the candidates of the deepest node
+MAX_TRIE_DEPTH = 16
+
+# Candidates expanded per fuzzy-matched term, so very common words stay cheap
+MAX_DOCS_PER_TERM = 200
+
+# Minimum trigram similarity for a fuzzy match: the share of the trigrams of the
+# longer of the two words that they have in common
+MIN_SIMILARITY = 0.4
+
+# Scores of each kind of match; fuzzy matches scale theirs by the trigram similarity
+SCORE_EXACT_SYMBOL = 100.0
+SCORE_SYMBOL_PREFIX = 80.0
+SCORE_NAME_PREFIX = 70.0
+SCORE_WORD_PREFIX = 60.0
+SCORE_FUZZY = 50.0
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase, drop the index caret and collapse anything that isn't a letter,
+    digit or dot into single spaces.
+    """
+    return " ".join(re.sub(r"[^a-z0-9.]+", " ", text.lower().replace("^", "")).split())
+
+
+def trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Trie:
+    """
+    Prefix trie whose nodes are dicts of child characters, plus the key '' holding
+    the ids of the best TOP_K_PER_NODE documents under that prefix. Documents are
+    inserted in rank order, so the first ids to reach a node are its best ones.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, key: str, doc_id: int) -> None:
+        node = self.root
+        for char in key[:MAX_TRIE_DEPTH]:
+            node = node.setdefault(char, {})
+            ids = node.get("")
+            if ids is None:
+                node[""] = [doc_id]
+            elif len(ids) < TOP_K_PER_NODE and ids[-1] != doc_id:
+                ids.append(doc_id)
+
+    def lookup(self, prefix: str) -> List[int]:
+        node = self.root
+        for char in prefix[:MAX_TRIE_DEPTH]:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get("", [])
+
+
+class SearchIndex:
+    """
+    In-memory index over the symbol and name of every stock: prefix tries for
+    symbols, full names and name words, and a trigram index over the distinct
+    symbols and name words for typo-tolerant matching.
+    """
+
+    def __init__(self, stocks: List[Dict]):
+        # Rank documents so that shorter symbols come first among equal matches
+        self.documents = sorted(stocks, key=lambda stock: (len(stock["symbol"]), stock["symbol"]))
+        self.symbols = {}
+        self.symbol_trie = _Trie()
+        self.name_trie = _Trie()
+        self.word_trie = _Trie()
+        self.normalized_names = []
+        term_docs = defaultdict(list)
+
+        for doc_id, stock in enumerate(self.documents):
+            symbol = normalize(stock["symbol"]).replace(" ", "")
+            name = normalize(stock.get("name") or "")
+            self.normalized_names.append(name)
+            self.symbols.setdefault(symbol, doc_id)
+            self.symbol_trie.insert(symbol, doc_id)
+            self.name_trie.insert(name, doc_id)
+            for term in {symbol, *name.split()}:
+                if len(term_docs[term]) < MAX_DOCS_PER_TERM:
+                    term_docs[term].append(doc_id)
+            for word in set(name.split()):
+                self.word_trie.insert(word, doc_id)
+
+        self.terms = list(term_docs.keys())
+        self.term_docs = [term_docs[term] for term in self.terms]
+        trigram_terms = defaultdict(list)
+        for term_id, term in enumerate(self.terms):
+            for gram in trigrams(term):
+                trigram_terms[gram].append(term_id)
+        self.trigram_terms = dict(trigram_terms)
+
+    def _fuzzy_terms(self, token: str) -> List[Tuple[int, float]]:
+        """
+        Terms whose trigram similarity with the token is at least MIN_SIMILARITY.
+        A match must share at least `required` trigrams with the token, so it has
+        to contain one of the rarest len(grams) - required + 1 of them: only those
+        posting lists are scanned, which skips the common ones.
+        """
+        grams = sorted(trigrams(token), key=lambda gram: len(self.trigram_terms.get(gram, ())))
+        required = max(1, math.ceil(MIN_SIMILARITY * len(grams)))
+        candidates = set()
+        for gram in grams[:len(grams) - required + 1]:
+            candidates.update(self.trigram_terms.get(gram, ()))
+
+        token_grams = set(grams)
+        matches = []
+        for term_id in candidates:
+            term_grams = trigrams(self.terms[term_id])
+            similarity = len(token_grams & term_grams) / max(len(token_grams), len(term_grams))
+            if similarity >= MIN_SIMILARITY:
+                matches.append((term_id, similarity))
+        return matches
+
+    def search(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Return the best `limit` stocks for the query, ranked by match kind
+        (exact symbol, symbol prefix, name prefix, name word prefix, fuzzy) and
+        then by symbol length. Fuzzy matching is only used when the prefix
+        matches don't fill the results.
+        """
+        text = normalize(query)
+        if not text:
+            return []
+        compact = text.replace(" ", "")
+        scores: Dict[int, Tuple[float, str]] = {}
+
+        def add(doc_id: int, score: float, match: str) -> None:
+            if doc_id not in scores or scores[doc_id][0] < score:
+                scores[doc_id] = (score, match)
+
+        # A leading caret asks for an index, e.g. '^gs' for ^GSPC rather than GS
+        wants_index = query.strip().startswith("^")
+        if compact in self.symbols and (not wants_index or self.documents[self.symbols[compact]]["symbol"].startswith("^")):
+            add(self.symbols[compact], SCORE_EXACT_SYMBOL, "exact")
+        for doc_id in self.symbol_trie.lookup(compact):
+            if not wants_index or self.documents[doc_id]["symbol"].startswith("^"):
+                add(doc_id, SCORE_SYMBOL_PREFIX, "prefix")
+        for doc_id in self.name_trie.lookup(text):
+            if len(text) <= MAX_TRIE_DEPTH or self.normalized_names[doc_id].startswith(text):
+                add(doc_id, SCORE_NAME_PREFIX, "prefix")
+
+        # Every word of the query must prefix a word of the name, e.g. 'amer bank';
+        # candidates come from the longest (most selective) word
+        tokens = text.split()
+        candidates = self.word_trie.lookup(max(tokens, key=len))
+        for doc_id in candidates:
+            words = self.normalized_names[doc_id].split()
+            if all(any(word.startswith(token) for word in words) for token in tokens):
+                add(doc_id, SCORE_WORD_PREFIX, "prefix")
+
+        if len(scores) < limit:
+            # Sum the best similarity of each query token over the document's terms
+            fuzzy_scores = defaultdict(float)
+            for token in tokens:
+                best = {}
+                for term_id, similarity in self._fuzzy_terms(token):
+                    for doc_id in self.term_docs[term_id]:
+                        if similarity > best.get(doc_id, 0.0):
+                            best[doc_id] = similarity
+                for doc_id, similarity in best.items():
+                    fuzzy_scores[doc_id] += similarity
+            for doc_id, similarity in fuzzy_scores.items():
+                add(doc_id, SCORE_FUZZY * similarity / len(tokens), "fuzzy")
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1][0], item[0]))[:limit]
+        return [
+            {
+                "symbol": self.documents[doc_id]["symbol"],
+                "name": self.documents[doc_id].get("name"),
+                "category": self.documents[doc_id].get("category"),
+                "region": self.documents[doc_id].get("region"),
+                "score": round(score, 2),
+                "match": match
+            }
+            for doc_id, (score, match) in ranked
+        ]
+
+
+_index = None
+
+
+def build_search_index(stocks: List[Dict]) -> SearchIndex:
+    """
+    Build the index from dicts with symbol, name, category and region, and make it
+    the one used by search_stocks.
+    """
+    global _index
+    start = time.perf_counter()
+    index = SearchIndex(stocks)
+    _index = index
+    logger.info(f"Built search index of {len(stocks)} stocks in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return index
+
+
+def get_search_index():
+    return _index
+
+
+def search_stocks(query: str, limit: int = 10) -> List[Dict]:
+    """
+    Search the current index; returns an empty list if it hasn't been built yet.
+    """
+    index = _index
+    if index is None:
+        return []
+    return index.search(query, limit)
@@ -0,0 +1,157 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# VADER's general-purpose lexicon, shipped as NLTK data (python -m nltk.downloader vader_lexicon)
+VADER_LEXICON_RESOURCE = "sentiment/vader_lexicon.zip/vader_lexicon/vader_lexicon.txt"
+
+# Finance terms on VADER's -4..4 valence scale; they override the general lexicon,
+# where e.g. 'beat' or 'cut' carry the wrong (or no) sentiment for market news
+FINANCE_LEXICON = {
+    "beat": 2.0, "beats": 2.0, "surge": 2.2, "surges": 2.2, "surged": 2.2, "soar": 2.5, "soars": 2.5,
+    "soared": 2.5, "rally": 1.9, "rallies": 1.9, "rallied": 1.9, "gain": 1.6, "gains": 1.6, "gained": 1.6,
+    "rise": 1.3, "rises": 1.3, "rose": 1.3, "jump": 1.6, "jumps": 1.6, "jumped": 1.6, "climb": 1.3,
+    "climbs": 1.3, "record": 1.2, "upgrade": 2.0, "upgrades": 2.0, "upgraded": 2.0, "outperform": 1.9,
+    "buyback": 1.4, "dividend": 1.0, "profit": 1.7, "profits": 1.7, "profitable": 1.9, "growth": 1.6,
+    "strong": 1.8, "stronger": 1.9, "bullish": 2.2, "upbeat": 1.9, "optimistic": 1.9, "raises": 1.2,
+    "expands": 1.1, "expansion": 1.1, "approval": 1.6, "approved": 1.6, "breakthrough": 2.2, "win": 2.0,
+    "wins": 2.0, "tops": 1.4, "exceeds": 1.8, "exceeded": 1.8, "recovery": 1.5, "rebound": 1.5,
+    "rebounds": 1.5, "miss": -1.9, "misses": -1.9, "missed": -1.9, "fall": -1.5, "falls": -1.5,
+    "fell": -1.5, "drop": -1.5, "drops": -1.5, "dropped": -1.5, "plunge": -2.5, "plunges": -2.5,
+    "plunged": -2.5, "slump": -2.1, "slumps": -2.1, "tumble": -2.1, "tumbles": -2.1, "tumbled": -2.1,
+    "sink": -1.8, "sinks": -1.8, "slide": -1.4, "slides": -1.4, "decline": -1.4, "declines": -1.4,
+    "declined": -1.4, "loss": -1.9, "losses": -1.9, "downgrade": -2.0, "downgrades": -2.0,
+    "downgraded": -2.0, "underperform": -1.9, "cut": -1.3, "cuts": -1.3, "layoffs": -2.2, "lawsuit": -1.9,
+    "probe": -1.5, "investigation": -1.6, "scrutiny": -1.4, "fine": -1.2, "fined": -1.9, "recall": -1.7,
+    "bankruptcy": -3.0, "default": -2.3, "fraud": -3.0, "weak": -1.8, "weaker": -1.9, "bearish": -2.2,
+    "warning": -1.6, "warns": -1.6, "volatile": -1.0, "volatility": -0.8, "selloff": -2.1, "crash": -2.8,
+    "recession": -2.3, "inflation": -0.8, "headwinds": -1.4, "concerns": -1.2, "fears": -1.7,
+}
+
+NEGATIONS = {
+    "not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "without", "cannot", "can't",
+    "won't", "don't", "doesn't", "didn't", "isn't", "aren't", "wasn't", "weren't", "hasn't", "haven't",
+    "hadn't", "shouldn't", "wouldn't", "couldn't", "ain't",
+}
+
+# As in VADER: a negation among the three preceding words flips and dampens a word's valence,
+# and the summed valence s is normalized to a compound score s / sqrt(s^2 + alpha) in (-1, 1)
+NEGATION_WINDOW = 3
+NEGATION_SCALAR = -0.74
+NORMALIZATION_ALPHA = 15.0
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+_lexicon: Optional[Tuple[Dict[str, int], np.ndarray, np.ndarray]] = None
+
+
+def _load_vader_lexicon() -> Dict[str, float]:
+    # NLTK is only imported when sentiment is first needed
+    try:
+        import nltk
+        raw = nltk.data.load(VADER_LEXICON_RESOURCE, format="text")
+    except (ImportError, LookupError) as e:
+        logger.warning(f"VADER lexicon not available ({type(e).__name__}), scoring with the finance lexicon only")
+        return {}
+    lexicon = {}
+    for line in raw.splitlines():
+        fields = line.strip().split("\t")
+        if len(fields) >= 2:
+            try:
+                lexicon[fields[0].lower()] = float(fields[1])
+            except ValueError:
+                continue
+    return lexicon
+
+
+def _get_lexicon() -> Tuple[Dict[str, int], np.ndarray, np.ndarray]:
+    """
+    The lexicon as token ids with valence and negation arrays indexed by id.
+    Id 0 stands for every word that isn't in the lexicon.
+    """
+    global _lexicon
+    if _lexicon is None:
+        valences = {**_load_vader_lexicon(), **FINANCE_LEXICON}
+        words = sorted(set(valences) | NEGATIONS)
+        vocabulary = {word: index + 1 for index, word in enumerate(words)}
+        valence = np.zeros(len(words) + 1)
+        negates = np.zeros(len(words) + 1, dtype=bool)
+        for word, index in vocabulary.items():
+            valence[index] = valences.get(word, 0.0)
+            negates[index] = word in NEGATIONS
+        _lexicon = (vocabulary, valence, negates)
+        logger.info(f"Loaded sentiment lexicon of {len(words)} words")
+    return _lexicon
+
+
+def score_texts(texts: List[str]) -> np.ndarray:
+    """
+    Compound sentiment score in (-1, 1) of each text, computed for the whole batch
+    at once: the texts are tokenized into one array of lexicon ids, and valences,
+    negations and per-text sums are vectorized over it. Texts without sentiment words score 0.
+    """
+    vocabulary, valence, negates = _get_lexicon()
+    lookup = vocabulary.get
+    token_ids = []
+    counts = []
+    for text in texts:
+        tokens = TOKEN_PATTERN.findall((text or "").lower())
+        token_ids.extend([lookup(token, 0) for token in tokens])
+        counts.append(len(tokens))
+
+    ids = np.array(token_ids, dtype=np.int64)
+    text_index = np.repeat(np.arange(len(texts)), counts)
+    values = valence[ids]
+    negation = negates[ids]
+    for distance in range(1, NEGATION_WINDOW + 1):
+        # Negations `distance` words earlier in the same text
+        negated = np.zeros(len(ids), dtype=bool)
+        negated[distance:] = negation[:-distance] & (text_index[distance:] == text_index[:-distance])
+        values = np.where(negated, values * NEGATION_SCALAR, values)
+
+    sums = np.bincount(text_index, weights=values, minlength=len(texts))
+    return sums / np.sqrt(sums * sums + NORMALIZATION_ALPHA)
+
+
+def score_articles(articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Return copies of the articles with a 'sentiment' score of their title and description.
+    """
+    scores = score_texts([f"{article.get('title') or ''}. {article.get('description') or ''}" for article in articles])
+    return [{**article, "sentiment": round(float(score), 4)} for article, score in zip(articles, scores)]
+
+
+def daily_sentiment(dates: List[str], articles: List[Dict[str, Any]]) -> Dict[str, List]:
+    """
+    Aggregate scored articles into a series aligned with the given trading dates
+    (YYYY-MM-DD, ascending): the mean sentiment and number of stories on each date.
+    Articles published on a day without trading count towards the next trading date
+    (those outside the dates are left out), and copies of one story (same cluster_id)
+    on a date count once. Dates without news have a sentiment of None.
+    """
+    if not dates:
+        return {"sentiment": [], "article_count": []}
+
+    # One score per (date, story)
+    stories = {}
+    trading_dates = np.array(dates)
+    positions = np.searchsorted(trading_dates, [article["published_at"][:10] for article in articles])
+    for article, position in zip(articles, positions.tolist()):
+        if position >= len(dates) or article["published_at"][:10] < dates[0] or article.get("sentiment") is None:
+            continue
+        stories.setdefault((position, article.get("cluster_id") or article.get("url")), article["sentiment"])
+
+    keys = list(stories.keys())
+    index = np.fromiter((position for position, _ in keys), dtype=np.int64, count=len(keys))
+    scores = np.fromiter(stories.values(), dtype=np.float64, count=len(keys))
+    counts = np.bincount(index, minlength=len(dates))
+    totals = np.bincount(index, weights=scores, minlength=len(dates))
+    means = np.round(np.divide(totals, counts, out=np.zeros(len(dates)), where=counts > 0), 4)
+    return {
+        "sentiment": [float(mean) if count else None for mean, count in zip(means.tolist(), counts.tolist())],
+        "article_count": counts.tolist()
+    }
@@ -1,11 +1,19 @@
-import yfinance as yf
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
 from time import sleep
 import logging
 import random
 from fastapi import HTTPException
-from .stock_values_db import get_cached_stock_data, store_stock_data
+from .stock_values_db import (
+    INTRADAY_INTERVALS, get_cached_intraday_data, get_cached_stock_data, get_cached_stock_json,
+    get_intraday_start_ts, store_intraday_data, store_stock_data
+)
+from .market_data_service import MarketDataRateLimitError, get_market_data
+from .price_series import PriceSeries
+from ..core.metrics import track_stage
+from ..core.singleflight import single_flight
+from ..core.refresh import refresh_in_background
+from ..core.config import settings
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -15,41 +23,266 @@ MAX_RETRIES = 1
 BASE_DELAY = 2  # Base delay in seconds
 JITTER = 0.5    # Random jitter to add to delay
 
-def get_stock_data(symbol: str, period: str = "7d") -> Dict:
-    # Map API periods to yfinance periods
-    period_mapping = {
-        "7d": "7d",
-        "1mo": "1mo",
-        "1y": "1y",
-        "3y": "3y",
-        "5y": "5y",
-        "max": "max"
-    }
-    
-    yf_period = period_mapping.get(period)
+# Map API periods to yfinance periods
+PERIOD_MAPPING = {
+    "7d": "7d",
+    "1mo": "1mo",
+    "1y": "1y",
+    "3y": "3y",
+    "5y": "5y",
+    "max": "max"
+}
+
+# Periods each intraday interval can be requested for, within what Yahoo Finance serves
+INTRADAY_PERIODS = {
+    "1m": ["1d", "7d"],
+    "5m": ["1d", "7d", "1mo"],
+    "1h": ["7d", "1mo", "1y"]
+}
+
+def _validate_intraday(period: str, interval: str) -> None:
+    if interval not in INTRADAY_PERIODS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid interval: {interval}. Valid intervals are: 1d, {', '.join(INTRADAY_PERIODS.keys())}"
+        )
+    if period not in INTRADAY_PERIODS[interval]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid period for interval {interval}: {period}. Valid periods are: {', '.join(INTRADAY_PERIODS[interval])}"
+        )
+
+def _get_yf_period(period: str) -> str:
+    yf_period = PERIOD_MAPPING.get(period)
     if not yf_period:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid period: {period}. Valid periods are: {', '.join(period_mapping.keys())}"
+            detail=f"Invalid period: {period}. Valid periods are: {', '.join(PERIOD_MAPPING.keys())}"
         )
+    return yf_period
+
+def refresh_stock_data(symbol: str, period: str = "7d", interval: str = "1d") -> Dict:
+    """
+    Fetch any missing or unavailable dates of the period from the market data
+    providers and store them, bypassing stale-while-revalidate. Concurrent calls for
+    the same symbol and period are coalesced into one upstream call.
+    """
+    if interval != "1d":
+        _validate_intraday(period, interval)
+        return single_flight(("yahoo", symbol, period, interval), lambda: _fetch_intraday_data(symbol, period, interval))
+    yf_period = _get_yf_period(period)
+    # The result may be shared with other workers as JSON, so the series crosses as plain lists
+    result = single_flight(("yahoo", symbol, yf_period), lambda: _with_columns(_fetch_stock_data(symbol, period, yf_period)))
+    return {**result, "data": PriceSeries.from_columns(result["data"])}
+
+def _with_columns(result: Dict) -> Dict:
+    return {**result, "data": result["data"].to_columns()}
+
+def _cached_freshness(symbol: str, period: str, needs_api_call: bool, covers_range: bool, age) -> Optional[str]:
+    """
+    Whether cached prices can be served without waiting for Yahoo Finance: 'fresh',
+    'stale' (after starting a background refresh) or None if they must be fetched first.
+    """
+    # If we have all the data we need (no missing dates and no null values), serve it
+    if not needs_api_call:
+        return "fresh"
+    
+    # Stale-while-revalidate: if the cache covers the range up to its most recent dates,
+    # serve it without waiting for Yahoo Finance
+    if covers_range and age is not None:
+        if age <= settings.PRICE_FRESH_TTL:
+            return "fresh"
+        if age <= settings.PRICE_STALE_BUDGET:
+            # Only one refresh per symbol runs at a time, whatever the period
+            refresh_in_background(("prices", symbol), "prices", lambda: refresh_stock_data(symbol, period))
+            return "stale"
+    return None
+
+def get_stock_data(symbol: str, period: str = "7d", interval: str = "1d") -> Dict:
+    """
+    Prices of the period with their 'freshness' (and 'as_of' if stale): daily prices
+    as a PriceSeries, or intraday bars as a list of dicts.
+    """
+    if interval != "1d":
+        return _get_intraday_data(symbol, period, interval)
+    
+    # Validate the period before touching the cache
+    _get_yf_period(period)
     
     # First, check if we have cached data in our SQLite database
     logger.info(f"Checking cached data for {symbol} with period {period}")
-    cached_data = get_cached_stock_data(symbol, period)
+    with track_stage("cache_lookup"):
+        cached_data = get_cached_stock_data(symbol, period)
     
-    # If we have all the data we need (no missing dates and no null values), return it immediately
+    freshness = _cached_freshness(
+        symbol, period, bool(cached_data["dates_needing_api_call"]), cached_data["covers_range"], cached_data["age_seconds"]
+    )
+    if freshness == "fresh":
+        return {
+            "symbol": symbol,
+            "data": cached_data["data"],
+            "freshness": "fresh"
+        }
+    if freshness == "stale":
+        return {
+            "symbol": symbol,
+            "data": cached_data["data"],
+            "freshness": "stale",
+            "as_of": cached_data["last_updated"]
+        }
+    
+    # Coalesce concurrent fetches of the same symbol and period: one request calls
+    # Yahoo Finance and stores the data while the others wait for its result
+    return {"freshness": "fresh", **refresh_stock_data(symbol, period)}
+
+def get_stock_prices_json(symbol: str, period: str = "7d") -> Optional[Dict]:
+    """
+    The daily prices of the period already serialized as a JSON array ('json'), from
+    the hot tier of the price cache, with their 'freshness' (and 'as_of' if stale).
+    None if they can't be served without Yahoo Finance or the hot tier is unavailable;
+    get_stock_data then fetches them.
+    """
+    _get_yf_period(period)
+    with track_stage("cache_lookup"):
+        cached_data = get_cached_stock_json(symbol, period)
+    if cached_data is None:
+        return None
+    freshness = _cached_freshness(symbol, period, cached_data["needs_api_call"], cached_data["covers_range"], cached_data["age_seconds"])
+    if freshness is None:
+        return None
+    result = {"symbol": symbol, "json": cached_data["json"], "freshness": freshness}
+    if freshness == "stale":
+        result["as_of"] = cached_data["last_updated"]
+    return result
+
+def _get_intraday_data(symbol: str, period: str, interval: str) -> Dict:
+    """
+    Intraday bars (1m, 5m or 1h) of the period. Cached bars are served for the
+    interval's TTL, then refreshed in the background while still being served, and
+    refreshes only download the bars since the newest cached one.
+    """
+    _validate_intraday(period, interval)
+    with track_stage("cache_lookup"):
+        cached_data = get_cached_intraday_data(symbol, interval, period)
+    
+    def fetch():
+        return refresh_stock_data(symbol, period, interval)
+    
+    age = cached_data["age_seconds"]
+    if cached_data["covers_range"] and age is not None:
+        if age <= INTRADAY_INTERVALS[interval]["ttl"]:
+            return {
+                "symbol": symbol,
+                "interval": interval,
+                "data": cached_data["data"],
+                "freshness": "fresh"
+            }
+        if age <= settings.PRICE_STALE_BUDGET:
+            refresh_in_background(("prices", symbol, interval), "prices", fetch)
+            return {
+                "symbol": symbol,
+                "interval": interval,
+                "data": cached_data["data"],
+                "freshness": "stale",
+                "as_of": cached_data["last_updated"]
+            }
+    
+    return {"freshness": "fresh", **fetch()}
+
+def _bars_from_history(hist, bar_seconds: int) -> List[Dict]:
+    bars = []
+    for index, row in hist.iterrows():
+        try:
+            bar = {
+                # Bars are keyed by their start, aligned to the bar size
+                "ts": int(index.timestamp()) // bar_seconds * bar_seconds,
+                "timestamp": index.strftime("%Y-%m-%d %H:%M:%S"),
+                "open": float(row["Open"]),
+                "high": float(row["High"]),
+                "low": float(row["Low"]),
+                "close": float(row["Close"]),
+                "volume": int(row["Volume"])
+            }
+        except (ValueError, TypeError):
+            continue  # Skip malformed bars
+        # Comparisons with NaN are false, so this also skips bars without prices
+        if all(bar[key] > 0 for key in ("open", "high", "low", "close")):
+            bars.append(bar)
+    return bars
+
+def _fetch_intraday_data(symbol: str, period: str, interval: str) -> Dict:
+    # Check the cache again, as a previous call may have just refreshed it
+    with track_stage("cache_lookup"):
+        cached_data = get_cached_intraday_data(symbol, interval, period)
+    age = cached_data["age_seconds"]
+    if cached_data["covers_range"] and age is not None and age <= INTRADAY_INTERVALS[interval]["ttl"]:
+        return {
+            "symbol": symbol,
+            "interval": interval,
+            "data": cached_data["data"]
+        }
+    
+    # Once the period is cached, only bars from the newest cached one (which may
+    # have changed since, if it was still open) onwards are downloaded, unless that
+    # bar is older than the period: Yahoo Finance only serves recent intraday bars
+    # (1m bars within 30 days), so the whole period is downloaded again instead
+    period_start_ts = get_intraday_start_ts(period)
+    incremental = (
+        cached_data["covers_range"]
+        and cached_data["last_bar_ts"] is not None
+        and cached_data["last_bar_ts"] >= period_start_ts
+    )
+    try:
+        logger.info(f"Retrieving {interval} bars for {symbol} " + ("since the newest cached bar" if incremental else f"with period {period}"))
+        if incremental:
+            hist = get_market_data().history(symbol, interval=interval, start=cached_data["last_bar_ts"])
+        else:
+            hist = get_market_data().history(symbol, period=period, interval=interval)
+    except Exception as e:
+        error_str = str(e)
+        logger.warning(f"Error fetching {interval} bars for {symbol}: {error_str}")
+        if cached_data["data"]:
+            return {
+                "symbol": symbol,
+                "interval": interval,
+                "data": cached_data["data"],
+                "freshness": "stale",
+                "as_of": cached_data["last_updated"]
+            }
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error fetching {interval} data: {error_str}"
+        )
+    
+    bars = _bars_from_history(hist, INTRADAY_INTERVALS[interval]["seconds"])
+    if incremental and not bars:
+        # At least the newest cached bar should have come back: leave the cache marked as
+        # old, so that it is refreshed again rather than served as fresh
+        logger.warning(f"No {interval} bars for {symbol} since the newest cached bar")
+    else:
+        store_intraday_data(symbol, interval, bars, None if incremental else period_start_ts)
+    with track_stage("cache_lookup"):
+        cached_data = get_cached_intraday_data(symbol, interval, period)
+    return {
+        "symbol": symbol,
+        "interval": interval,
+        "data": cached_data["data"]
+    }
+
+def _fetch_stock_data(symbol: str, period: str, yf_period: str) -> Dict:
+    # Check the cache again, as a previous call may have just filled it
+    with track_stage("cache_lookup"):
+        cached_data = get_cached_stock_data(symbol, period)
     if not cached_data["dates_needing_api_call"]:
-        #logger.info(f"Using cached data for {symbol} with period {period} - No API call needed")
-        #logger.info(f"Found {len(cached_data['data'])} data points in cache")
         return {
             "symbol": symbol,
             "data": cached_data["data"]
         }
     
-    # If we have missing dates or dates with null values, fetch them from Yahoo Finance
+    # If we have missing dates or dates with null values, fetch them from the market data providers
     logger.info(f"Found {len(cached_data['dates_needing_api_call'])} dates needing API call for {symbol} ({len(cached_data['missing_dates'])} missing, {len(cached_data['null_dates'])} with null values)")
     
-    # If we have some dates needing API call, fetch them from Yahoo Finance
+    # If we have some dates needing API call, fetch them in a single call
     # Note: For the current day, Yahoo Finance only provides complete historical data after market close
     # During trading hours, current day data may not be available or may be incomplete
     if cached_data["dates_needing_api_call"]:
@@ -62,13 +295,13 @@ def get_stock_data(symbol: str, period: str = "7d") -> Dict:
                     logger.info(f"Retry attempt {attempt+1}/{MAX_RETRIES} for {symbol} after {delay:.2f}s delay")
                     sleep(delay)
                 
-                # Make a single API call to Yahoo Finance for all missing dates
-                logger.info(f"Making a single API call to Yahoo Finance for {symbol} with period {yf_period}")
-                ticker = yf.Ticker(symbol)
+                # Make a single API call to the market data providers for all missing dates
+                logger.info(f"Making a single market data API call for {symbol} with period {yf_period}")
                 
                 # Validate the symbol first
                 try:
-                    if not ticker.info or 'regularMarketPrice' not in ticker.info:
+                    ticker_info = get_market_data().info(symbol)
+                    if not ticker_info or 'regularMarketPrice' not in ticker_info:
                         logger.warning(f"Invalid or incomplete ticker info for {symbol}")
                         # For market indices, we'll try to proceed with historical data even if info is incomplete
                         if not symbol.startswith('^'):
@@ -79,7 +312,7 @@ def get_stock_data(symbol: str, period: str = "7d") -> Dict:
                 except Exception as info_error:
                     # Check specifically for rate limit errors (429)
                     error_str = str(info_error)
-                    if "429" in error_str and "Too Many Requests" in error_str:
+                    if isinstance(info_error, MarketDataRateLimitError):
                         logger.warning(f"Rate limit reached when fetching ticker info for {symbol}: {error_str}")
                         if attempt < MAX_RETRIES - 1:
                             continue  # Try again with backoff
@@ -88,7 +321,9 @@ def get_stock_data(symbol: str, period: str = "7d") -> Dict:
                             logger.warning(f"Returning cached data for {symbol} due to rate limiting")
                             return {
                                 "symbol": symbol,
-                                "data": cached_data["data"]
+                                "data": cached_data["data"],
+                                "freshness": "stale",
+                                "as_of": cached_data["last_updated"]
                             }
                     else:
                         logger.warning(f"Error fetching ticker info for {symbol}: {error_str}")
@@ -97,11 +332,11 @@ def get_stock_data(symbol: str, period: str = "7d") -> Dict:
                 # Get all historical data in a single call with error handling
                 try:
                     logger.info(f"Retrieving historical data for {symbol} with period {yf_period}")
-                    hist = ticker.history(period=yf_period)
+                    hist = get_market_data().history(symbol, period=yf_period)
                 except Exception as hist_error:
                     error_str = str(hist_error)
                     # Check for rate limit errors in historical data fetch
-                    if "429" in error_str or "Too Many Requests" in error_str:
+                    if isinstance(hist_error, MarketDataRateLimitError):
                         logger.warning(f"Rate limit reached when fetching historical data for {symbol}: {error_str}")
                         if attempt < MAX_RETRIES - 1:
                             continue  # Try again with backoff
@@ -110,7 +345,9 @@ def get_stock_data(symbol: str, period: str = "7d") -> Dict:
                             logger.warning(f"Returning cached data for {symbol} due to rate limiting")
                             return {
                                 "symbol": symbol,
-                                "data": cached_data["data"]
+                                "data": cached_data["data"],
+                                "freshness": "stale",
+                                "as_of": cached_data["last_updated"]
                             }
                     
                     # For other errors, raise HTTP exception
@@ -175,11 +412,8 @@ def get_stock_data(symbol: str, period: str = "7d") -> Dict:
                 if new_data_points or not_available_dates:
                     store_stock_data(symbol, new_data_points, not_available_dates)
                 
-                # Combine cached data with new data
-                all_data = cached_data["data"] + new_data_points
-                
-                # Sort by timestamp
-                all_data.sort(key=lambda x: x["timestamp"])
+                # Combine cached data with new data, which replaces the null values of refetched dates
+                all_data = cached_data["data"].merge(PriceSeries.from_points(new_data_points))
                 
                 return {
                     "symbol": symbol,
@@ -197,7 +431,9 @@ def get_stock_data(symbol: str, period: str = "7d") -> Dict:
                         logger.warning(f"Returning partial cached data for {symbol} due to API error")
                         return {
                             "symbol": symbol,
-                            "data": cached_data["data"]
+                            "data": cached_data["data"],
+                            "freshness": "stale",
+                            "as_of": cached_data["last_updated"]
                         }
                     else:
                         raise HTTPException(
@@ -2,48 +2,94 @@ import sqlite3
 import os
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
+from ..core.metrics import track_stage, CACHE_REQUESTS
+import numpy as np
+from .hot_price_cache import get_hot_series, invalidate_hot_series
+from .price_series import PriceSeries, date_strings, to_epoch_day
+from .price_store import DB_PATH, get_db_connection, get_price_store, get_table_name
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Database path
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "stock_values.db")
+# Intraday bar sizes: seconds per bar, how many days back Yahoo Finance serves them (older
+# cached bars are rolled up into daily rows) and how long, in seconds, cached bars are
+# served before checking Yahoo Finance for newer ones
+INTRADAY_INTERVALS = {
+    "1m": {"seconds": 60, "retention_days": 30, "ttl": 60},
+    "5m": {"seconds": 300, "retention_days": 60, "ttl": 300},
+    "1h": {"seconds": 3600, "retention_days": 730, "ttl": 900},
+}
 
-def get_db_connection():
+# Callbacks run with the symbol after new prices were stored, to keep derived data up to date
+_store_listeners: List[Callable[[str], None]] = []
+
+def register_store_listener(listener: Callable[[str], None]) -> None:
     """
-    Create a connection to the SQLite database and return the connection object.
+    Register a function to be called with the symbol whenever new prices are stored for it.
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+    if listener not in _store_listeners:
+        _store_listeners.append(listener)
 
 def initialize_db():
     """
-    Initialize the database if it doesn't exist.
+    Initialize the local database if it doesn't exist, and create the intraday tables.
+    Daily prices live in the price store selected by PRICE_STORE_BACKEND, which is
+    this database unless it is 'postgres'; intraday bars are always cached locally.
     """
     if not os.path.exists(DB_PATH):
         logger.info(f"Creating new stock values database at {DB_PATH}")
-        # Database will be created when we connect to it
+        # Database will be created when we connect to it; free pages are returned to
+        # the file system by maintenance, which needs incremental auto-vacuum from the start
         conn = get_db_connection()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
         conn.close()
         logger.info("Database initialized successfully")
+    
+    ensure_intraday_coverage_table_exists()
 
-def ensure_stock_table_exists(symbol: str) -> None:
+def ensure_intraday_coverage_table_exists() -> None:
     """
-    Create a table for the given stock symbol if it doesn't exist.
-    Each stock has its own table with date and closing price.
+    Create the table recording, per symbol and interval, from when intraday bars were
+    fetched (start_ts, seconds since the epoch) and when Yahoo Finance was last asked.
     """
-    # Sanitize the symbol to create a valid table name
-    table_name = f"stock_{symbol.replace('-', '_').replace('.', '_').replace('^', '_')}"
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS intraday_coverage (
+        symbol TEXT,
+        interval TEXT,
+        start_ts INTEGER,
+        fetched_at TIMESTAMP,
+        PRIMARY KEY (symbol, interval)
+    )
+    """)
+    
+    conn.commit()
+    conn.close()
+
+def get_intraday_table_name(symbol: str, interval: str) -> str:
+    """
+    Table of a symbol's bars of one intraday interval, e.g. intraday_5m_AAPL.
+    """
+    return f"intraday_{interval}_{get_table_name(symbol)[len('stock_'):]}"
+
+def ensure_intraday_table_exists(symbol: str, interval: str) -> str:
+    """
+    Create the table of a symbol's intraday bars of the given interval if it doesn't exist.
+    Bars are keyed by their start (ts, seconds since the epoch, a multiple of the bar
+    size) and keep their start time in the exchange's time zone for display.
+    """
+    table_name = get_intraday_table_name(symbol, interval)
     
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Create table if it doesn't exist
     cursor.execute(f"""
     CREATE TABLE IF NOT EXISTS {table_name} (
-        date TEXT PRIMARY KEY,
+        ts INTEGER PRIMARY KEY,
+        time TEXT,
         open REAL,
         high REAL,
         low REAL,
@@ -88,159 +134,372 @@ def get_date_range_for_period(period: str) -> Tuple[datetime, datetime]:
 def get_cached_stock_data(symbol: str, period: str) -> Dict:
     """
     Retrieve stock data from the database for the given symbol and period.
-    Returns a dictionary with the data and a list of missing dates.
+    Returns a dictionary with the data (a PriceSeries) and lists of missing dates.
     Optimized to reduce the need for Yahoo Finance API calls.
+    
+    Also reports when the cached rows were last written ('age_seconds') and whether
+    they cover the whole range except for the most recent dates ('covers_range'),
+    which is what stale-while-revalidate needs to serve them without an API call.
     """
-    table_name = ensure_stock_table_exists(symbol)
     start_date, end_date = get_date_range_for_period(period)
+    start_day, end_day = to_epoch_day(start_date), to_epoch_day(end_date)
     
-    # Format dates for SQL query
-    start_date_str = start_date.strftime("%Y-%m-%d")
-    end_date_str = end_date.strftime("%Y-%m-%d")
-    
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all dates in the range from the database, including NULL entries
+    # Get all dates in the range, including those recorded as unavailable
     # This helps us identify which dates we've already tried to fetch but were unavailable
-    cursor.execute(f"""
-    SELECT date, open, high, low, close, volume 
-    FROM {table_name} 
-    WHERE date BETWEEN ? AND ? 
-    ORDER BY date
-    """, (start_date_str, end_date_str))
+    rows, checked_ranges = get_price_store().get_prices(symbol, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+    series = PriceSeries.from_rows(rows)
     
-    rows = cursor.fetchall()
-    conn.close()
+    # Most recent write time of any row in the range, or check of dates without data in
+    # it (UTC): a refresh that only finds weekends and holidays still makes it fresh
+    last_updated = max(
+        [row['timestamp'] for row in rows if row['timestamp']]
+        + [checked_at for _, _, checked_at in checked_ranges if checked_at],
+        default=None
+    )
     
-    # Process the data
-    processed_data = []
-    cached_dates = set()
-    null_dates = set()  # Dates we've already tried but had no data
+    # Dates in checked ranges without a row had no trading; they are served as NULL
+    # placeholders, which is how they were stored before maintenance pruned them
+    if checked_ranges:
+        checked_days = np.concatenate([
+            np.arange(max(to_epoch_day(range_start), start_day), min(to_epoch_day(range_end), end_day) + 1)
+            for range_start, range_end, _ in checked_ranges
+        ])
+        series = series.merge(PriceSeries.placeholders(np.setdiff1d(checked_days, series.days)))
     
-    for row in rows:
-        # Add all dates to cached_dates, whether they have data or not
-        cached_dates.add(row['date'])
-        
-        # Track dates with NULL values separately
-        if row['close'] is None:
-            null_dates.add(row['date'])
-            # Don't skip NULL values, instead set them to None so they can be filtered out by the frontend
-            data_point = {
-                "timestamp": f"{row['date']} 00:00:00",
-                "open": None,
-                "high": None,
-                "low": None,
-                "close": None,
-                "volume": 0
-            }
-            processed_data.append(data_point)
-            continue
-            
-        data_point = {
-            "timestamp": f"{row['date']} 00:00:00",
-            "open": float(row['open']) if row['open'] is not None else None,
-            "high": float(row['high']) if row['high'] is not None else None,
-            "low": float(row['low']) if row['low'] is not None else None,
-            "close": float(row['close']) if row['close'] is not None else None,
-            "volume": int(row['volume']) if row['volume'] is not None else 0
-        }
-        processed_data.append(data_point)
-    
-    # Generate all dates in the range to identify missing dates
-    all_dates = set()
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime("%Y-%m-%d")
-        all_dates.add(date_str)
-        current_date += timedelta(days=1)
+    # Dates we've already tried but had no data
+    null_days = series.days[np.isnan(series.close)]
     
     # Find truly missing dates (not in cache and not previously marked as unavailable)
-    missing_dates = all_dates - cached_dates
-
+    missing_days = np.setdiff1d(np.arange(start_day, end_day + 1), series.days)
+    
     # Combine missing dates and null dates to determine if we need to make API calls
-    dates_needing_api_call = missing_dates.union(null_dates)
+    days_needing_api_call = np.union1d(missing_days, null_days)
+    
+    # The cache covers the range if it starts near the beginning of the period (allowing
+    # for weekends and holidays) and only dates after the newest cached one are missing.
+    # For 'max' the first trading day is unknown, so it never counts as covered.
+    covers_range = False
+    if len(series) and period != "max":
+        first_cached, last_cached = int(series.days[0]), int(series.days[-1])
+        covers_range = (
+            first_cached <= start_day + 7
+            and not np.any((missing_days >= first_cached) & (missing_days <= last_cached))
+        )
+    
+    age_seconds = None
+    if last_updated:
+        age_seconds = (datetime.utcnow() - datetime.strptime(last_updated, "%Y-%m-%d %H:%M:%S")).total_seconds()
 
     # Log cache hit/miss information
-    if dates_needing_api_call:
-        logger.info(f"Cache PARTIAL HIT for {symbol} with period {period}: {len(processed_data)} cached points, {len(missing_dates)} missing dates, {len(null_dates)} null dates")
+    if len(days_needing_api_call):
+        CACHE_REQUESTS.labels(result="partial" if len(series) else "miss").inc()
+        logger.info(f"Cache PARTIAL HIT for {symbol} with period {period}: {len(series)} cached points, {len(missing_days)} missing dates, {len(null_days)} null dates")
     else:
-        logger.info(f"Cache COMPLETE HIT for {symbol} with period {period}: {len(processed_data)} cached points, no API call needed")
+        CACHE_REQUESTS.labels(result="hit").inc()
+        logger.info(f"Cache COMPLETE HIT for {symbol} with period {period}: {len(series)} cached points, no API call needed")
     
     return {
         "symbol": symbol,
-        "data": processed_data,
-        "missing_dates": sorted(list(missing_dates)),
-        "null_dates": sorted(list(null_dates)),
-        "dates_needing_api_call": sorted(list(dates_needing_api_call))
+        "data": series,
+        "missing_dates": date_strings(missing_days),
+        "null_dates": date_strings(null_days),
+        "dates_needing_api_call": date_strings(days_needing_api_call),
+        "covers_range": covers_range,
+        "last_updated": last_updated,
+        "age_seconds": age_seconds
+    }
+
+def get_cached_stock_json(symbol: str, period: str) -> Optional[Dict]:
+    """
+    What get_cached_stock_data reports, read from the memory-mapped hot tier: the data
+    is already serialized as a JSON array ('json') and ranges are found by binary
+    search, so no object is built per price. Only whether any date needs an API call
+    ('needs_api_call') is reported, not which. None if the hot tier is unavailable.
+    """
+    series = get_hot_series(symbol)
+    if series is None:
+        return None
+    start_date, end_date = get_date_range_for_period(period)
+    start_day, end_day = start_date.toordinal(), end_date.toordinal()
+    rows, data_json = series.slice(start_day, end_day)
+    
+    cached = len(rows)
+    missing = (end_day - start_day + 1) - cached
+    nulls = int(np.isnan(rows["close"]).sum())
+    
+    # Same rule as get_cached_stock_data: no gaps between the first and the last cached date
+    covers_range = False
+    if cached and period != "max":
+        first_day, last_day = int(rows["day"][0]), int(rows["day"][-1])
+        covers_range = first_day <= start_day + 7 and last_day - first_day + 1 == cached
+    
+    last_updated = None
+    age_seconds = None
+    written = int(rows["written"].max()) if cached else 0
+    if written:
+        last_updated = datetime.utcfromtimestamp(written).strftime("%Y-%m-%d %H:%M:%S")
+        age_seconds = (datetime.utcnow() - datetime.utcfromtimestamp(written)).total_seconds()
+    
+    CACHE_REQUESTS.labels(result=("partial" if cached else "miss") if missing or nulls else "hit").inc()
+    return {
+        "symbol": symbol,
+        "json": data_json,
+        "points": cached,
+        "needs_api_call": bool(missing or nulls),
+        "covers_range": covers_range,
+        "last_updated": last_updated,
+        "age_seconds": age_seconds
     }
 
 def store_stock_data(symbol: str, data_points: List[Dict], not_available_dates: List[str] = None) -> None:
     """
-    Store stock data in the database.
-    For dates where data is not available, store NULL values for the closing price.
+    Store stock data in the price store.
+    Dates where data is not available are recorded so that they aren't fetched again.
     Uses a transaction to ensure data integrity.
     """
-    table_name = ensure_stock_table_exists(symbol)
+    with track_stage("db_write"):
+        inserted_count = get_price_store().store_prices(symbol, data_points, not_available_dates)
+    invalidate_hot_series(symbol)
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if inserted_count > 0:
+        _notify_store_listeners(symbol)
+
+def _notify_store_listeners(symbol: str) -> None:
+    for listener in _store_listeners:
+        try:
+            listener(symbol)
+        except Exception as e:
+            logger.error(f"Store listener {getattr(listener, '__name__', listener)} failed for {symbol}: {str(e)}")
+
+def bulk_store_stock_data(data: Dict[str, List[Dict]], not_available_dates: Dict[str, List[str]] = None) -> int:
+    """
+    Store the daily prices of many symbols ({symbol: data points}) in a single
+    transaction, for bulk loads such as backfills. Like store_stock_data it records the
+    dates each symbol had no data for ({symbol: dates}), keeps the market snapshot in
+    sync and notifies the store listeners of every symbol stored.
+    Returns the number of rows stored, or 0 if the transaction failed.
+    """
+    symbols = [symbol for symbol, points in data.items() if points]
+    not_available_dates = not_available_dates or {}
+    with track_stage("db_write"):
+        inserted_count = get_price_store().bulk_store_prices(
+            {symbol: data[symbol] for symbol in symbols},
+            {symbol: not_available_dates[symbol] for symbol in symbols if not_available_dates.get(symbol)}
+        )
+    if not inserted_count:
+        return 0
+    
+    logger.info(f"Bulk stored {inserted_count} data points for {len(symbols)} symbols")
+    for symbol in symbols:
+        invalidate_hot_series(symbol)
+        _notify_store_listeners(symbol)
+    return inserted_count
+
+def get_intraday_start_ts(period: str) -> int:
+    """
+    Start of an intraday period in seconds since the epoch. '1d' reaches back one day,
+    but is served as the latest session in the cache so that it isn't empty over weekends.
+    """
+    days = {"1d": 1, "7d": 7, "1mo": 30, "1y": 365}.get(period, 7)
+    return _days_ago_ts(days)
+
+def _days_ago_ts(days: int) -> int:
+    return int((datetime.utcnow() - timedelta(days=days) - datetime(1970, 1, 1)).total_seconds())
+
+def get_cached_intraday_data(symbol: str, interval: str, period: str) -> Dict:
+    """
+    Retrieve the cached intraday bars of a symbol for the given interval and period.
     
-    # Track successful inserts for logging
-    inserted_count = 0
-    unavailable_inserted = 0
+    Reports whether bars were fetched from the start of the period onwards
+    ('covers_range'), the start of the newest bar ('last_bar_ts') and how long ago
+    Yahoo Finance was last asked for them ('age_seconds'), which decide between serving
+    the cache, refreshing it in the background and fetching before answering.
+    """
+    table_name = ensure_intraday_table_exists(symbol, interval)
+    start_ts = get_intraday_start_ts(period)
     
+    conn = get_db_connection()
+    cursor = conn.cursor()
     try:
-        # Begin transaction
-        conn.execute('BEGIN TRANSACTION')
+        cursor.execute("SELECT start_ts, fetched_at FROM intraday_coverage WHERE symbol = ? AND interval = ?", (symbol, interval))
+        coverage = cursor.fetchone()
         
-        # Store data points
-        for point in data_points:
-            # Extract date from timestamp
-            date_str = point["timestamp"].split()[0]
+        cursor.execute(f"SELECT ts, time FROM {table_name} ORDER BY ts DESC LIMIT 1")
+        last_bar = cursor.fetchone()
+        if period == "1d" and last_bar:
+            # The whole latest session: bars from the first one on the newest bar's date
+            cursor.execute(f"SELECT MIN(ts) FROM {table_name} WHERE time >= ?", (last_bar["time"][:10],))
+            start_ts = min(start_ts, cursor.fetchone()[0])
+        
+        cursor.execute(f"""
+        SELECT time, open, high, low, close, volume 
+        FROM {table_name} 
+        WHERE ts >= ? 
+        ORDER BY ts
+        """, (start_ts,))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    
+    data = [{
+        "timestamp": row["time"],
+        "open": row["open"],
+        "high": row["high"],
+        "low": row["low"],
+        "close": row["close"],
+        "volume": int(row["volume"]) if row["volume"] is not None else 0
+    } for row in rows]
+    
+    covers_range = bool(coverage) and coverage["start_ts"] <= get_intraday_start_ts(period)
+    age_seconds = None
+    if coverage and coverage["fetched_at"]:
+        age_seconds = (datetime.utcnow() - datetime.strptime(coverage["fetched_at"], "%Y-%m-%d %H:%M:%S")).total_seconds()
+    
+    CACHE_REQUESTS.labels(result="hit" if covers_range else ("partial" if data else "miss")).inc()
+    return {
+        "symbol": symbol,
+        "interval": interval,
+        "data": data,
+        "covers_range": covers_range,
+        "last_bar_ts": last_bar["ts"] if last_bar else None,
+        "last_updated": coverage["fetched_at"] if coverage else None,
+        "age_seconds": age_seconds
+    }
+
+def store_intraday_data(symbol: str, interval: str, bars: List[Dict], start_ts: Optional[int] = None) -> int:
+    """
+    Store intraday bars ({"ts", "timestamp", "open", "high", "low", "close", "volume"},
+    ts being the bar's start in seconds since the epoch) in one transaction, replacing
+    bars with the same start, as the current bar changes until it closes.
+    
+    start_ts is where the fetch began, if it covered everything since then, and
+    extends the recorded coverage. Bars past Yahoo Finance's retention for the interval
+    are then rolled up into daily rows.
+    """
+    table_name = ensure_intraday_table_exists(symbol, interval)
+    now_str = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    
+    with track_stage("db_write"):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            conn.execute('BEGIN TRANSACTION')
+            cursor.executemany(f"""
+            INSERT OR REPLACE INTO {table_name} (ts, time, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (bar["ts"], bar["timestamp"], bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"])
+                for bar in bars
+            ])
             
-            try:
-                cursor.execute(f"""
-                INSERT OR REPLACE INTO {table_name} (date, open, high, low, close, volume)
-                VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    date_str,
-                    point["open"],
-                    point["high"],
-                    point["low"],
-                    point["close"],
-                    point["volume"]
-                ))
-                inserted_count += 1
-            except sqlite3.Error as e:
-                logger.error(f"Database error when storing data for {symbol} on {date_str}: {str(e)}")
+            cursor.execute("SELECT start_ts FROM intraday_coverage WHERE symbol = ? AND interval = ?", (symbol, interval))
+            coverage = cursor.fetchone()
+            if coverage is not None and start_ts is not None:
+                start_ts = min(start_ts, coverage["start_ts"])
+            elif coverage is not None:
+                start_ts = coverage["start_ts"]
+            if start_ts is not None:
+                cursor.execute("""
+                INSERT OR REPLACE INTO intraday_coverage (symbol, interval, start_ts, fetched_at)
+                VALUES (?, ?, ?, ?)
+                """, (symbol, interval, start_ts, now_str))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            logger.error(f"Transaction failed when storing {interval} bars for {symbol}: {str(e)}")
+            return 0
+        finally:
+            conn.close()
+        
+        compacted = compact_intraday_data(symbol, interval)
+    
+    logger.info(f"Stored {len(bars)} {interval} bars for {symbol}" + (f", rolled {compacted} old bars up into daily rows" if compacted else ""))
+    return len(bars)
+
+def compact_intraday_data(symbol: str, interval: str) -> int:
+    """
+    Roll a symbol's intraday bars older than Yahoo Finance's retention for the interval
+    up into daily rows of the price store, and delete them. Daily rows fetched from
+    Yahoo Finance take precedence over rolled-up ones. Returns the number of bars rolled up.
+    """
+    table_name = ensure_intraday_table_exists(symbol, interval)
+    cutoff_ts = _days_ago_ts(INTRADAY_INTERVALS[interval]["retention_days"])
+    conn = get_db_connection()
+    try:
+        rows = conn.execute(f"""
+        SELECT time, open, high, low, close, volume 
+        FROM {table_name} 
+        WHERE ts < ? AND close IS NOT NULL 
+        ORDER BY ts
+        """, (cutoff_ts,)).fetchall()
+        if not rows:
+            return 0
         
-        # Store NULL values for dates where data is not available
-        if not_available_dates:
-            for date_str in not_available_dates:
-                try:
-                    cursor.execute(f"""
-                    INSERT OR REPLACE INTO {table_name} (date, open, high, low, close, volume)
-                    VALUES (?, NULL, NULL, NULL, NULL, NULL)
-                    """, (date_str,))
-                    unavailable_inserted += 1
-                except sqlite3.Error as e:
-                    logger.error(f"Database error when marking unavailable date for {symbol} on {date_str}: {str(e)}")
+        # One OHLCV row per exchange-local date: first open, last close, extremes and total volume
+        days = {}
+        for row in rows:
+            date_str = row["time"][:10]
+            day = days.get(date_str)
+            if day is None:
+                days[date_str] = [row["open"], row["high"], row["low"], row["close"], row["volume"] or 0]
+            else:
+                day[1] = max(day[1], row["high"])
+                day[2] = min(day[2], row["low"])
+                day[3] = row["close"]
+                day[4] += row["volume"] or 0
         
-        # Commit transaction
+        # The daily rows are written before the bars are deleted, so a failure in between
+        # only repeats the roll-up, which keeps the rows already written
+        if get_price_store().store_rollup(symbol, [(date_str, *day) for date_str, day in days.items()]):
+            invalidate_hot_series(symbol)
+        conn.execute(f"DELETE FROM {table_name} WHERE ts < ?", (cutoff_ts,))
         conn.commit()
-        
-        logger.info(f"Successfully stored {inserted_count}/{len(data_points)} data points and {unavailable_inserted}/{len(not_available_dates) if not_available_dates else 0} unavailable dates for {symbol}")
-        if inserted_count > 0 or unavailable_inserted > 0:
-            logger.info(f"Cache updated for {symbol} - future requests will use cached data")
-            
-    except sqlite3.Error as e:
-        # Rollback transaction on error
+    except Exception as e:
         conn.rollback()
-        logger.error(f"Transaction failed when storing data for {symbol}: {str(e)}")
+        logger.error(f"Compacting {interval} bars of {symbol} failed: {str(e)}")
+        return 0
     finally:
-        # Always close the connection
         conn.close()
+    return len(rows)
+
+def get_market_snapshot() -> Dict[str, Dict]:
+    """
+    Return the snapshot rows of all symbols, keyed by symbol.
+    """
+    return get_price_store().get_market_snapshot()
+
+def get_close_history(symbols: List[str], start_date: str = None) -> Dict[str, List[Tuple[str, float]]]:
+    """
+    Return the cached (date, close) rows of several symbols since start_date
+    (YYYY-MM-DD), in date order, in a single pass over the price store.
+    Symbols that were never cached are left out.
+    """
+    with track_stage("cache_lookup"):
+        return get_price_store().get_close_history(symbols, start_date)
+
+def prune_null_placeholders() -> Dict[str, int]:
+    """
+    Replace the rows of dates without data in the price store with checked date
+    ranges (only the SQLite store keeps such rows).
+    """
+    return get_price_store().prune_null_placeholders()
+
+def get_intraday_tables() -> List[Tuple[str, str]]:
+    """
+    (symbol, interval) of every intraday table, from the recorded coverage.
+    """
+    conn = get_db_connection()
+    try:
+        return [(row['symbol'], row['interval']) for row in conn.execute("SELECT symbol, interval FROM intraday_coverage")]
+    finally:
+        conn.close()
+
+def get_price_coverage(symbols: List[str]) -> Dict[str, Dict]:
+    """
+    First and last cached date and number of cached prices of each symbol.
+    Symbols without any cached price are left out.
+    """
+    return get_price_store().get_price_coverage(symbols)
 
 # Initialize the database when the module is imported
 initialize_db()
\ No newline at end of file
@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from ..core.config import settings
+from .ai_service import generate_news_summaries
+from .correlation_service import get_symbol_statistics
+from .news_service import get_stock_news
+from .stock_service import get_stock_data
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Precomputed summaries by (symbol, period): (computed_at, result)
+_summaries: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+_summaries_lock = threading.Lock()
+
+
+def get_precomputed_summary(symbol: str, period: str) -> Optional[Dict[str, Any]]:
+    """
+    The precomputed summary of a symbol and period, if one is younger than SUMMARY_CACHE_TTL.
+    """
+    with _summaries_lock:
+        entry = _summaries.get((symbol, period))
+    if entry and time.time() - entry[0] < settings.SUMMARY_CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def precompute_summaries(symbols: List[str], period: str = "7d", names: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Gather the news, prices and market statistics of each symbol, then generate all
+    the summaries in one batched pass of the LLM backend and keep the successful ones
+    for get_precomputed_summary. Returns the status of each symbol.
+    """
+    names = names or {}
+    items = []
+    statuses = {}
+    for symbol in symbols:
+        news_data = get_stock_news(symbol, period)
+        if news_data.get("status") not in ("success", "partial_success"):
+            statuses[symbol] = news_data.get("status", "error")
+            continue
+        if not news_data.get("data"):
+            statuses[symbol] = "no_news"
+            continue
+        try:
+            price_data = get_stock_data(symbol, period)["data"]
+        except Exception as e:
+            logger.warning(f"Skipping summary of {symbol}: no price data ({str(e)})")
+            statuses[symbol] = "no_prices"
+            continue
+        try:
+            market_statistics = get_symbol_statistics(symbol)
+        except Exception as e:
+            logger.warning(f"Could not compute market statistics for {symbol}: {str(e)}")
+            market_statistics = None
+        items.append({
+            "symbol": symbol,
+            "news_articles": news_data["data"],
+            "price_data": price_data,
+            "market_statistics": market_statistics,
+            "company_name": names.get(symbol)
+        })
+
+    start = time.perf_counter()
+    results = generate_news_summaries(items)
+    now = time.time()
+    for item, result in zip(items, results):
+        statuses[item["symbol"]] = result["status"]
+        if result["status"] == "success":
+            with _summaries_lock:
+                _summaries[(item["symbol"], period)] = (now, result)
+    logger.info(f"Precomputed {sum(status == 'success' for status in statuses.values())} of {len(symbols)} summaries "
+                f"for {period} in {time.perf_counter() - start:.2f} s")
+    return statuses
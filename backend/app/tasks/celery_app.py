@@ -1,16 +1,33 @@
-from celery import Celery
 from ..core.config import settings
 
-celery_app = Celery(
-    "tasks",
-    broker=settings.REDIS_URL,
-    backend=settings.REDIS_URL
-)
+# The Celery app is built lazily: importing celery is slow, and the API
+# process only needs it when ENABLE_CELERY is set
+_celery_app = None
 
-celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
-    timezone="UTC",
-    enable_utc=True,
-)
\ No newline at end of file
+def get_celery_app():
+    global _celery_app
+    if not settings.ENABLE_CELERY:
+        raise RuntimeError("Celery is disabled. Set ENABLE_CELERY=true to enable it.")
+    if _celery_app is None:
+        from celery import Celery
+        
+        _celery_app = Celery(
+            "tasks",
+            broker=settings.REDIS_URL,
+            backend=settings.REDIS_URL
+        )
+        
+        _celery_app.conf.update(
+            task_serializer="json",
+            accept_content=["json"],
+            result_serializer="json",
+            timezone="UTC",
+            enable_utc=True,
+        )
+    return _celery_app
+
+def __getattr__(name):
+    # Keep `from app.tasks.celery_app import celery_app` (and `celery -A`) working
+    if name == "celery_app":
+        return get_celery_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,336 @@
+"""
+Bulk backfill of the price cache from the market data providers (Yahoo Finance
+by default, see MARKET_DATA_PROVIDERS).
+
+Downloads the daily history of many symbols in parallel within a rate budget,
+stores each batch in one transaction, records progress in a checkpoint file so an
+interrupted run resumes where it stopped, and finally reports how well the cache
+covers the period for every symbol.
+
+Usage (from the backend directory):
+    python -m app.tools.backfill [--symbols AAPL,MSFT | --symbols-file symbols.txt]
+                                 [--period 5y] [--batch-size 50] [--workers 4]
+                                 [--rate 5] [--checkpoint path] [--restart]
+                                 [--verify-only]
+
+Without --symbols or --symbols-file every stock of the stocks table is backfilled.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from ..services.market_data_service import MarketDataRateLimitError, get_market_data
+from ..services.stock_values_db import DB_PATH, bulk_store_stock_data, get_cached_stock_data, get_date_range_for_period, get_price_coverage
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+PERIODS = ["7d", "1mo", "1y", "3y", "5y", "max"]
+
+# Retries of a symbol rate-limited by the market data providers, after BASE_DELAY * 2^attempt seconds
+MAX_RETRIES = 3
+BASE_DELAY = 2
+
+# Coverage verification: the newest price may be this many days older than the last
+# weekday (holidays, time zones), and at least this share of the weekdays in the
+# covered range must have a price (exchange holidays make up the rest)
+MAX_LAG_DAYS = 4
+MIN_WEEKDAY_COVERAGE = 0.9
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 1/rate seconds apart on average across all threads.
+    After a rate limit response, every thread pauses for the given time.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(self._next, now) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+def points_from_history(hist) -> List[Dict]:
+    """
+    Convert a yfinance history DataFrame into the data points stored by the price cache,
+    leaving out days without valid prices.
+    """
+    if hist is None or hist.empty:
+        return []
+    prices = hist[["Open", "High", "Low", "Close"]].astype(float)
+    # Comparisons with NaN are false, so this also drops days without prices
+    valid = (prices > 0).all(axis=1) & hist["Volume"].notna()
+    prices, volumes = prices[valid], hist["Volume"][valid].astype("int64")
+    return [
+        {"timestamp": timestamp, "open": open_, "high": high, "low": low, "close": close, "volume": volume}
+        for timestamp, open_, high, low, close, volume in zip(
+            prices.index.strftime("%Y-%m-%d %H:%M:%S"), prices["Open"].tolist(), prices["High"].tolist(),
+            prices["Low"].tolist(), prices["Close"].tolist(), volumes.tolist()
+        )
+    ]
+
+
+def fetch_history(symbol: str, period: str, limiter: RateLimiter) -> List[Dict]:
+    """
+    Download the daily history of a symbol from the market data providers, retrying
+    rate limits with a growing delay.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            hist = get_market_data().history(symbol, period=period)
+            return points_from_history(hist)
+        except MarketDataRateLimitError:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = BASE_DELAY * (2 ** attempt)
+            logger.warning(f"Rate limited fetching {symbol}, pausing downloads for {delay}s")
+            limiter.pause(delay)
+    return []
+
+
+def no_data_dates(points: List[Dict], period: str) -> List[str]:
+    """
+    The dates of the period without a price (weekends, holidays, before the symbol was
+    listed), which are stored as checked like after a request for the period, so that
+    the cache covers it. For 'max' they start at the first price, as nothing is older.
+    """
+    priced = {point["timestamp"][:10] for point in points}
+    start_date, end_date = get_date_range_for_period(period)
+    if period == "max":
+        start_date = datetime.strptime(min(priced), "%Y-%m-%d")
+    dates = []
+    day = start_date.date()
+    while day <= end_date.date():
+        date_str = day.strftime("%Y-%m-%d")
+        if date_str not in priced:
+            dates.append(date_str)
+        day += timedelta(days=1)
+    return dates
+
+
+def load_checkpoint(path: str, period: str) -> Dict:
+    """
+    The progress of an earlier run with the same period, or an empty checkpoint.
+    """
+    empty = {"period": period, "completed": [], "failed": {}}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable checkpoint {path}: {str(e)}")
+        return empty
+    if checkpoint.get("period") != period:
+        logger.warning(f"Ignoring checkpoint {path} of period {checkpoint.get('period')}")
+        return empty
+    return {"period": period, "completed": checkpoint.get("completed", []), "failed": checkpoint.get("failed", {})}
+
+
+def save_checkpoint(path: str, checkpoint: Dict) -> None:
+    # Written to a temporary file first so that an interruption never leaves a truncated checkpoint
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary_path, path)
+
+
+def run_backfill(symbols: List[str], period: str, batch_size: int, workers: int, rate: float,
+                 checkpoint_path: str, restart: bool = False) -> Dict:
+    """
+    Backfill the symbols in batches, checkpointing after each stored batch. Symbols
+    completed by an earlier run with the same period are skipped unless restart is set;
+    failed ones are tried again.
+    """
+    checkpoint = {"period": period, "completed": [], "failed": {}} if restart else load_checkpoint(checkpoint_path, period)
+    completed = set(checkpoint["completed"])
+    pending = [symbol for symbol in symbols if symbol not in completed]
+    if completed:
+        print(f"Resuming: {len(symbols) - len(pending)} of {len(symbols)} symbols already backfilled")
+
+    limiter = RateLimiter(rate)
+    started = time.perf_counter()
+    stored_rows = 0
+    backfilled = 0
+
+    def fetch(symbol: str) -> Tuple[str, Optional[List[Dict]], Optional[str]]:
+        try:
+            points = fetch_history(symbol, period, limiter)
+            return symbol, points, None if points else "no price data"
+        except Exception as e:
+            return symbol, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill") as pool:
+        for offset in range(0, len(pending), batch_size):
+            batch = pending[offset:offset + batch_size]
+            data = {}
+            for symbol, points, error in pool.map(fetch, batch):
+                if error:
+                    checkpoint["failed"][symbol] = error
+                else:
+                    data[symbol] = points
+
+            not_available = {symbol: no_data_dates(points, period) for symbol, points in data.items()}
+            rows = bulk_store_stock_data(data, not_available) if data else 0
+            if data and not rows:
+                for symbol in data:
+                    checkpoint["failed"][symbol] = "storing the prices failed"
+            else:
+                for symbol in data:
+                    checkpoint["failed"].pop(symbol, None)
+                    completed.add(symbol)
+                stored_rows += rows
+                backfilled += len(data)
+            checkpoint["completed"] = sorted(completed)
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            done = offset + len(batch)
+            elapsed = time.perf_counter() - started
+            print(f"[{done}/{len(pending)}] stored {rows} rows for {len(data)} symbols, "
+                  f"{len(batch) - len(data)} failed ({done / elapsed:.1f} symbols/s)")
+
+    return {
+        "symbols": len(symbols),
+        "backfilled": backfilled,
+        "skipped": len(symbols) - len(pending),
+        "failed": {symbol: error for symbol, error in checkpoint["failed"].items() if symbol in set(symbols)},
+        "rows": stored_rows,
+        "seconds": round(time.perf_counter() - started, 1)
+    }
+
+
+def _weekdays_between(start: str, end: str) -> int:
+    first = datetime.strptime(start, "%Y-%m-%d")
+    last = datetime.strptime(end, "%Y-%m-%d")
+    days = (last - first).days + 1
+    weeks, remainder = divmod(days, 7)
+    return weeks * 5 + sum(1 for offset in range(remainder) if (first + timedelta(days=weeks * 7 + offset)).weekday() < 5)
+
+
+def verify_coverage(symbols: List[str], period: str) -> Dict[str, Dict]:
+    """
+    Check the cached prices of every symbol: 'missing' without any, 'stale' if the
+    newest is more than MAX_LAG_DAYS older than the last weekday, 'gaps' if fewer
+    than MIN_WEEKDAY_COVERAGE of the weekdays since the first cached date have a
+    price or if the cache doesn't cover the period the way requests need to be served
+    without a provider call ('max' never is), and 'ok' otherwise. A history starting
+    after the beginning of the period is not an error, as the symbol may have been
+    listed later.
+    """
+    coverage = get_price_coverage(symbols)
+    period_start = get_date_range_for_period(period)[0].strftime("%Y-%m-%d")
+    last_weekday = datetime.now()
+    while last_weekday.weekday() >= 5:
+        last_weekday -= timedelta(days=1)
+    oldest_allowed = (last_weekday - timedelta(days=MAX_LAG_DAYS)).strftime("%Y-%m-%d")
+
+    report = {}
+    for symbol in symbols:
+        entry = coverage.get(symbol)
+        if not entry:
+            report[symbol] = {"status": "missing"}
+            continue
+        first_date = max(entry["first_date"], period_start)
+        expected = _weekdays_between(first_date, entry["last_date"])
+        ratio = min(entry["rows"] / expected, 1.0) if expected else 1.0
+        if entry["last_date"] < oldest_allowed:
+            status = "stale"
+        elif ratio < MIN_WEEKDAY_COVERAGE or (period != "max" and not get_cached_stock_data(symbol, period)["covers_range"]):
+            status = "gaps"
+        else:
+            status = "ok"
+        report[symbol] = {**entry, "coverage": round(ratio, 3), "status": status}
+    return report
+
+
+def load_symbols(symbols: Optional[str], symbols_file: Optional[str]) -> List[str]:
+    """
+    Symbols from a comma-separated list, a file (one per line or comma-separated)
+    or, by default, the stocks table.
+    """
+    if symbols_file:
+        with open(symbols_file) as f:
+            symbols = f.read().replace("\n", ",")
+    if symbols:
+        return list(dict.fromkeys(symbol.strip() for symbol in symbols.split(",") if symbol.strip()))
+
+    # The stocks table is seeded on first use, as when the API starts
+    from ..db.seed import seed_default_stocks
+    from .common import open_session
+    db = open_session()
+    try:
+        return sorted(stock.symbol for stock in seed_default_stocks(db))
+    finally:
+        db.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill the price cache from the market data providers")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: every stock of the stocks table)")
+    parser.add_argument("--symbols-file", help="File of symbols, one per line or comma-separated")
+    parser.add_argument("--period", default="5y", choices=PERIODS, help="History downloaded for each symbol")
+    parser.add_argument("--batch-size", type=int, default=50, help="Symbols stored per transaction and checkpoint")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel downloads")
+    parser.add_argument("--rate", type=float, default=5.0, help="Most history downloads per second (0 for no limit)")
+    parser.add_argument("--checkpoint", default=os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), "backfill_checkpoint.json"),
+                        help="Progress file used to resume an interrupted backfill")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and backfill every symbol again")
+    parser.add_argument("--verify-only", action="store_true", help="Only report the coverage of the cached prices")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    symbols = load_symbols(args.symbols, args.symbols_file)
+    if not symbols:
+        print("No symbols to backfill")
+        return 1
+
+    result = {}
+    if not args.verify_only:
+        result = run_backfill(symbols, args.period, max(1, args.batch_size), max(1, args.workers), args.rate,
+                              args.checkpoint, args.restart)
+        print(f"Backfilled {result['backfilled']} symbols ({result['rows']} rows) in {result['seconds']}s, "
+              f"skipped {result['skipped']}, {len(result['failed'])} failed")
+        for symbol, error in sorted(result["failed"].items()):
+            print(f"  {symbol}: {error}")
+
+    report = verify_coverage(symbols, args.period)
+    statuses = {}
+    for entry in report.values():
+        statuses[entry["status"]] = statuses.get(entry["status"], 0) + 1
+    print("Coverage: " + ", ".join(f"{count} {status}" for status, count in sorted(statuses.items())))
+    for symbol, entry in sorted(report.items()):
+        if entry["status"] != "ok":
+            details = f" ({entry['first_date']} to {entry['last_date']}, {entry['coverage']:.0%} of weekdays)" if "rows" in entry else ""
+            print(f"  {symbol}: {entry['status']}{details}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backfill": result, "coverage": report}, f, indent=2)
+    return 0 if statuses.get("ok", 0) == len(symbols) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
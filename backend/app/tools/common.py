@@ -0,0 +1,20 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from ..core.config import settings
+from ..db.fts import ensure_news_fts
+from ..db.models import Base
+from ..db.schema import upgrade_schema
+
+
+def open_session() -> Session:
+    """
+    A session on the application database for command-line tools. Unlike importing
+    app.db.database, this never resets the development database, which a running
+    server may be using; missing tables, columns and the news search index are created.
+    """
+    connect_args = {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
+    engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    ensure_news_fts(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
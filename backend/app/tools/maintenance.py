@@ -0,0 +1,79 @@
+"""
+Maintenance of the price cache and news databases, as run on a schedule by the API
+(see MAINTENANCE_INTERVAL_HOURS): prunes the NULL placeholders of non-trading days,
+rolls expired intraday bars up into daily rows, deletes news older than the
+retention window, vacuums and analyzes both databases, and reports their size and
+fragmentation before and after.
+
+Usage (from the backend directory):
+    python -m app.tools.maintenance [--news-retention-days 365] [--full-vacuum]
+                                    [--report-only] [--json out.json]
+"""
+import argparse
+import json
+import logging
+import sys
+from ..services.maintenance_service import run_maintenance, sqlite_report
+from ..services.stock_values_db import get_db_connection
+from .common import open_session
+
+
+def _format_size(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def _print_report(name: str, before, after=None) -> None:
+    if before is None:
+        print(f"{name}: not a SQLite database, size not reported")
+        return
+    line = f"{name}: {_format_size(before['size_bytes'])}, {before['fragmentation']:.1%} free pages"
+    if after is not None:
+        line += f" -> {_format_size(after['size_bytes'])}, {after['fragmentation']:.1%} free pages"
+    print(line + f" (auto_vacuum {(after or before)['auto_vacuum']})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prune, expire and compact the cache databases")
+    parser.add_argument("--news-retention-days", type=int, help="Days of news kept (default NEWS_RETENTION_DAYS, 0 keeps all)")
+    parser.add_argument("--full-vacuum", action="store_true", help="Rebuild the databases with a full VACUUM")
+    parser.add_argument("--report-only", action="store_true", help="Only report the size and fragmentation")
+    parser.add_argument("--json", help="Also write the report to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    db = open_session()
+    try:
+        if args.report_only:
+            conn = get_db_connection()
+            try:
+                report = {"prices": {"before": sqlite_report(conn)}}
+            finally:
+                conn.close()
+            if db.get_bind().dialect.name == "sqlite":
+                with db.get_bind().connect() as connection:
+                    report["news"] = {"before": sqlite_report(connection.connection)}
+            else:
+                report["news"] = {"before": None}
+        else:
+            report = run_maintenance(db, args.news_retention_days, args.full_vacuum)
+    finally:
+        db.close()
+
+    _print_report("Price cache", report["prices"]["before"], report["prices"].get("after"))
+    _print_report("News database", report["news"]["before"], report["news"].get("after"))
+    if not args.report_only:
+        print(f"Pruned {report['prices']['placeholders']['rows']} NULL placeholders from {report['prices']['placeholders']['tables']} tables, "
+              f"compacted {report['prices']['intraday_bars_compacted']} intraday bars, "
+              f"expired {report['news']['expired_articles']} articles in {report['seconds']}s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
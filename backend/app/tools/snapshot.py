@@ -0,0 +1,325 @@
+"""
+Export and import of the cached market data as Parquet.
+
+Writes the daily prices of the price store and the stocks and news of the
+application database to a directory of Parquet files partitioned by symbol and
+year, and loads such a directory back, e.g. to seed a new instance or to
+analyze the data offline without touching the production databases:
+
+    <dir>/manifest.json
+    <dir>/stocks.parquet
+    <dir>/prices/symbol=AAPL/year=2024/part-0.parquet
+    <dir>/news/symbol=AAPL/year=2024/part-0.parquet
+
+Symbols are URI-encoded in directory names ('^GSPC' -> '%5EGSPC'), which is how
+pyarrow.dataset decodes hive partitions. Rows are streamed in chunks of at most
+CHUNK_ROWS both ways, so memory use doesn't grow with the size of the stores.
+
+Usage (from the backend directory; needs pyarrow):
+    python -m app.tools.snapshot export DIR [--only prices|news] [--overwrite]
+    python -m app.tools.snapshot import DIR [--only prices|news]
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+from ..services.price_store import get_price_store
+from ..services.stock_values_db import bulk_store_stock_data, get_market_snapshot, get_price_coverage
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Rows buffered per Parquet write, and per transaction on import
+CHUNK_ROWS = 50000
+
+SNAPSHOT_VERSION = 1
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet snapshots need pyarrow: pip install pyarrow")
+    return pa, pq
+
+
+def _schemas(pa) -> Dict:
+    return {
+        "stocks": pa.schema([
+            ("symbol", pa.string()), ("name", pa.string()), ("category", pa.string()), ("region", pa.string())
+        ]),
+        "prices": pa.schema([
+            ("date", pa.string()), ("open", pa.float64()), ("high", pa.float64()), ("low", pa.float64()),
+            ("close", pa.float64()), ("volume", pa.int64())
+        ]),
+        "news": pa.schema([
+            ("title", pa.string()), ("description", pa.string()), ("url", pa.string()), ("source", pa.string()),
+            ("published_at", pa.timestamp("us")), ("created_at", pa.timestamp("us")), ("cluster_id", pa.string()),
+            ("sentiment", pa.float64())
+        ]),
+    }
+
+
+class PartitionedWriter:
+    """
+    Writes rows that arrive grouped by (symbol, year) to one Parquet file per
+    partition, keeping a single partition's file open and at most CHUNK_ROWS rows
+    buffered.
+    """
+
+    def __init__(self, pa, pq, root: str, schema):
+        self.pa = pa
+        self.pq = pq
+        self.root = root
+        self.schema = schema
+        self.files = 0
+        self.rows = 0
+        self._partition: Optional[Tuple[str, int]] = None
+        self._writer = None
+        self._buffer: List[tuple] = []
+
+    def write(self, symbol: str, year: int, row: tuple) -> None:
+        if (symbol, year) != self._partition:
+            self._close_partition()
+            self._partition = (symbol, year)
+        self._buffer.append(row)
+        if len(self._buffer) >= CHUNK_ROWS:
+            self._flush()
+
+    def close(self) -> None:
+        self._close_partition()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        if self._writer is None:
+            symbol, year = self._partition
+            directory = os.path.join(self.root, f"symbol={quote(symbol, safe='')}", f"year={year}")
+            os.makedirs(directory, exist_ok=True)
+            self._writer = self.pq.ParquetWriter(os.path.join(directory, "part-0.parquet"), self.schema, compression="zstd")
+            self.files += 1
+        columns = list(zip(*self._buffer))
+        self._writer.write_batch(self.pa.RecordBatch.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema
+        ))
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def _close_partition(self) -> None:
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def export_prices(pa, pq, root: str, symbols: List[str]) -> Dict:
+    writer = PartitionedWriter(pa, pq, os.path.join(root, "prices"), _schemas(pa)["prices"])
+    store = get_price_store()
+    # Symbols with rows only for dates without data have nothing to export
+    cached = sorted(get_price_coverage(sorted(set(symbols))))
+    try:
+        for symbol in cached:
+            for rows in store.iter_prices(symbol, CHUNK_ROWS):
+                for row in rows:
+                    writer.write(symbol, int(row[0][:4]), row)
+    finally:
+        writer.close()
+    return {"symbols": len(cached), "rows": writer.rows, "files": writer.files}
+
+
+def export_news(pa, pq, root: str, db) -> Dict:
+    from ..db.models import Stock, StockNews
+    writer = PartitionedWriter(pa, pq, os.path.join(root, "news"), _schemas(pa)["news"])
+    query = (
+        db.query(Stock.symbol, StockNews.title, StockNews.description, StockNews.url, StockNews.source,
+                 StockNews.published_at, StockNews.created_at, StockNews.cluster_id, StockNews.sentiment)
+        .join(Stock, Stock.id == StockNews.stock_id)
+        .filter(StockNews.published_at.isnot(None))
+        .order_by(Stock.symbol, StockNews.published_at)
+        .yield_per(CHUNK_ROWS)
+    )
+    symbols = set()
+    try:
+        for row in query:
+            symbols.add(row[0])
+            writer.write(row[0], row[5].year, tuple(row[1:]))
+    finally:
+        writer.close()
+    return {"symbols": len(symbols), "rows": writer.rows, "files": writer.files}
+
+
+def export_snapshot(root: str, only: Optional[str] = None, overwrite: bool = False) -> Dict:
+    """
+    Export the stores to a snapshot directory, which must not exist unless overwrite is set.
+    """
+    pa, pq = _import_pyarrow()
+    from ..db.models import Stock
+    from .common import open_session
+
+    if os.path.exists(root) and os.listdir(root):
+        if not overwrite:
+            raise SystemExit(f"{root} is not empty; use --overwrite to replace it")
+        shutil.rmtree(root)
+    os.makedirs(root, exist_ok=True)
+
+    db = open_session()
+    try:
+        stocks = db.query(Stock).order_by(Stock.symbol).all()
+        schema = _schemas(pa)["stocks"]
+        pq.write_table(pa.Table.from_pylist([
+            {"symbol": stock.symbol, "name": stock.name, "category": stock.category, "region": stock.region} for stock in stocks
+        ], schema=schema), os.path.join(root, "stocks.parquet"))
+
+        manifest = {"version": SNAPSHOT_VERSION, "created_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), "stocks": len(stocks)}
+        if only in (None, "prices"):
+            # Symbols with cached prices may not be in the stocks table, e.g. benchmark series
+            manifest["prices"] = export_prices(pa, pq, root, [stock.symbol for stock in stocks] + list(get_market_snapshot()))
+        if only in (None, "news"):
+            manifest["news"] = export_news(pa, pq, root, db)
+    finally:
+        db.close()
+
+    with open(os.path.join(root, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _partitions(directory: str) -> List[Tuple[str, List[str]]]:
+    """
+    (symbol, Parquet files in year order) of each symbol partition of a snapshot store.
+    """
+    if not os.path.isdir(directory):
+        return []
+    partitions = []
+    for name in sorted(os.listdir(directory)):
+        if not name.startswith("symbol="):
+            continue
+        symbol_dir = os.path.join(directory, name)
+        files = []
+        for year_dir in sorted(os.listdir(symbol_dir)):
+            path = os.path.join(symbol_dir, year_dir)
+            files += [os.path.join(path, file) for file in sorted(os.listdir(path)) if file.endswith(".parquet")]
+        partitions.append((unquote(name[len("symbol="):]), files))
+    return partitions
+
+
+def import_prices(pq, root: str) -> Dict:
+    pending: Dict[str, List[Dict]] = {}
+    pending_rows = 0
+    rows = 0
+    partitions = _partitions(os.path.join(root, "prices"))
+    for symbol, files in partitions:
+        for path in files:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=CHUNK_ROWS):
+                points = pending.setdefault(symbol, [])
+                for row in batch.to_pylist():
+                    points.append({
+                        "timestamp": f"{row['date']} 00:00:00",
+                        "open": row["open"],
+                        "high": row["high"],
+                        "low": row["low"],
+                        "close": row["close"],
+                        "volume": row["volume"]
+                    })
+                pending_rows += batch.num_rows
+                # One transaction per CHUNK_ROWS rows
+                if pending_rows >= CHUNK_ROWS:
+                    rows += bulk_store_stock_data(pending)
+                    pending, pending_rows = {}, 0
+    if pending:
+        rows += bulk_store_stock_data(pending)
+    return {"symbols": len(partitions), "rows": rows}
+
+
+def import_news(pq, root: str, db) -> Dict:
+    """
+    Add the snapshot's news to the stocks they belong to, skipping articles a stock
+    already has (same URL).
+    """
+    from ..db.models import Stock, StockNews
+    stock_ids = {stock.symbol: stock.id for stock in db.query(Stock).all()}
+    partitions = _partitions(os.path.join(root, "news"))
+    rows = 0
+    skipped = 0
+    for symbol, files in partitions:
+        if symbol not in stock_ids:
+            logger.warning(f"Skipping the news of {symbol}, which is not in the stocks table")
+            continue
+        stock_id = stock_ids[symbol]
+        known_urls = {url for (url,) in db.query(StockNews.url).filter(StockNews.stock_id == stock_id)}
+        for path in files:
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=CHUNK_ROWS):
+                mappings = []
+                for row in batch.to_pylist():
+                    if row["url"] in known_urls:
+                        skipped += 1
+                        continue
+                    known_urls.add(row["url"])
+                    mappings.append({**row, "stock_id": stock_id})
+                db.bulk_insert_mappings(StockNews, mappings)
+                db.commit()
+                rows += len(mappings)
+    return {"symbols": len(partitions), "rows": rows, "skipped": skipped}
+
+
+def import_snapshot(root: str, only: Optional[str] = None) -> Dict:
+    """
+    Load a snapshot directory: stocks missing from the stocks table are added, prices
+    replace the cached ones of the same dates and news is added without duplicates.
+    """
+    pa, pq = _import_pyarrow()
+    from ..db.models import Stock
+    from .common import open_session
+
+    if not os.path.exists(os.path.join(root, "manifest.json")):
+        raise SystemExit(f"{root} is not a snapshot (manifest.json is missing)")
+
+    result = {}
+    db = open_session()
+    try:
+        known = {symbol for (symbol,) in db.query(Stock.symbol)}
+        new_stocks = [row for row in pq.read_table(os.path.join(root, "stocks.parquet")).to_pylist() if row["symbol"] not in known]
+        db.add_all([Stock(**row) for row in new_stocks])
+        db.commit()
+        result["stocks"] = len(new_stocks)
+
+        if only in (None, "prices"):
+            result["prices"] = import_prices(pq, root)
+        if only in (None, "news"):
+            result["news"] = import_news(pq, root, db)
+    finally:
+        db.close()
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import the cached market data as Parquet")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory", help="Snapshot directory")
+    parser.add_argument("--only", choices=["prices", "news"], help="Only export or import one store")
+    parser.add_argument("--overwrite", action="store_true", help="Replace an existing export directory")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    start = time.perf_counter()
+    if args.command == "export":
+        result = export_snapshot(args.directory, args.only, args.overwrite)
+    else:
+        result = import_snapshot(args.directory, args.only)
+    print(f"{args.command.capitalize()}ed in {time.perf_counter() - start:.1f}s: {json.dumps(result)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Compare two benchmark result files produced by `benchmarks.run`.
+
+Usage (from the backend directory):
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.10]
+
+Prints the change of every scenario metric and exits with a non-zero status
+if latency or throughput regressed by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+# (label, path into the scenario result, True if higher is better)
+METRICS = [
+    ("throughput_rps", ("throughput_rps",), True),
+    ("p50_ms", ("latency_ms", "p50"), False),
+    ("p99_ms", ("latency_ms", "p99"), False),
+    ("mean_ms", ("latency_ms", "mean"), False),
+]
+
+
+def _lookup(result: dict, path: tuple) -> float:
+    value = result
+    for key in path:
+        value = value.get(key, {}) if isinstance(value, dict) else {}
+    return float(value) if isinstance(value, (int, float)) else 0.0
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    """
+    Return a list of (scenario, metric, baseline, candidate, relative_change, regressed) rows.
+    """
+    rows = []
+    for scenario, base_result in baseline["scenarios"].items():
+        new_result = candidate["scenarios"].get(scenario)
+        if new_result is None:
+            continue
+        for label, path, higher_is_better in METRICS:
+            base_value, new_value = _lookup(base_result, path), _lookup(new_result, path)
+            change = (new_value - base_value) / base_value if base_value else 0.0
+            regressed = change < -threshold if higher_is_better else change > threshold
+            rows.append((scenario, label, base_value, new_value, change, regressed))
+        # Upstream calls are deterministic for a given configuration, so any increase is reported
+        base_calls = sum(base_result.get("upstream_calls", {}).values())
+        new_calls = sum(new_result.get("upstream_calls", {}).values())
+        change = (new_calls - base_calls) / base_calls if base_calls else 0.0
+        rows.append((scenario, "upstream_calls", base_calls, new_calls, change, new_calls > base_calls))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline", help="Result file of the reference commit")
+    parser.add_argument("candidate", help="Result file of the commit under test")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"Baseline:  {baseline['commit'][:8]}{' (dirty)' if baseline.get('dirty') else ''} {baseline['created_at']}")
+    print(f"Candidate: {candidate['commit'][:8]}{' (dirty)' if candidate.get('dirty') else ''} {candidate['created_at']}")
+    if baseline.get("config") != candidate.get("config"):
+        print("Warning: the runs used different configurations")
+
+    rows = compare(baseline, candidate, args.threshold)
+    print(f"{'scenario':<16} {'metric':<16} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for scenario, label, base_value, new_value, change, regressed in rows:
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{scenario:<16} {label:<16} {base_value:>12.2f} {new_value:>12.2f} {change:>+8.1%}{marker}")
+
+    return 1 if any(row[5] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
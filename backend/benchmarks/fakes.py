@@ -0,0 +1,344 @@
+"""
+Local stand-ins for the upstream APIs used by the backend.
+
+- Yahoo Finance: `FakeTicker` replaces `yfinance.Ticker` in-process and returns a
+  deterministic random-walk price history for any symbol and period, with
+  intraday bars of the regular sessions for intraday intervals.
+- NewsAPI and Together AI: `FakeUpstreamServer` is a small HTTP server that
+  implements the two endpoints the backend calls. Point
+  `settings.NEWS_API_BASE_URL` / `settings.TOGETHER_API_BASE_URL` at it.
+
+Every stand-in supports a configurable latency and a probability of answering
+with HTTP 429, and counts the calls it receives.
+"""
+import functools
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Calendar days of history served for each yfinance period
+PERIOD_DAYS = {
+    "1d": 1,
+    "5d": 5,
+    "7d": 7,
+    "1mo": 30,
+    "1y": 365,
+    "3y": 3 * 365,
+    "5y": 5 * 365,
+    "max": 30 * 365,
+}
+
+NEWS_HEADLINES = [
+    "{name} shares rise after earnings beat expectations",
+    "{name} stock falls as analysts cut price targets",
+    "{name} announces new product line, investors react",
+    "Why {name} stock is moving today",
+    "{name} faces regulatory scrutiny over market practices",
+    "{name} expands buyback program amid strong cash flow",
+    "Analysts upgrade {name} on improving margins",
+    "{name} CEO comments on outlook for the coming quarter",
+]
+
+NEWS_SOURCES = ["Reuters", "Bloomberg", "CNBC", "MarketWatch", "Yahoo Finance", "Seeking Alpha"]
+
+
+class UpstreamProfile:
+    """
+    Latency and error behaviour of one fake upstream. `latency_per_1k_tokens` adds
+    latency proportional to the prompt size, like an LLM's prompt processing.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit_probability: float = 0.0,
+                 latency_per_1k_tokens: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_probability = rate_limit_probability
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+
+
+class FakeUpstreams:
+    """
+    Shared state of all fake upstreams: behaviour profiles, a seeded random
+    generator for 429 injection and thread-safe call counters.
+    """
+
+    def __init__(self, yahoo: UpstreamProfile = None, newsapi: UpstreamProfile = None,
+                 together: UpstreamProfile = None, news_articles: int = 40, seed: int = 42):
+        self.profiles = {
+            "yahoo": yahoo or UpstreamProfile(),
+            "newsapi": newsapi or UpstreamProfile(),
+            "together": together or UpstreamProfile(),
+        }
+        self.news_articles = news_articles
+        self.calls = Counter()
+        self.prompt_chars = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def enter(self, provider: str, call: str, tokens: int = 0) -> bool:
+        """
+        Record a call, sleep for the configured latency and return True if the
+        call should be answered with HTTP 429.
+        """
+        profile = self.profiles[provider]
+        with self._lock:
+            self.calls[call] += 1
+            delay = profile.latency + self._random.random() * profile.jitter + profile.latency_per_1k_tokens * tokens / 1000
+            rate_limited = self._random.random() < profile.rate_limit_probability
+            if rate_limited:
+                self.calls[f"{call}_429"] += 1
+        if delay > 0:
+            time.sleep(delay)
+        return rate_limited
+
+    def record_prompt(self, prompt: str) -> None:
+        with self._lock:
+            self.prompt_chars += len(prompt)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"calls": dict(self.calls), "together_prompt_chars": self.prompt_chars}
+
+
+def _symbol_seed(symbol: str) -> int:
+    return zlib.crc32(symbol.encode("utf-8"))
+
+
+@functools.lru_cache(maxsize=4)
+def _business_days(end):
+    import pandas as pd
+
+    return pd.bdate_range(start="1990-01-01", end=end, tz="America/New_York")
+
+
+def make_price_history(symbol: str, period: str):
+    """
+    Build a deterministic daily OHLCV DataFrame shaped like `yfinance.Ticker.history`.
+    """
+    import numpy as np
+    import pandas as pd
+
+    # Generate one fixed series per symbol from 1990 onwards and slice it, so that
+    # overlapping periods return identical prices for the same dates
+    end = pd.Timestamp(datetime.now().date())
+    full_index = _business_days(end)
+    rng = np.random.default_rng(_symbol_seed(symbol))
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(full_index))))
+    spread = np.abs(rng.normal(0, 0.01, len(full_index))) * close
+    volume = rng.integers(1_000_000, 50_000_000, len(full_index))
+
+    start = end - pd.Timedelta(days=PERIOD_DAYS.get(period, 7))
+    mask = full_index >= start.tz_localize("America/New_York")
+    index, close, spread, volume = full_index[mask], close[mask], spread[mask], volume[mask]
+    return pd.DataFrame(
+        {
+            "Open": close - spread / 2,
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": volume,
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        },
+        index=index,
+    )
+
+
+# Bar size in minutes of the intraday intervals the fake serves
+INTRADAY_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "1h": 60}
+
+
+def make_intraday_history(symbol: str, period: str, interval: str, start=None):
+    """
+    Build a deterministic intraday OHLCV DataFrame for the regular sessions
+    (9:30-16:00 New York time) of the period, or since `start` (seconds since the
+    epoch or a datetime), up to the current time. Each bar's prices depend only on
+    the symbol and the bar's start, so overlapping requests agree.
+    """
+    import numpy as np
+    import pandas as pd
+
+    minutes = INTRADAY_MINUTES[interval]
+    now = pd.Timestamp.now(tz="America/New_York")
+    if start is not None:
+        first = pd.Timestamp(start, unit="s", tz="UTC") if isinstance(start, (int, float)) else pd.Timestamp(start)
+        first = (first.tz_localize("America/New_York") if first.tzinfo is None else first).tz_convert("America/New_York")
+    else:
+        first = now - pd.Timedelta(days=PERIOD_DAYS.get(period, 1))
+        if period == "1d":
+            # Like Yahoo Finance: the latest session that has started, even on a weekend
+            opened = now.weekday() < 5 and now >= now.normalize() + pd.Timedelta(hours=9, minutes=30)
+            first = now.normalize() if opened else (now.normalize() - pd.offsets.BDay(1))
+
+    bars = []
+    for day in pd.bdate_range(first.normalize().tz_localize(None), now.normalize().tz_localize(None)):
+        session = pd.date_range(day + pd.Timedelta(hours=9, minutes=30), day + pd.Timedelta(hours=16), freq=f"{minutes}min",
+                                inclusive="left", tz="America/New_York")
+        bars.append(session[(session >= first.floor(f"{minutes}min")) & (session <= now)])
+    index = bars[0].append(bars[1:]) if bars else pd.DatetimeIndex([], tz="America/New_York")
+
+    base = make_price_history(symbol, "max")["Close"]
+    seconds = index.asi8 // 10**9
+    noise = np.array([zlib.crc32(f"{symbol}:{ts}".encode()) for ts in seconds], dtype=np.float64) / 2**32 - 0.5
+    close = base.asof(index.normalize()).to_numpy() * (1 + 0.01 * noise) if len(index) else np.zeros(0)
+    spread = 0.001 * close
+    return pd.DataFrame(
+        {
+            "Open": close - spread / 2,
+            "High": close + spread,
+            "Low": close - spread,
+            "Close": close,
+            "Volume": (np.abs(noise) * 100_000).astype(np.int64),
+            "Dividends": 0.0,
+            "Stock Splits": 0.0,
+        },
+        index=index,
+    )
+
+
+def make_fake_ticker(upstreams: FakeUpstreams):
+    """
+    Return a replacement for `yfinance.Ticker` bound to the given upstream state.
+    """
+
+    class FakeTicker:
+        def __init__(self, symbol: str):
+            self.ticker = symbol
+
+        @property
+        def info(self):
+            if upstreams.enter("yahoo", "yahoo_info"):
+                raise Exception("429 Client Error: Too Many Requests")
+            return {"symbol": self.ticker, "regularMarketPrice": 100.0}
+
+        def history(self, period: str = "1mo", interval: str = "1d", start=None, **kwargs):
+            if upstreams.enter("yahoo", "yahoo_history"):
+                raise Exception("429 Client Error: Too Many Requests")
+            if interval in INTRADAY_MINUTES:
+                return make_intraday_history(self.ticker, period, interval, start)
+            return make_price_history(self.ticker, period)
+
+    return FakeTicker
+
+
+def make_articles(symbol: str, start: str, end: str, count: int) -> list:
+    """
+    Build a deterministic list of NewsAPI articles about a symbol.
+    Some headlines repeat across sources, like syndicated copies of a story.
+    """
+    rng = random.Random(_symbol_seed(symbol))
+    name = symbol.replace("^", "")
+    start_date = datetime.strptime(start, "%Y-%m-%d")
+    end_date = datetime.strptime(end, "%Y-%m-%d")
+    span_seconds = max(int((end_date - start_date).total_seconds()), 1)
+    articles = []
+    for i in range(count):
+        headline = rng.choice(NEWS_HEADLINES).format(name=name)
+        published = start_date + timedelta(seconds=rng.randrange(span_seconds))
+        articles.append({
+            "source": {"id": None, "name": rng.choice(NEWS_SOURCES)},
+            "author": None,
+            "title": headline,
+            "description": f"{headline}. Market participants weighed the news against the broader trend "
+                           f"in {name} and its sector, with trading volume {rng.choice(['above', 'below', 'near'])} average.",
+            "url": f"https://news.example.com/{name.lower()}/{i}",
+            "publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "content": None,
+        })
+    articles.sort(key=lambda article: article["publishedAt"], reverse=True)
+    return articles
+
+
+class _Handler(BaseHTTPRequestHandler):
+    upstreams: FakeUpstreams = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != "/newsapi/v2/everything":
+            self._send_json(404, {"status": "error", "message": "Not found"})
+            return
+        if self.upstreams.enter("newsapi", "newsapi"):
+            self._send_json(429, {"status": "error", "code": "rateLimited", "message": "Too many requests"})
+            return
+
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        symbol = params.get("q", "").split('"')[1] if '"' in params.get("q", "") else params.get("q", "")
+        articles = make_articles(symbol, params["from"], params["to"], self.upstreams.news_articles)
+        page = int(params.get("page", 1))
+        page_size = int(params.get("pageSize", 100))
+        self._send_json(200, {
+            "status": "ok",
+            "totalResults": len(articles),
+            "articles": articles[(page - 1) * page_size:page * page_size],
+        })
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/together/v1/chat/completions":
+            self._send_json(404, {"error": "Not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = "".join(message.get("content", "") for message in request.get("messages", []))
+        self.upstreams.record_prompt(prompt)
+        if self.upstreams.enter("together", "together", tokens=len(prompt) // 4):
+            self._send_json(429, {"error": {"message": "Rate limit exceeded"}})
+            return
+        self._send_json(200, {
+            "choices": [{
+                "message": {
+                    "role": "assistant",
+                    "content": "<div class=\"news-summary-section\"><h2>News Summary</h2><ul><li>Benchmark summary</li></ul></div>",
+                }
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 20},
+        })
+
+
+class FakeUpstreamServer:
+    """
+    HTTP server that serves the fake NewsAPI and Together AI endpoints in a background thread.
+    """
+
+    def __init__(self, upstreams: FakeUpstreams, host: str = "127.0.0.1", port: int = 0):
+        handler = type("FakeUpstreamHandler", (_Handler,), {"upstreams": upstreams})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def news_api_url(self) -> str:
+        return f"{self.base_url}/newsapi/v2/everything"
+
+    @property
+    def together_api_url(self) -> str:
+        return f"{self.base_url}/together/v1/chat/completions"
+
+    def start(self) -> "FakeUpstreamServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
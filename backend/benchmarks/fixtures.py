@@ -0,0 +1,82 @@
+"""
+Write the fake Yahoo Finance history of `benchmarks.fakes` as market data fixtures.
+
+Writes, for each symbol, its daily history since 1990 to `<symbol>.csv` (or
+`.parquet`) and the last five days of each intraday interval to
+`<symbol>.<interval>.csv`, in the layout read by the 'fixtures' market data
+provider. With MARKET_DATA_PROVIDERS=fixtures and MARKET_DATA_FIXTURES_DIR set to
+the directory, the app (and the benchmarks run against it) needs no network access
+for prices and serves the same data on every run.
+
+Usage (from the backend directory):
+    python -m benchmarks.fixtures <dir> [--symbols AAPL,MSFT] [--intervals 1m,5m]
+                                        [--format csv|parquet]
+
+Without --symbols the stocks the database is seeded with are written.
+"""
+import argparse
+import os
+import sys
+from urllib.parse import quote
+
+from .fakes import INTRADAY_MINUTES, make_intraday_history, make_price_history
+
+
+def write_fixture(hist, path: str, index_label: str, fmt: str) -> None:
+    frame = hist[["Open", "High", "Low", "Close", "Volume"]]
+    if index_label == "Date":
+        frame = frame.set_axis(frame.index.strftime("%Y-%m-%d"))
+    frame = frame.rename_axis(index_label).reset_index()
+    if index_label == "Datetime":
+        frame[index_label] = frame[index_label].map(lambda ts: ts.isoformat())
+    if fmt == "parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def write_fixtures(directory: str, symbols: list, intervals: list, fmt: str = "csv") -> int:
+    """
+    Write the fixtures of the symbols to a directory, returning the number of files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = 0
+    for symbol in symbols:
+        name = quote(symbol, safe="")
+        write_fixture(make_price_history(symbol, "max"), os.path.join(directory, f"{name}.{fmt}"), "Date", fmt)
+        files += 1
+        for interval in intervals:
+            hist = make_intraday_history(symbol, "5d", interval)
+            write_fixture(hist, os.path.join(directory, f"{name}.{interval}.{fmt}"), "Datetime", fmt)
+            files += 1
+    return files
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write the fake price history as market data fixtures")
+    parser.add_argument("directory", help="Directory to write the fixtures to (MARKET_DATA_FIXTURES_DIR)")
+    parser.add_argument("--symbols", help="Comma-separated symbols (default: the seeded stocks)")
+    parser.add_argument("--intervals", default="1m,5m,15m,1h", help="Comma-separated intraday intervals ('' for none)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="File format")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.symbols:
+        symbols = [symbol.strip() for symbol in args.symbols.split(",") if symbol.strip()]
+    else:
+        from app.db.seed import DEFAULT_STOCKS
+        symbols = [stock["symbol"] for stock in DEFAULT_STOCKS]
+    intervals = [interval.strip() for interval in args.intervals.split(",") if interval.strip()]
+    unknown = [interval for interval in intervals if interval not in INTRADAY_MINUTES]
+    if unknown:
+        print(f"Unknown intervals: {', '.join(unknown)}. Must be among: {', '.join(INTRADAY_MINUTES)}", file=sys.stderr)
+        return 2
+    files = write_fixtures(args.directory, symbols, intervals, args.format)
+    print(f"Wrote {files} fixture files for {len(symbols)} symbols to {args.directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Import-time profile of the API process.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+reports the total cold-start import time, the slowest modules, and any heavy
+modules that should only be loaded on first use.
+
+Usage (from the backend directory):
+    python -m benchmarks.import_time [--budget-ms 1000] [--top 15] [--json out.json]
+
+Exits with a non-zero status if the import time exceeds the budget or a lazy
+module was imported eagerly.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that must not be imported when the app starts
+LAZY_MODULES = ["yfinance", "pandas", "pymongo", "celery", "spacy", "nltk"]
+
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+
+
+def profile_imports(target: str = "app.main") -> list:
+    """
+    Import the target module in a fresh interpreter and return a list of
+    (module, depth, self_us, cumulative_us) tuples parsed from the -X importtime output.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(BACKEND_DIR) + os.pathsep + env.get("PYTHONPATH", "")
+    # Run from a scratch directory: the app resets ./stock_news.db on import in development
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+            cwd=scratch_dir,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{result.stderr}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nesting is encoded as two spaces of indentation per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def build_report(entries: list, target: str, top: int) -> dict:
+    modules = {name: cumulative for name, _, _, cumulative in entries}
+    
+    # Children are listed before their parent, so the direct imports of the target
+    # are the depth-1 entries since the previous top-level module
+    direct_imports = []
+    children = []
+    for entry in entries:
+        if entry[1] == 0:
+            if entry[0] == target:
+                direct_imports = children
+            children = []
+        elif entry[1] == 1:
+            children.append(entry)
+    direct_imports.sort(key=lambda entry: entry[3], reverse=True)
+    return {
+        "target": target,
+        "total_ms": round(modules.get(target, 0) / 1000, 1),
+        "slowest_imports": [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1), "self_ms": round(self_us / 1000, 1)}
+            for name, _, self_us, cumulative in direct_imports[:top]
+        ],
+        "eager_lazy_modules": [name for name in LAZY_MODULES if name in modules],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Profile cold-start import time of the API")
+    parser.add_argument("--target", default="app.main", help="Module to import")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum allowed import time")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to show")
+    parser.add_argument("--json", dest="json_path", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = build_report(profile_imports(args.target), args.target, args.top)
+    report["budget_ms"] = args.budget_ms
+
+    print(f"Import time for {args.target}: {report['total_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print("Slowest imports:")
+    for entry in report["slowest_imports"]:
+        print(f"  {entry['cumulative_ms']:>8.1f} ms  {entry['module']}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = False
+    if report["eager_lazy_modules"]:
+        print(f"Modules that should load lazily were imported at startup: {', '.join(report['eager_lazy_modules'])}")
+        failed = True
+    if report["total_ms"] > args.budget_ms:
+        print(f"Import time exceeds budget by {report['total_ms'] - args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Per-request cost of serving cached daily prices, without and with the hot tier.
+
+Fills fresh databases with the fake Yahoo Finance history of `benchmarks.fakes`,
+then requests `/api/stocks/{symbol}/prices` for cached periods through the app,
+first reading the price store (PRICE_HOT_CACHE off) and then the memory-mapped hot
+tier. Reports the median latency and the peak memory allocated per request
+(traced with tracemalloc, in a separate pass so tracing doesn't skew the timings).
+
+Usage (from the backend directory):
+    python -m benchmarks.price_cache [--periods 1mo,1y,5y] [--requests 50] [--json out.json]
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SYMBOLS = ["AAPL", "MSFT", "^GSPC"]
+
+
+def measure(client, paths: list, requests: int) -> dict:
+    """
+    Median latency and median peak traced allocation of requesting the paths in turn.
+    """
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = client.get(paths[i % len(paths)])
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.text
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(requests):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            client.get(paths[i % len(paths)])
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "peak_kb": round(statistics.median(peaks) / 1024, 1)
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark serving cached prices with and without the hot tier")
+    parser.add_argument("--periods", default="1mo,1y,5y", help="Comma-separated periods to request")
+    parser.add_argument("--requests", type=int, default=50, help="Requests measured per period and mode")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    json_path = os.path.abspath(args.json) if args.json else None
+    workdir = tempfile.mkdtemp(prefix="price-cache-bench-")
+    os.environ.update(
+        STOCK_VALUES_DB_PATH=os.path.join(workdir, "stock_values.db"),
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'stock_news.db')}",
+        PRICE_HOT_CACHE_DIR=os.path.join(workdir, "price_hot_cache"),
+        PRICE_HOT_CACHE_MAX_AGE="86400"
+    )
+    os.chdir(workdir)
+    sys.path.insert(0, str(BACKEND_DIR))
+    logging.disable(logging.WARNING)
+
+    from .fakes import FakeUpstreams, make_fake_ticker
+    import yfinance
+    yfinance.Ticker = make_fake_ticker(FakeUpstreams())
+    from starlette.testclient import TestClient
+    from app.core.config import settings
+    from app.main import app
+
+    client = TestClient(app)
+    client.get("/api/stocks/")
+    periods = [period for period in args.periods.split(",") if period.strip()]
+    # Fill the price cache; the second request of each pair is a cache hit
+    for period in periods:
+        for symbol in SYMBOLS:
+            for _ in range(2):
+                client.get(f"/api/stocks/{symbol}/prices?period={period}")
+
+    results = []
+    for period in periods:
+        paths = [f"/api/stocks/{symbol}/prices?period={period}" for symbol in SYMBOLS]
+        points = sum(len(client.get(path).json()) for path in paths) // len(paths)
+        result = {"period": period, "points": points}
+        for mode, enabled in (("store", False), ("hot", True)):
+            settings.PRICE_HOT_CACHE = enabled
+            client.get(paths[0])
+            result[mode] = measure(client, paths, args.requests)
+        results.append(result)
+
+    print(f"{'period':>8} {'points':>8} {'store ms':>10} {'hot ms':>8} {'store peak KB':>15} {'hot peak KB':>12}")
+    for result in results:
+        print(
+            f"{result['period']:>8} {result['points']:>8} {result['store']['median_ms']:>10.2f} {result['hot']['median_ms']:>8.2f} "
+            f"{result['store']['peak_kb']:>15,.1f} {result['hot']['peak_kb']:>12,.1f}"
+        )
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"requests": args.requests, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""
+Load-test and benchmark harness.
+
+Starts the FastAPI app on a local port against the fake upstreams in
+`benchmarks.fakes` (Yahoo Finance, NewsAPI and Together AI with configurable
+latency and 429 injection), drives a traffic mix and records throughput,
+latency percentiles and upstream call counts.
+
+Each scenario runs in its own subprocess with fresh, empty databases, so runs
+are reproducible. Results are written as JSON to benchmarks/results/ and can be
+compared between commits with `python -m benchmarks.compare`.
+
+Usage (from the backend directory):
+    python -m benchmarks.run [--scenarios dashboard_cold,period_switch,summary]
+                             [--concurrency 8] [--yahoo-latency 0.2]
+                             [--rate-limit-probability 0.0] [--out results.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+RESULT_MARKER = "BENCHMARK_RESULT "
+
+PERIODS = ["7d", "1mo", "1y", "3y", "5y", "max"]
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class LoadClient:
+    """
+    Issues HTTP requests against the app from a pool of worker threads and
+    records the latency and status of every request.
+    """
+
+    def __init__(self, base_url: str, concurrency: int):
+        import requests
+
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self._local = threading.local()
+        self._requests = requests
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            self._local.session = self._requests.Session()
+        return self._local.session
+
+    def get(self, path, record: bool = True):
+        """
+        Request a path, or call a function directly when path is a callable
+        (used to exercise the service layer without going through HTTP).
+        """
+        start = time.perf_counter()
+        try:
+            if callable(path):
+                response, status = path(), 200
+            else:
+                response = self._session().get(self.base_url + path, timeout=300)
+                status = response.status_code
+        except self._requests.RequestException:
+            response, status = None, 0
+        except Exception:
+            response, status = None, 500
+        if record:
+            with self._lock:
+                self.samples.append((time.perf_counter() - start, status))
+        return response
+
+    def run(self, paths: list) -> None:
+        """
+        Request all paths (or call all functions) with the configured concurrency
+        and wait for them to finish.
+        """
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(self.get, paths))
+
+    def summary(self, wall_time: float) -> dict:
+        latencies = sorted(latency for latency, _ in self.samples)
+        statuses = {}
+        for _, status in self.samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            "requests": len(self.samples),
+            "wall_time_s": round(wall_time, 3),
+            "throughput_rps": round(len(self.samples) / wall_time, 2) if wall_time > 0 else 0.0,
+            "latency_ms": {
+                "mean": round(1000 * sum(latencies) / len(latencies), 2) if latencies else 0.0,
+                "p50": round(1000 * percentile(latencies, 0.50), 2),
+                "p90": round(1000 * percentile(latencies, 0.90), 2),
+                "p99": round(1000 * percentile(latencies, 0.99), 2),
+                "max": round(1000 * latencies[-1], 2) if latencies else 0.0,
+            },
+            "status_codes": statuses,
+        }
+
+
+# Scenarios: each receives the client, the list of seeded stocks and the
+# parsed arguments, and returns the paths to measure (setup requests are not recorded)
+
+def scenario_dashboard_cold(client: LoadClient, stocks: list, args) -> list:
+    """
+    Cold dashboard load: the stock list and the market snapshot.
+    """
+    return ["/api/stocks/", "/api/market/snapshot"]
+
+
+def scenario_dashboard_warm(client: LoadClient, stocks: list, args) -> list:
+    """
+    Repeated dashboard loads once the market snapshot has been warmed up.
+    """
+    deadline = time.monotonic() + 120
+    while client.get("/api/market/snapshot", record=False).json()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.5)
+    return ["/api/stocks/", "/api/market/snapshot"] * (args.repeat * 10)
+
+
+def scenario_period_switch(client: LoadClient, stocks: list, args) -> list:
+    """
+    A user on StockDetail switching between all periods for a few symbols.
+    """
+    symbols = [stock["symbol"] for stock in stocks[:args.symbols]]
+    for symbol in symbols:
+        client.get(f"/api/stocks/{symbol}/prices?period=7d", record=False)
+    return [
+        f"/api/stocks/{symbol}/prices?period={period}"
+        for _ in range(args.repeat)
+        for symbol in symbols
+        for period in PERIODS
+    ]
+
+
+def scenario_summary(client: LoadClient, stocks: list, args) -> list:
+    """
+    AI news summary generation for a few symbols.
+    """
+    symbols = [stock["symbol"] for stock in stocks[:args.symbols]]
+    return [
+        f"/api/stocks/{symbol}/news-summary?period=7d"
+        for _ in range(args.repeat)
+        for symbol in symbols
+    ]
+
+
+def scenario_coalesce(client: LoadClient, stocks: list, args) -> list:
+    """
+    Concurrent identical cold fetches of one symbol, straight through the service
+    layer: request coalescing must turn them into a single upstream call of each kind.
+    """
+    from app.services.news_service import get_stock_news
+    from app.services.stock_service import get_stock_data
+
+    symbol = stocks[0]["symbol"]
+    return (
+        [lambda: get_stock_data(symbol, "1y")] * args.concurrency
+        + [lambda: get_stock_news(symbol, "7d")] * args.concurrency
+    )
+
+
+SCENARIOS = {
+    "dashboard_cold": scenario_dashboard_cold,
+    "dashboard_warm": scenario_dashboard_warm,
+    "period_switch": scenario_period_switch,
+    "summary": scenario_summary,
+    "coalesce": scenario_coalesce,
+}
+
+# Exact upstream call counts that a scenario must produce
+SCENARIO_EXPECTED_CALLS = {
+    "coalesce": {"yahoo_info": 1, "yahoo_history": 1, "newsapi": 1},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_scenario(name: str, args) -> dict:
+    """
+    Run one scenario in the current process against fresh databases and fake upstreams.
+    """
+    from benchmarks.fakes import FakeUpstreams, FakeUpstreamServer, UpstreamProfile, make_fake_ticker
+
+    # Fresh databases in a scratch directory (the app resets ./stock_news.db on import in development)
+    workdir = tempfile.mkdtemp(prefix="stock-news-bench-")
+    os.chdir(workdir)
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/stock_news.db"
+    os.environ["STOCK_VALUES_DB_PATH"] = os.path.join(workdir, "stock_values.db")
+    os.environ["NEWS_API_KEY"] = "benchmark"
+    os.environ["TOGETHER_API_KEY"] = "benchmark"
+    os.environ["LLM_BACKEND"] = args.llm_backend
+
+    upstreams = FakeUpstreams(
+        yahoo=UpstreamProfile(args.yahoo_latency, args.jitter, args.rate_limit_probability),
+        newsapi=UpstreamProfile(args.newsapi_latency, args.jitter, args.rate_limit_probability),
+        together=UpstreamProfile(args.together_latency, args.jitter, args.rate_limit_probability,
+                                 args.together_prompt_latency),
+        news_articles=args.news_articles,
+        seed=args.seed,
+    )
+    fake_server = FakeUpstreamServer(upstreams).start()
+
+    import yfinance
+    yfinance.Ticker = make_fake_ticker(upstreams)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.core.config import settings
+    settings.NEWS_API_BASE_URL = fake_server.news_api_url
+    settings.TOGETHER_API_BASE_URL = fake_server.together_api_url
+
+    import uvicorn
+    from app.main import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    try:
+        client = LoadClient(f"http://127.0.0.1:{port}", args.concurrency)
+        stocks = client.get("/api/stocks/", record=False).json()
+        paths = SCENARIOS[name](client, stocks, args)
+        upstream_before = upstreams.snapshot()["calls"]
+
+        start = time.perf_counter()
+        client.run(paths)
+        result = client.summary(time.perf_counter() - start)
+
+        upstream_after = upstreams.snapshot()
+        result["upstream_calls"] = {
+            call: count - upstream_before.get(call, 0)
+            for call, count in upstream_after["calls"].items()
+            if count - upstream_before.get(call, 0)
+        }
+        result["together_prompt_chars"] = upstream_after["together_prompt_chars"]
+        return result
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+        fake_server.stop()
+
+
+def _git_revision() -> dict:
+    def git(*command):
+        return subprocess.run(["git", *command], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the backend benchmark suite against local upstream stand-ins")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client connections")
+    parser.add_argument("--symbols", type=int, default=5, help="Symbols used by the per-symbol scenarios")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of the per-symbol traffic")
+    parser.add_argument("--yahoo-latency", type=float, default=0.2, help="Fake Yahoo Finance latency in seconds")
+    parser.add_argument("--newsapi-latency", type=float, default=0.3, help="Fake NewsAPI latency in seconds")
+    parser.add_argument("--together-latency", type=float, default=1.0, help="Fake Together AI latency in seconds")
+    parser.add_argument("--together-prompt-latency", type=float, default=0.25,
+                        help="Extra fake Together AI latency in seconds per 1000 prompt tokens")
+    parser.add_argument("--llm-backend", default="together", choices=["together", "local"],
+                        help="Summary backend: the fake Together AI or the local extractive backend")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Random extra latency in seconds")
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0, help="Probability of an upstream 429")
+    parser.add_argument("--news-articles", type=int, default=40, help="Articles returned per NewsAPI query")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for latency jitter and 429 injection")
+    parser.add_argument("--out", help="Result file (defaults to benchmarks/results/<commit>-<timestamp>.json)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    if args.child:
+        result = run_scenario(args.child, args)
+        print(RESULT_MARKER + json.dumps(result), flush=True)
+        return 0
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}. Available: {', '.join(SCENARIOS)}")
+        return 2
+
+    revision = _git_revision()
+    report = {
+        "commit": revision["commit"],
+        "dirty": revision["dirty"],
+        "created_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("child", "out")},
+        "scenarios": {},
+    }
+
+    failed = False
+    child_args = [arg for arg in (argv if argv is not None else sys.argv[1:])]
+    for name in scenarios:
+        print(f"Running scenario {name}...", flush=True)
+        process = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run", *child_args, "--child", name],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+        )
+        lines = [line for line in process.stdout.splitlines() if line.startswith(RESULT_MARKER)]
+        if process.returncode != 0 or not lines:
+            print(f"Scenario {name} failed:\n{process.stderr[-4000:]}")
+            return 1
+        result = json.loads(lines[-1][len(RESULT_MARKER):])
+        report["scenarios"][name] = result
+        latency = result["latency_ms"]
+        print(
+            f"  {result['requests']} requests, {result['throughput_rps']} req/s, "
+            f"p50 {latency['p50']} ms, p99 {latency['p99']} ms, upstream calls {result['upstream_calls']}"
+        )
+
+        expected_calls = SCENARIO_EXPECTED_CALLS.get(name)
+        if expected_calls:
+            result["expected_upstream_calls"] = expected_calls
+            result["passed"] = all(result["upstream_calls"].get(call, 0) == count for call, count in expected_calls.items())
+            if not result["passed"]:
+                print(f"  FAILED: expected upstream calls {expected_calls}")
+                failed = True
+
+    out_path = Path(args.out) if args.out else RESULTS_DIR / f"{revision['commit'][:8] or 'nogit'}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
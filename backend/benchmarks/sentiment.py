@@ -0,0 +1,94 @@
+"""
+Throughput benchmark of the local news sentiment stage.
+
+Scores synthetic NewsAPI-style articles (see `benchmarks.fakes.make_articles`)
+with `app.services.sentiment_service.score_articles` in batches of several
+sizes and reports articles per second for each batch size.
+
+Usage (from the backend directory):
+    python -m benchmarks.sentiment [--articles 20000] [--batch-sizes 1,10,100,1000]
+                                   [--repeat 3] [--json out.json]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from .fakes import make_articles
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "TSLA", "JPM", "^GSPC", "EURUSD=X"]
+
+
+def build_articles(count: int) -> list:
+    """
+    Build `count` articles spread over several symbols, in the shape produced by news_service.
+    """
+    per_symbol = count // len(SYMBOLS) + 1
+    articles = []
+    for symbol in SYMBOLS:
+        for article in make_articles(symbol, "2024-01-01", "2024-12-31", per_symbol):
+            articles.append({
+                "title": article["title"],
+                "description": article["description"],
+                "url": article["url"],
+                "source": article["source"]["name"],
+                "published_at": article["publishedAt"]
+            })
+    return articles[:count]
+
+
+def measure(score_articles, articles: list, batch_size: int, repeat: int) -> dict:
+    """
+    Score all articles in batches of batch_size, keeping the best of `repeat` runs.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for offset in range(0, len(articles), batch_size):
+            score_articles(articles[offset:offset + batch_size])
+        best = min(best, time.perf_counter() - start)
+    return {
+        "batch_size": batch_size,
+        "seconds": round(best, 4),
+        "articles_per_second": round(len(articles) / best, 1)
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark local news sentiment scoring")
+    parser.add_argument("--articles", type=int, default=20000, help="Number of articles scored per run")
+    parser.add_argument("--batch-sizes", default="1,10,100,1000", help="Comma-separated batch sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per batch size (the fastest is reported)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.services.sentiment_service import score_articles, _get_lexicon
+
+    articles = build_articles(args.articles)
+
+    start = time.perf_counter()
+    _get_lexicon()
+    lexicon_ms = (time.perf_counter() - start) * 1000
+
+    results = [measure(score_articles, articles, int(size), args.repeat) for size in args.batch_sizes.split(",") if size.strip()]
+
+    print(f"Lexicon loaded in {lexicon_ms:.1f} ms; scored {len(articles)} articles")
+    print(f"{'batch size':>12} {'seconds':>10} {'articles/s':>14}")
+    for result in results:
+        print(f"{result['batch_size']:>12} {result['seconds']:>10.4f} {result['articles_per_second']:>14,.0f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"articles": len(articles), "lexicon_ms": round(lexicon_ms, 1), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,7 @@ import React, { useEffect } from 'react'
 import { useDispatch, useSelector } from 'react-redux'
 import { Link } from 'react-router-dom'
 import { Container, Grid, Card, CardContent, Typography, Box, Paper, CircularProgress } from '@mui/material'
-import { fetchStocks, fetchStockPrices } from '../store/stocksSlice'
+import { fetchStocks, fetchMarketSnapshot } from '../store/stocksSlice'
 import Carousel from 'react-material-ui-carousel'
 import TrendingUpIcon from '@mui/icons-material/TrendingUp'
 import TrendingDownIcon from '@mui/icons-material/TrendingDown'
@@ -11,8 +11,7 @@ import ErrorMessage from '../components/ErrorMessage'
 const Dashboard = () => {
   const dispatch = useDispatch()
   const { list: stocks, status, error } = useSelector((state) => state.stocks)
-  const prices = useSelector((state) => state.stocks.prices)
-   const pricesStatus = useSelector((state) => state.stocks.pricesStatus)
+  const { snapshot, snapshotPending, snapshotStatus } = useSelector((state) => state.stocks)
 
   // Filter stocks for the dashboard display
   const dashboardStocks = stocks.filter(stock => {
@@ -27,33 +26,27 @@ const Dashboard = () => {
     return false;
   });
 
-  // Function to fetch stock prices sequentially
-  const fetchStockPricesSequentially = async (stocksList) => {
-    for (const stock of stocksList) {
-      // Check if we already have data or if it's currently loading
-      const hasData = prices[stock.symbol]?.['7d']?.length > 0;
-      const isLoading = pricesStatus[stock.symbol]?.['7d'] === 'loading';
-      const hasSucceeded = pricesStatus[stock.symbol]?.['7d'] === 'succeeded';
-      
-      // Only fetch if we don't have data, it's not loading, and hasn't already succeeded
-      if (!hasData && !isLoading && !hasSucceeded) {
-        await dispatch(fetchStockPrices({ symbol: stock.symbol, period: '7d' }))
-      }
-    }
-  }
-
   useEffect(() => {
     if (status === 'idle') {
       dispatch(fetchStocks())
     }
   }, [status, dispatch])
 
-  // Start fetching stock prices once we have the stock list
+  // A single request returns the latest change of every symbol
+  useEffect(() => {
+    if (snapshotStatus === 'idle') {
+      dispatch(fetchMarketSnapshot())
+    }
+  }, [snapshotStatus, dispatch])
+
+  // Symbols the server hasn't cached yet are warmed up in the background, so poll until they're ready
+  const dashboardPending = dashboardStocks.some(stock => snapshotPending.includes(stock.symbol))
   useEffect(() => {
-    if (dashboardStocks.length > 0) {
-      fetchStockPricesSequentially(dashboardStocks)
+    if (snapshotStatus === 'succeeded' && dashboardPending) {
+      const timer = setTimeout(() => dispatch(fetchMarketSnapshot()), 3000)
+      return () => clearTimeout(timer)
     }
-  }, [dashboardStocks, prices, pricesStatus]) // Add dependencies to prevent unnecessary fetches
+  }, [snapshotStatus, dashboardPending, dispatch])
 
   // Show loading indicator only when initially fetching the stock list
   if (status === 'loading') {
@@ -75,29 +68,16 @@ const Dashboard = () => {
   }
 
   const getStockChange = (symbol) => {
-    const stockPrices = prices[symbol]?.['7d'] || []
-    
-    // Find the last two valid data points with close values
-    let validPrices = stockPrices.filter(price => {
-      const closeValue = parseFloat(price.close);
-      return !isNaN(closeValue) && closeValue !== 0;
-    });
-    
-    if (validPrices.length >= 2) {
-      const latest = parseFloat(validPrices[validPrices.length - 1].close);
-      const previous = parseFloat(validPrices[validPrices.length - 2].close);
-      
-      // Both values should be valid at this point, but double-check anyway
-      if (!isNaN(latest) && !isNaN(previous) && previous !== 0) {
-        const change = ((latest - previous) / previous) * 100;
-        return {
-          value: change.toFixed(2),
-          isPositive: change > 0,
-          color: change > 0 ? 'success.main' : change < 0 ? 'error.main' : 'text.secondary'
-        };
-      }
+    // The change between the last two trading days is computed on the server
+    const change = snapshot[symbol]?.change_percent
+    if (change === null || change === undefined || isNaN(change)) {
+      return null;
     }
-    return null;
+    return {
+      value: change.toFixed(2),
+      isPositive: change > 0,
+      color: change > 0 ? 'success.main' : change < 0 ? 'error.main' : 'text.secondary'
+    };
   }
 
   return (
@@ -126,7 +106,7 @@ const Dashboard = () => {
         >
           {dashboardStocks.map((stock) => {
             const change = getStockChange(stock.symbol)
-            const isLoading = !pricesStatus[stock.symbol] || pricesStatus[stock.symbol]['7d'] === 'loading'
+            const isLoading = snapshot[stock.symbol]?.last_close == null && (snapshotStatus === 'loading' || snapshotPending.includes(stock.symbol))
             
             return (
               <Box
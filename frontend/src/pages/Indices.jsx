@@ -6,12 +6,12 @@ import {
   Tabs, Tab, Paper, Divider, CircularProgress
 } from '@mui/material'
 import SearchBar from '../components/SearchBar'
-import { fetchStocks } from '../store/stocksSlice'
+import { fetchStocks, fetchMarketSnapshot, searchStocks, setSearchQuery } from '../store/stocksSlice'
 import ErrorMessage from '../components/ErrorMessage'
 
 const Indices = () => {
   const dispatch = useDispatch()
-  const { list: stocks, status, error } = useSelector((state) => state.stocks)
+  const { list: stocks, status, error, snapshot, snapshotStatus, searchResults } = useSelector((state) => state.stocks)
   const [searchTerm, setSearchTerm] = useState('')
   const [selectedCategory, setSelectedCategory] = useState('all')
 
@@ -22,6 +22,31 @@ const Indices = () => {
     }
   }, [status, dispatch])
 
+  // Latest change of every symbol in a single request
+  useEffect(() => {
+    if (snapshotStatus === 'idle') {
+      dispatch(fetchMarketSnapshot())
+    }
+  }, [snapshotStatus, dispatch])
+
+  // Search on the backend index once the user pauses typing
+  useEffect(() => {
+    const query = searchTerm.trim()
+    dispatch(setSearchQuery(query))
+    if (!query) {
+      return
+    }
+    const timer = setTimeout(() => dispatch(searchStocks(query)), 150)
+    return () => clearTimeout(timer)
+  }, [searchTerm, dispatch])
+
+  // Best matches first; every stock when there is no search
+  const searchRank = new Map(searchResults.map((symbol, rank) => [symbol, rank]))
+  const applySearch = (items) => searchTerm.trim()
+    ? items.filter(stock => searchRank.has(stock.symbol))
+        .sort((a, b) => searchRank.get(a.symbol) - searchRank.get(b.symbol))
+    : items
+
   // Group stocks by category
   const categories = {
     major: { title: 'Major Indices', items: stocks.filter(s => s.category === 'major') },
@@ -29,12 +54,9 @@ const Indices = () => {
     stock: { title: 'Major Stocks', items: stocks.filter(s => s.category === 'stock') }
   }
 
-  const filteredStocks = stocks.filter(stock => {
-    const matchesSearch = stock.symbol.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         stock.name.toLowerCase().includes(searchTerm.toLowerCase());
-    const matchesCategory = selectedCategory === 'all' || stock.category === selectedCategory;
-    return matchesSearch && matchesCategory;
-  });
+  const filteredStocks = applySearch(stocks.filter(stock =>
+    selectedCategory === 'all' || stock.category === selectedCategory
+  ));
 
   // Show loading indicator when initially fetching the stock list
   if (status === 'loading') {
@@ -85,14 +107,10 @@ const Indices = () => {
               {category.title}
             </Typography>
             <Grid container spacing={3}>
-              {category.items
-                .filter(stock => 
-                  stock.symbol.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                  stock.name.toLowerCase().includes(searchTerm.toLowerCase())
-                )
+              {applySearch(category.items)
                 .map(stock => (
                   <Grid item xs={12} sm={6} md={4} key={stock.symbol}>
-                    <StockCard stock={stock} />
+                    <StockCard stock={stock} quote={snapshot[stock.symbol]} />
                   </Grid>
                 ))}
             </Grid>
@@ -104,7 +122,7 @@ const Indices = () => {
         <Grid container spacing={3}>
           {filteredStocks.map(stock => (
             <Grid item xs={12} sm={6} md={4} key={stock.symbol}>
-              <StockCard stock={stock} />
+              <StockCard stock={stock} quote={snapshot[stock.symbol]} />
             </Grid>
           ))}
         </Grid>
@@ -114,7 +132,7 @@ const Indices = () => {
 }
 
 // Extracted StockCard component for cleaner code
-const StockCard = ({ stock }) => (
+const StockCard = ({ stock, quote }) => (
   <Card
     component={Link}
     to={`/stock/${stock.symbol}`}
@@ -140,6 +158,14 @@ const StockCard = ({ stock }) => (
       <Typography variant="caption" color="text.secondary" sx={{ mt: 1, display: 'block' }}>
         Region: {stock.region}
       </Typography>
+      {quote?.change_percent !== null && quote?.change_percent !== undefined && (
+        <Typography
+          variant="body2"
+          sx={{ mt: 1, color: quote.change_percent > 0 ? 'success.main' : quote.change_percent < 0 ? 'error.main' : 'text.secondary' }}
+        >
+          {quote.last_close.toFixed(2)} ({quote.change_percent > 0 ? '+' : ''}{quote.change_percent.toFixed(2)}%)
+        </Typography>
+      )}
     </CardContent>
   </Card>
 );
@@ -15,6 +15,19 @@ export const fetchStockPrices = createAsyncThunk(
   }
 )
 
+// One row per symbol with last close, change and 52-week range, so pages that
+// only show the latest move don't need to download full price series
+export const fetchMarketSnapshot = createAsyncThunk('stocks/fetchMarketSnapshot', async () => {
+  const response = await axios.get(`${BACKEND_API_URL}/market/snapshot`)
+  return response.data
+})
+
+// Ranked symbol search (prefix and typo-tolerant matching) done by the backend index
+export const searchStocks = createAsyncThunk('stocks/searchStocks', async (query) => {
+  const response = await axios.get(`${BACKEND_API_URL}/stocks/search`, { params: { q: query, limit: 50 } })
+  return response.data
+})
+
 const stocksSlice = createSlice({
   name: 'stocks',
   initialState: {
@@ -22,10 +35,22 @@ const stocksSlice = createSlice({
     prices: {},
     pricesStatus: {},
     pricesError: {},
+    snapshot: {},
+    snapshotPending: [],
+    snapshotStatus: 'idle',
+    searchQuery: '',
+    searchResults: [],
     status: 'idle',
     error: null,
   },
-  reducers: {},
+  reducers: {
+    setSearchQuery: (state, action) => {
+      state.searchQuery = action.payload
+      if (!action.payload) {
+        state.searchResults = []
+      }
+    },
+  },
   extraReducers: (builder) => {
     builder
       .addCase(fetchStocks.pending, (state) => {
@@ -70,7 +95,31 @@ const stocksSlice = createSlice({
         state.pricesError[symbol][period] = action.error.message
         state.pricesStatus[symbol][period] = 'failed'
       })
+      .addCase(fetchMarketSnapshot.pending, (state) => {
+        state.snapshotStatus = 'loading'
+      })
+      .addCase(fetchMarketSnapshot.fulfilled, (state, action) => {
+        state.snapshotStatus = 'succeeded'
+        const rows = Array.isArray(action.payload?.data) ? action.payload.data : []
+        rows.forEach((row) => {
+          state.snapshot[row.symbol] = row
+        })
+        state.snapshotPending = action.payload?.pending || []
+      })
+      .addCase(fetchMarketSnapshot.rejected, (state) => {
+        state.snapshotStatus = 'failed'
+      })
+      .addCase(searchStocks.fulfilled, (state, action) => {
+        // Ignore responses to queries that were superseded while in flight
+        if (action.meta.arg !== state.searchQuery) {
+          return
+        }
+        const results = Array.isArray(action.payload?.results) ? action.payload.results : []
+        state.searchResults = results.map((result) => result.symbol)
+      })
   },
 })
 
+export const { setSearchQuery } = stocksSlice.actions
+
 export default stocksSlice.reducer
\ No newline at end of file